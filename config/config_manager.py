@@ -49,9 +49,199 @@ class ConfigManager:
         self.config["recording_folder"] = path
         self.save_config()
 
+    def get_extra_recording_folders(self):
+        """Additional recording roots (other volumes) pooled with the recording folder."""
+        return self.config.get("extra_recording_folders", [])
+
+    def set_extra_recording_folders(self, paths):
+        self.config["extra_recording_folders"] = list(paths)
+        self.save_config()
+
+    def get_recording_folders(self):
+        """All recording roots, the recording folder first; empty if none is configured."""
+        primary = self.get_recording_folder()
+        if not primary:
+            return []
+        return [primary] + [p for p in self.get_extra_recording_folders() if p and p != primary]
+
     def get_min_free_gb(self):
         return self.config.get("min_free_gb", 50.0)
 
     def set_min_free_gb(self, value: float):
         self.config["min_free_gb"] = value
         self.save_config()
+
+    def get_window_processes(self):
+        """Run secondary camera windows (32+ layouts) in their own processes."""
+        return self.config.get("window_processes", False)
+
+    def set_window_processes(self, enabled: bool):
+        self.config["window_processes"] = bool(enabled)
+        self.save_config()
+
+    def get_recording_service(self):
+        """Record in a headless service process that keeps running across GUI restarts."""
+        return self.config.get("recording_service", False)
+
+    def set_recording_service(self, enabled: bool):
+        self.config["recording_service"] = bool(enabled)
+        self.save_config()
+
+    def get_recording_service_port(self):
+        """Loopback port the recording service listens on for the GUI."""
+        return self.config.get("recording_service_port", 47651)
+
+    def set_recording_service_port(self, port: int):
+        self.config["recording_service_port"] = int(port)
+        self.save_config()
+
+    def get_recorder_nodes(self):
+        """Number of local recorder node processes sharing the cameras; 0 records in this process."""
+        return self.config.get("recorder_nodes", 0)
+
+    def set_recorder_nodes(self, count: int):
+        self.config["recorder_nodes"] = int(count)
+        self.save_config()
+
+    def get_remote_recorder_nodes(self):
+        """Ids of recorder nodes started on other machines (they connect to get their shard)."""
+        return [int(n) for n in self.config.get("remote_recorder_nodes", [])]
+
+    def set_remote_recorder_nodes(self, node_ids):
+        self.config["remote_recorder_nodes"] = [int(n) for n in node_ids]
+        self.save_config()
+
+    def get_recorder_node_listen(self):
+        """host:port recorder nodes connect to; empty = loopback on a free port."""
+        return self.config.get("recorder_node_listen", "")
+
+    def set_recorder_node_listen(self, address: str):
+        self.config["recorder_node_listen"] = address
+        self.save_config()
+
+    def get_recorder_node_authkey(self):
+        """Hex key shared with remote recorder nodes; empty = a new random key per session."""
+        return self.config.get("recorder_node_authkey", "")
+
+    def set_recorder_node_authkey(self, key_hex: str):
+        self.config["recorder_node_authkey"] = key_hex
+        self.save_config()
+
+    def get_page_size(self):
+        """Cameras per page; 0 keeps the classic all-on-screen grid where one exists."""
+        return self.config.get("page_size", 0)
+
+    def set_page_size(self, value: int):
+        self.config["page_size"] = int(value)
+        self.save_config()
+
+    def get_tour_seconds(self):
+        return self.config.get("tour_seconds", 20)
+
+    def set_tour_seconds(self, value: int):
+        self.config["tour_seconds"] = int(value)
+        self.save_config()
+
+    def get_encoder_cpu_ceiling(self):
+        """Share of total CPU (%) all recorder encoders together may use."""
+        return self.config.get("encoder_cpu_ceiling", 70)
+
+    def set_encoder_cpu_ceiling(self, value: float):
+        self.config["encoder_cpu_ceiling"] = float(value)
+        self.save_config()
+
+    def get_segment_minutes(self):
+        """Length of each recording file; ffmpeg cuts gaplessly at these clock boundaries."""
+        return self.config.get("segment_minutes", 10)
+
+    def set_segment_minutes(self, value: int):
+        self.config["segment_minutes"] = int(value)
+        self.save_config()
+
+    def get_motion_preroll_seconds(self):
+        """Footage kept from before motion starts, for cameras in motion mode."""
+        return self.config.get("motion_preroll_seconds", 5)
+
+    def set_motion_preroll_seconds(self, value: int):
+        self.config["motion_preroll_seconds"] = int(value)
+        self.save_config()
+
+    def get_motion_postroll_seconds(self):
+        """Recording continues this long after the last motion."""
+        return self.config.get("motion_postroll_seconds", 10)
+
+    def set_motion_postroll_seconds(self, value: int):
+        self.config["motion_postroll_seconds"] = int(value)
+        self.save_config()
+
+    def get_low_tier_enabled(self):
+        """Also record a low-resolution, low-fps copy of every camera for long retention."""
+        return self.config.get("low_tier_enabled", True)
+
+    def set_low_tier_enabled(self, enabled: bool):
+        self.config["low_tier_enabled"] = bool(enabled)
+        self.save_config()
+
+    def get_quality_target_days(self):
+        """Days of history to keep by lowering recording quality before deleting any; 0 turns this off."""
+        return self.config.get("quality_target_days", 30)
+
+    def set_quality_target_days(self, value: int):
+        self.config["quality_target_days"] = int(value)
+        self.save_config()
+
+    def get_max_write_mbps(self):
+        """Sustained write rate (MB/s) a recording volume should not exceed; 0 means no limit."""
+        return self.config.get("max_write_mbps", 0)
+
+    def set_max_write_mbps(self, value: float):
+        self.config["max_write_mbps"] = float(value)
+        self.save_config()
+
+    def get_integrity_scrub_mbps(self):
+        """Read rate (MB/s) of the background check of finished recordings; 0 turns it off."""
+        return self.config.get("integrity_scrub_mbps", 2)
+
+    def set_integrity_scrub_mbps(self, value: float):
+        self.config["integrity_scrub_mbps"] = float(value)
+        self.save_config()
+
+    def get_integrity_repair(self):
+        """Remux recordings the integrity check finds damaged."""
+        return self.config.get("integrity_repair", False)
+
+    def set_integrity_repair(self, enabled: bool):
+        self.config["integrity_repair"] = bool(enabled)
+        self.save_config()
+
+    def get_mosaic_recording_enabled(self):
+        """Also record each camera window's grid as one low-fps overview video."""
+        return self.config.get("mosaic_recording_enabled", False)
+
+    def set_mosaic_recording_enabled(self, enabled: bool):
+        self.config["mosaic_recording_enabled"] = bool(enabled)
+        self.save_config()
+
+    def get_mosaic_fps(self):
+        """Frame rate of the overview mosaic recording."""
+        return self.config.get("mosaic_fps", 1)
+
+    def set_mosaic_fps(self, value: int):
+        self.config["mosaic_fps"] = int(value)
+        self.save_config()
+
+    def get_full_retention_days(self):
+        """Days full-quality recordings are kept once the low tier has a copy; 0 keeps them until space runs out."""
+        return self.config.get("full_retention_days", 0)
+
+    def set_full_retention_days(self, value: int):
+        self.config["full_retention_days"] = int(value)
+        self.save_config()
+
+    def get_low_retention_days(self):
+        """Days low-resolution recordings are kept; 0 keeps them until space runs out."""
+        return self.config.get("low_retention_days", 90)
+
+    def set_low_retention_days(self, value: int):
+        self.config["low_retention_days"] = int(value)
+        self.save_config()
@@ -5,7 +5,6 @@ from config.stream_config_manager import CameraStreamConfigManager
 from ui.camera_window import CameraWindow
 from ui.dialogs import CameraCountDialog, CameraConfigDialog
 from utils.logging import log
-from utils.subproc import kill_process_tree
 from PyQt5.QtWidgets import (
     QApplication, QMessageBox, QDialog, QLabel,
     QFrame, QPushButton, QVBoxLayout, QHBoxLayout,
@@ -13,8 +12,17 @@ from PyQt5.QtWidgets import (
 import sys
 import os
 import time
-from core.camera_record_worker import CameraRecorderWorker
+import math
+from core.camera_record_worker import CameraRecorderWorker, DRAIN_TIMEOUT_S
+from core.encoder_budget import get_encoder_budget
+from core.recording_profile import profile_from_config, quality_level
 from utils.storage_manager import StorageManager
+from utils.integrity_scrubber import IntegrityScrubber
+from utils.recording_catalog import get_catalog
+from utils.recording_journal import get_journal
+from utils.storage_pool import get_storage_pool
+from utils.helper import get_low_tier_root, sanitize_filename
+from controller.recorder_node import recorder_spec
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 
 RESTART_EXIT_CODE = 2
@@ -33,6 +41,31 @@ GRID_LAYOUTS = {
     64: [(0, 4, 8), (1, 4, 8)],
 }
 
+# Page size used for camera counts without a fixed layout above
+DEFAULT_PAGE_SIZE = 16
+
+
+def compute_grid(tile_count):
+    """Smallest near-square (rows, cols) grid holding tile_count tiles, wider than tall."""
+    tile_count = max(1, tile_count)
+    cols = math.ceil(math.sqrt(tile_count))
+    rows = math.ceil(tile_count / cols)
+    return rows, cols
+
+
+def build_layouts(camera_count, page_size=0):
+    """Return (layouts, page_size) for a camera count.
+
+    Counts listed in GRID_LAYOUTS keep their fixed one/two-window layout
+    unless a page size is configured. Any other count gets a single window
+    showing `page_size` cameras at a time (page_size 0 = no paging).
+    """
+    if not page_size and camera_count in GRID_LAYOUTS:
+        return GRID_LAYOUTS[camera_count], 0
+    page_size = min(page_size or DEFAULT_PAGE_SIZE, camera_count)
+    rows, cols = compute_grid(page_size)
+    return [(0, rows, cols)], page_size
+
 class _DongleChecker(QThread):
     """Runs the dongle check in a background thread so it never blocks the UI."""
     result = pyqtSignal(bool, str)  # (ok, error_message)
@@ -181,6 +214,10 @@ class AppController:
         self.stream_config = CameraStreamConfigManager()
         self.windows = {}
         self.recorder_threads = {}
+        self.window_procs = None             # WindowProcessManager when windows run out-of-process
+        self.recorder_nodes = None           # RecorderNodeManager when recording is sharded over nodes
+        self.recording_service = None        # RecordingServiceClient when a headless service records
+        self._recorder_queue = []            # off-page cameras awaiting a recorder (paged layouts)
         self.camera_count = self.config_mgr.get_camera_count()
 
         # ---- periodic dongle enforcement (background thread, every 5 min) ----
@@ -191,18 +228,65 @@ class AppController:
         self._dongle_timer.start(1 * 60 * 1000)  # every 1 minute
         # ------------------------------------------
 
-        # Storage watchdog — deletes oldest day folders when free space drops below threshold
-        recording_folder = self.config_mgr.get_recording_folder()
+        # Headless recording service — records whether or not this GUI is up,
+        # and runs the storage watchdogs and recorder nodes itself
+        if self.config_mgr.get_recording_service():
+            from controller.recording_service import RecordingServiceClient
+            self.recording_service = RecordingServiceClient(self.config_mgr)
+            # the service's cameras, for the status bar and instant replay
+            self.recorder_threads = self.recording_service.recorders
+
+        # Storage watchdogs — one per recording root of the pool; each lowers the
+        # quality of the recorders on its volume under disk pressure and deletes
+        # the oldest day folders when free space drops below threshold
         min_free_gb = self.config_mgr.get_min_free_gb()
-        self.storage_manager = StorageManager(
-            recording_folder=recording_folder or "",
-            min_free_gb=min_free_gb,
-        )
-        if recording_folder and os.path.exists(recording_folder):
-            self.storage_manager.start()
-        else:
+        self.storage_managers = []
+        self.integrity_scrubbers = []
+        self.storage_pressure = {}           # recording root -> disk-pressure level
+        for recording_folder in ([] if self.recording_service else get_storage_pool().roots):
+            if not os.path.exists(recording_folder):
+                log.warning(f"[Storage] Recording folder {recording_folder} is missing — not watched")
+                continue
+            storage_manager = StorageManager(
+                recording_folder=recording_folder,
+                min_free_gb=min_free_gb,
+                full_retention_days=self.config_mgr.get_full_retention_days(),
+                low_retention_days=self.config_mgr.get_low_retention_days(),
+                low_tier_enabled=self.config_mgr.get_low_tier_enabled(),
+                quality_target_days=self.config_mgr.get_quality_target_days(),
+                max_write_mbps=self.config_mgr.get_max_write_mbps(),
+                on_pressure=self._on_storage_pressure,
+            )
+            storage_manager.start()
+            self.storage_managers.append(storage_manager)
+            # Index recordings written while the catalogs were not up to date
+            for root in (recording_folder, get_low_tier_root(recording_folder)):
+                catalog = get_catalog(root)
+                if catalog:
+                    catalog.backfill_async()
+            # Verify finished recordings in the background, at a read rate that leaves the disk to the recorders
+            if self.config_mgr.get_integrity_scrub_mbps() > 0:
+                scrubber = IntegrityScrubber(
+                    recording_folder,
+                    max_read_mbps=self.config_mgr.get_integrity_scrub_mbps(),
+                    repair=self.config_mgr.get_integrity_repair(),
+                )
+                scrubber.start()
+                self.integrity_scrubbers.append(scrubber)
+        if not self.storage_managers and not self.recording_service:
             log.info("[Storage] Watchdog not started — recording folder not configured yet")
 
+        # Recorder nodes — local processes and/or remote machines record the cameras
+        remote_nodes = self.config_mgr.get_remote_recorder_nodes()
+        if not self.recording_service and (self.config_mgr.get_recorder_nodes() > 0 or remote_nodes):
+            from controller.recorder_node import RecorderNodeManager
+            self.recorder_nodes = RecorderNodeManager(
+                self.config_mgr.get_recorder_nodes(),
+                remote_nodes,
+                listen=self.config_mgr.get_recorder_node_listen(),
+                authkey_hex=self.config_mgr.get_recorder_node_authkey(),
+            )
+
         if self.camera_count == 0:
             self.change_camera_count()
 
@@ -219,9 +303,10 @@ class AppController:
                 if widget.stream_worker:
                     widget.stream_worker.running = False
                     workers.append(widget.stream_worker)
-                    # Disconnect signals so old frames don't arrive on new widgets
+                    # Stop pulling frames and disconnect signals so nothing old
+                    # arrives on new widgets
+                    widget._preparer.detach(widget.cam_id)
                     try:
-                        widget.stream_worker.frameReady.disconnect()
                         widget.stream_worker.connectionStatus.disconnect()
                     except (TypeError, RuntimeError):
                         pass
@@ -237,31 +322,25 @@ class AppController:
                 w.wait(remaining_ms)
 
     def _stop_all_recorders_fast(self):
-        """Stop all recorders quickly: save metadata, send 'q' to ffmpeg, force-kill if needed."""
-        import datetime as _dt
-        from utils.helper import save_metadata as _save_metadata
-        for cam_id, recorder in list(self.recorder_threads.items()):
-            # Save end time BEFORE killing so metadata is never left as "ongoing"
-            if recorder.video_start_time and recorder.metadata_file:
-                try:
-                    end_dt = _dt.datetime.now()
-                    duration = (end_dt - recorder.video_start_time).total_seconds()
-                    _save_metadata(recorder.metadata_file, recorder.video_start_time, duration, end_dt)
-                    log.info(f"Saved metadata for Camera {cam_id} before stop.")
-                except Exception as e:
-                    log.warning(f"Failed to save metadata for Camera {cam_id}: {e}")
-            recorder.running = False
-            if recorder.process and recorder.process.poll() is None:
-                # Try graceful stop first
-                try:
-                    recorder.process.stdin.write(b'q')
-                    recorder.process.stdin.flush()
-                except (BrokenPipeError, OSError):
-                    pass
-                # Force-kill the process tree to avoid orphans
-                kill_process_tree(recorder.process.pid)
+        """Stop all recorders quickly: every ffmpeg is asked to quit at once, killed if it hangs."""
+        if self.recording_service:
+            return   # the service keeps recording through GUI restarts and dongle freezes
+        if self.recorder_nodes:
+            # the nodes close and journal their own segments
+            self.recorder_nodes.stop_all()
+            self.recorder_threads.clear()
+            return
+        recorders = list(self.recorder_threads.items())
+        for cam_id, recorder in recorders:
+            # the recorder closes and journals its own output once ffmpeg has exited
+            recorder.request_stop()
+            get_encoder_budget().unregister(cam_id)
             log.info(f"Signaled recorder for Camera {cam_id} to stop.")
         self.recorder_threads.clear()
+        deadline = time.perf_counter() + DRAIN_TIMEOUT_S + 1.0
+        for cam_id, recorder in recorders:
+            recorder.wait(max(0, int((deadline - time.perf_counter()) * 1000)))
+        get_journal().flush()   # the process may exit right after this
 
     def initialize_windows(self):
         # Fast cleanup of old windows (used on first startup only;
@@ -278,26 +357,63 @@ class AppController:
             self.camera_count = 4
             self.config_mgr.set_camera_count(self.camera_count)
 
-        layouts = GRID_LAYOUTS.get(self.camera_count, [(0, 2, 2)])
+        layouts, page_size = build_layouts(self.camera_count, self.config_mgr.get_page_size())
         cam_ids = list(range(1, self.camera_count + 1))
 
+        use_processes = len(layouts) > 1 and self.config_mgr.get_window_processes()
+        if use_processes and self.window_procs is None:
+            from controller.window_process import WindowProcessManager
+            self.window_procs = WindowProcessManager()
+            self.window_procs.cameraConnectionChanged.connect(self._on_camera_connection_changed)
+
         for window_id, rows, cols in layouts:
-            cam_id_start = sum(l[1] * l[2] for l in layouts[:layouts.index((window_id, rows, cols))])
-            window_cam_ids = cam_ids[cam_id_start:cam_id_start + rows * cols]
+            if page_size:
+                window_cam_ids = cam_ids  # one paged window holds every camera
+            else:
+                cam_id_start = sum(l[1] * l[2] for l in layouts[:layouts.index((window_id, rows, cols))])
+                window_cam_ids = cam_ids[cam_id_start:cam_id_start + rows * cols]
 
             is_main = window_id == 0
+            if use_processes and not is_main:
+                # Secondary windows get their own process (own GIL and GUI thread)
+                self.window_procs.spawn(window_id, window_cam_ids, rows, cols)
+                continue
+
             title = "Camera Viewer" if is_main else f"Camera Viewer (Window {window_id + 1})"
 
             window = CameraWindow(
                 title, window_cam_ids, rows, cols,
                 self.stream_config,
-                self if is_main else None
+                self if is_main else None,
+                page_size=page_size,
+                tour_seconds=self.config_mgr.get_tour_seconds(),
             )
+            window.cameraConnectionChanged.connect(self._on_camera_connection_changed)
             self.windows[window_id] = window
 
+        if page_size:
+            # Cameras off the first page are never decoded for display, so
+            # their recorders can't wait for a display connection — start
+            # them on their own (staggered, like the streams).
+            visible = set(self.windows[0].pages[0])
+            self._recorder_queue = [c for c in cam_ids if c not in visible]
+            self._start_next_recorder()
+
+    def _start_next_recorder(self):
+        if not self._recorder_queue:
+            return
+        self.start_recording_for_camera(self._recorder_queue.pop(0))
+        if self._recorder_queue:
+            QTimer.singleShot(2000, self._start_next_recorder)
+
+    def _on_camera_connection_changed(self, cam_id, connected):
+        # Recorder starts only once the display stream is up (see CameraWindow)
+        if connected:
+            self.start_recording_for_camera(cam_id)
+
     def change_camera_count(self):
         dialog = CameraCountDialog(valid_camera_counts=list(GRID_LAYOUTS.keys()))
-        if dialog.exec_():
+        if dialog.exec_() and dialog.get_selected_count() > 0:
             old_count = self.camera_count
             new_count = dialog.get_selected_count()
             if new_count == old_count:
@@ -337,6 +453,8 @@ class AppController:
 
     def start_recording_for_camera(self, cam_id):
         """Start recorder for a single camera (called from staggered stream startup)."""
+        if self.recording_service:
+            return   # the service records every configured camera on its own
         recording_folder = self.config_mgr.get_recording_folder()
         if not recording_folder:
             log.info(f"Recording folder not configured — skipping recorder for Camera {cam_id}")
@@ -357,17 +475,84 @@ class AppController:
 
         log.info(f"Evaluating camera {cam_id}: enabled={enabled}, record={record}, rtsp={rtsp_url}")
 
-        if enabled and record and rtsp_url:
+        if enabled and record and rtsp_url and self.recorder_nodes:
+            spec = recorder_spec(cam_id, config, self.config_mgr, self.storage_pressure)
+            self.recorder_threads[cam_id] = self.recorder_nodes.start_recorder(spec)
+            log.info(f"Handed Camera {cam_id} to recorder node {self.recorder_threads[cam_id].node_id}")
+        elif enabled and record and rtsp_url:
+            pool = get_storage_pool()
+            recording_dir = pool.assign(sanitize_filename(name)) or recording_folder
             recorder = CameraRecorderWorker(
                 cam_id, name, rtsp_url,
                 record_enabled=record,
-                recording_dir=recording_folder,
+                recording_dir=recording_dir,
+                segment_seconds=self.config_mgr.get_segment_minutes() * 60,
+                low_tier=self.config_mgr.get_low_tier_enabled(),
+                record_mode=config.get("record_mode", "continuous"),
+                preroll_seconds=self.config_mgr.get_motion_preroll_seconds(),
+                postroll_seconds=self.config_mgr.get_motion_postroll_seconds(),
+                recording_profile=profile_from_config(config.get("recording_profile")),
             )
+            pressure = self.storage_pressure.get(os.path.normcase(os.path.abspath(recording_dir)), 0)
+            recorder.quality_level = quality_level(pressure, recorder.recording_profile)
             recorder.recording_finished.connect(self.handle_recording_finished)
+            budget = get_encoder_budget()
+            budget.register(recorder)
+            recorder.finished.connect(lambda cid=cam_id: budget.unregister(cid))
+            recorder.finished.connect(lambda cam=recorder.cam_name: pool.release(cam))
+            budget.start()
             recorder.start()
             self.recorder_threads[cam_id] = recorder
             log.info(f"Started recorder for Camera {cam_id}")
 
+    def _on_storage_pressure(self, root, level):
+        """Lower or restore the quality of every recorder writing to a volume (StorageManager thread)."""
+        self.storage_pressure[os.path.normcase(os.path.abspath(root))] = level
+        for recorder in list(self.recorder_threads.values()):
+            if not recorder.recording_dir:
+                continue   # recorder node has not reported where it records yet
+            if os.path.normcase(os.path.abspath(recorder.recording_dir)) == os.path.normcase(os.path.abspath(root)):
+                recorder.set_quality_level(quality_level(level, recorder.recording_profile))
+
+    def get_recorder_stats(self):
+        """Encode telemetry of all running recorders, for the status bar."""
+        cameras = {}
+        for cam_id, recorder in list(self.recorder_threads.items()):
+            if recorder.isRunning():
+                cameras[cam_id] = dict(recorder.telemetry.snapshot(), name=recorder.cam_name)
+        measured = [c for c in cameras.values() if c["speed"] is not None]
+        return {
+            "recorders": len(cameras),
+            "realtime": sum(1 for c in measured if c["slow_for_s"] is None),
+            "measured": len(measured),
+            "slow": sorted((c for c in measured if c["slow_for_s"] is not None), key=lambda c: c["speed"]),
+            "dropped": sum(c["dropped"] for c in cameras.values()),
+            "cameras": cameras,
+        }
+
+    def get_recording_roots(self):
+        """Configured recording roots plus those the recorder nodes or the service report."""
+        roots = self.config_mgr.get_recording_folders()
+        if self.recorder_nodes:
+            roots = roots + self.recorder_nodes.roots()
+        if self.recording_service:
+            roots = roots + self.recording_service.roots()
+        seen = set()
+        merged = []
+        for root in roots:
+            key = os.path.normcase(os.path.abspath(root))
+            if key not in seen:
+                seen.add(key)
+                merged.append(root)
+        return merged
+
+    def get_live_recording(self, cam_id):
+        """Return (path, start_datetime) of the file a camera is recording now, or (None, None)."""
+        recorder = self.recorder_threads.get(cam_id)
+        if not recorder or not recorder.isRunning() or not recorder.output_file:
+            return None, None
+        return recorder.output_file, recorder.video_start_time
+
     def start_recording_for_configured_cameras(self):
         """Start recorders for all configured cameras (used by camera count change)."""
         for cam_id in range(1, self.camera_count + 1):
@@ -385,10 +570,14 @@ class AppController:
 
     def stop_all_recordings(self):
         self._dongle_timer.stop()
+        if self.recording_service:
+            return
         # Signal all recorders to stop first (instant)
         for cam_id, recorder in list(self.recorder_threads.items()):
             recorder.running = False
             recorder.stop_ffmpeg()
+            recorder.wake()
+            get_encoder_budget().unregister(cam_id)
             log.info(f"Signaled recorder stop for Camera {cam_id}")
         # Then wait collectively with a 5s total cap
         deadline = time.perf_counter() + 5.0
@@ -407,6 +596,14 @@ class AppController:
         self._stop_all_streams_fast()
         # Signal all recorders to stop
         self._stop_all_recorders_fast()
+        if self.window_procs:
+            self.window_procs.shutdown()
+        if self.recorder_nodes:
+            self.recorder_nodes.shutdown()
+        if self.recording_service:
+            self.recording_service.close()
+        for scrubber in self.integrity_scrubbers:
+            scrubber.stop()
         log.info("Shutdown complete.")
 
     def _start_dongle_check(self):
@@ -431,6 +628,8 @@ class AppController:
             self._stop_all_recorders_fast()
             for w in self.windows.values():
                 w.hide()
+            if self.window_procs:
+                self.window_procs.broadcast({"type": "hide"})
 
             dialog = DongleWarningDialog(err)
             dialog.exec_()
@@ -442,5 +641,13 @@ class AppController:
                 w._streams_cleaned = False
                 w.showMaximized()
                 w.initialize_streams()
+            if self.window_procs:
+                self.window_procs.broadcast({"type": "show"})
+            # The freeze stopped every recorder, but streams only bring back
+            # the visible page's: restart the rest, staggered
+            self._recorder_queue = [
+                cam_id for cam_id in range(1, self.camera_count + 1) if cam_id not in self.recorder_threads
+            ]
+            self._start_next_recorder()
 
             self._dongle_popup_shown = False
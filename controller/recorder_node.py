@@ -0,0 +1,570 @@
+# camera_app/controller/recorder_node.py
+"""
+Recording sharded across recorder nodes.
+
+One machine can only encode so many streams. With `recorder_nodes` > 0 the
+coordinator (AppController) records nothing itself: the cameras are spread
+over recorder node processes, each running the usual CameraRecorderWorkers
+(encoder budget, storage pool, journal) for its shard:
+
+    main.py --recorder-node --node-id 2 --ipc 127.0.0.1:PORT [--recording-folder D:\\rec]
+
+Local nodes are launched and relaunched like window processes. Nodes
+listed in `remote_recorder_nodes` are started by hand on other machines
+and connect to `recorder_node_listen` with the shared
+`recorder_node_authkey` (in CAMERA_IPC_AUTHKEY); without both settings
+remote nodes are ignored. They should record to a folder the coordinator
+can read (a share), or playback cannot open it.
+
+The connection is authenticated but NOT encrypted: camera specs carry the
+RTSP URLs with their credentials in clear text. Only listen on a trusted
+network, or run remote nodes through a tunnel (VPN, SSH port forward).
+
+A camera belongs to the node that wins rendezvous hashing over the node
+ids, so adding a node only moves the cameras it takes over. A remote node
+silent for HANG_TIMEOUT_S leaves the hashing until it is back, so its
+cameras are recorded by the others meanwhile; local nodes are relaunched
+instead.
+
+    coordinator → node : start (camera spec), stop, quality, motion, shutdown
+    node → coordinator : heartbeat (recording roots + per-camera status)
+
+Nodes decode nothing, so cameras in motion mode get their motion state
+from the coordinator: every HEARTBEAT_MS it sends its MotionHub snapshot
+(its own detectors plus its window processes'), which nodes merge into
+theirs. A camera no one decodes is recorded continuously, as in-process.
+
+For each camera the coordinator keeps a RemoteRecorder with the surface
+the controller uses for a local recorder (isRunning, output_file,
+telemetry, set_quality_level, stop), fed from heartbeats, and re-sends a
+node its cameras whenever it (re)connects. Every node journals into its
+own open-segment register, and playback searches the catalogs of every
+root the nodes report (AppController.get_recording_roots).
+"""
+
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from PyQt5.QtCore import QObject, QTimer
+from utils.ipc import (
+    IpcServer, IpcClient, IPC_HOST, new_authkey, authkey_from_env,
+    format_address, parse_address, AUTHKEY_ENV,
+)
+from utils.logging import log
+from utils.helper import sanitize_filename
+from utils.paths import get_self_command
+from utils.subproc import win_no_window_kwargs, kill_process_tree
+from core.recording_profile import profile_from_config, quality_level
+
+HEARTBEAT_MS = 2000
+HANG_TIMEOUT_S = 20.0       # no heartbeat for this long → node is considered hung
+STARTUP_GRACE_S = 30.0
+RESPAWN_COOLDOWN_S = 10.0
+NODE_STOP_S = 8.0           # nodes stop their ffmpegs gracefully on shutdown
+RECORDER_STOP_S = 5.0       # ffmpegs get this long to finish their files before they are killed
+
+_EMPTY_TELEMETRY = {"fps": None, "speed": None, "bitrate_kbps": None,
+                    "dropped": 0, "duplicated": 0, "slow_for_s": None}
+
+
+def recorder_spec(cam_id, camera_config, config_mgr, storage_pressure=None):
+    """Everything a node needs to record one camera, or None if it is not recorded."""
+    rtsp_url = camera_config.get("rtsp", "")
+    if not (camera_config.get("enabled", False) and camera_config.get("record", False) and rtsp_url):
+        return None
+    return {
+        "cam_id": cam_id,
+        "name": camera_config.get("name", f"Camera {cam_id}"),
+        "rtsp": rtsp_url,
+        "segment_seconds": config_mgr.get_segment_minutes() * 60,
+        "low_tier": config_mgr.get_low_tier_enabled(),
+        "record_mode": camera_config.get("record_mode", "continuous"),
+        "preroll_seconds": config_mgr.get_motion_preroll_seconds(),
+        "postroll_seconds": config_mgr.get_motion_postroll_seconds(),
+        "recording_profile": camera_config.get("recording_profile"),
+        "storage_pressure": dict(storage_pressure or {}),
+    }
+
+
+def node_for_camera(cam_id, node_ids):
+    """Rendezvous hashing: the node with the highest score for this camera owns it."""
+    return max(node_ids, key=lambda node_id: hashlib.sha1(f"{cam_id}:{node_id}".encode()).digest())
+
+
+class _ReportedTelemetry:
+    """Last telemetry snapshot a node reported for one camera."""
+
+    def __init__(self):
+        self.stats = dict(_EMPTY_TELEMETRY)
+
+    def snapshot(self):
+        return dict(self.stats)
+
+
+class RemoteRecorder:
+    """Coordinator-side stand-in for a camera recorded by a node."""
+
+    def __init__(self, manager, node_id, spec):
+        self.manager = manager
+        self.node_id = node_id
+        self.cam_id = spec["cam_id"]
+        self.cam_name = sanitize_filename(spec["name"] or f"Camera_{self.cam_id}")
+        self.recording_profile = profile_from_config(spec.get("recording_profile"))
+        self.recording_dir = None
+        self.output_file = None
+        self.video_start_time = None
+        self.process = None
+        self.running = True
+        self.telemetry = _ReportedTelemetry()
+        self._health = {}
+
+    def update(self, status):
+        self.recording_dir = status.get("recording_dir")
+        self.output_file = status.get("output_file")
+        self.video_start_time = status.get("video_start_time")
+        self._health = status.get("health") or {}
+        self.telemetry.stats = self._health.get("telemetry") or dict(_EMPTY_TELEMETRY)
+
+    def lost(self):
+        """The node stopped reporting: nothing is known to be recording."""
+        self.output_file = None
+        self.video_start_time = None
+        self.telemetry.stats = dict(_EMPTY_TELEMETRY)
+
+    def isRunning(self):
+        return self.running
+
+    def get_health(self):
+        return self._health
+
+    def set_quality_level(self, level):
+        self.manager.send_to(self.node_id, {"type": "quality", "cam_id": self.cam_id, "level": level})
+
+    def stop(self):
+        self.running = False
+        self.manager.stop_recorder(self.cam_id)
+
+    stop_ffmpeg = stop
+
+    def wake(self):
+        pass
+
+    def wait(self, msecs=None):
+        return True
+
+
+class RecorderNodeManager(QObject):
+    """Coordinator side: shards cameras over recorder nodes and tracks their status."""
+
+    def __init__(self, local_count, remote_ids=(), listen="", authkey_hex="", parent=None):
+        super().__init__(parent)
+        if remote_ids and not (listen and authkey_hex):
+            log.warning(
+                "[Nodes] Remote recorder nodes need recorder_node_listen and recorder_node_authkey — "
+                f"ignoring nodes {', '.join(map(str, remote_ids))}"
+            )
+            remote_ids = ()
+        self._authkey = bytes.fromhex(authkey_hex) if authkey_hex else new_authkey()
+        self._server = IpcServer(self._authkey, parse_address(listen) if listen else (IPC_HOST, 0))
+        if self._server.address[0] not in (IPC_HOST, "localhost"):
+            log.warning(
+                f"[Nodes] Listening on {format_address(self._server.address)}: camera URLs and "
+                "credentials go to recorder nodes unencrypted — use a trusted network or a tunnel"
+            )
+        self._server.messageReceived.connect(self._on_message)
+        self._server.peerConnected.connect(self._on_node_connected)
+        self.local_ids = list(range(1, local_count + 1))
+        self.node_ids = sorted(set(self.local_ids) | set(remote_ids))
+        self.recorders = {}       # cam_id -> RemoteRecorder
+        self.node_roots = {}      # node_id -> recording roots it reported
+        self._specs = {}          # cam_id -> start message
+        self._children = {}       # node_id -> dict(proc, spawned_at)
+        self._ffmpeg_pids = {}    # node_id -> ffmpeg pids it last reported
+        self._last_seen = {node_id: time.monotonic() + STARTUP_GRACE_S for node_id in self.node_ids}
+        self._stopping = False
+
+        self._watchdog = QTimer(self)
+        self._watchdog.timeout.connect(self._check_nodes)
+        self._watchdog.start(5000)
+        self._motion = QTimer(self)
+        self._motion.timeout.connect(self._send_motion)
+        self._motion.start(HEARTBEAT_MS)
+        for node_id in self.local_ids:
+            self._spawn(node_id)
+        log.info(
+            f"[Nodes] Recording on {len(self.node_ids)} node(s) ({len(self.local_ids)} local), "
+            f"listening on {format_address(self._server.address)}"
+        )
+
+    # ------------------------------------------------------------------ #
+    #  Cameras                                                             #
+    # ------------------------------------------------------------------ #
+
+    def start_recorder(self, spec):
+        """Hand a camera to its node; returns the RemoteRecorder standing in for it."""
+        cam_id = spec["cam_id"]
+        node_id = node_for_camera(cam_id, self._present_ids())
+        self._specs[cam_id] = dict(spec, type="start")
+        recorder = self.recorders[cam_id] = RemoteRecorder(self, node_id, spec)
+        if not self.send_to(node_id, self._specs[cam_id]):
+            log.info(f"[Nodes] Node {node_id} not connected yet — Camera {cam_id} starts when it is")
+        return recorder
+
+    def stop_recorder(self, cam_id):
+        recorder = self.recorders.pop(cam_id, None)
+        self._specs.pop(cam_id, None)
+        if recorder:
+            self.send_to(recorder.node_id, {"type": "stop", "cam_id": cam_id})
+
+    def stop_all(self):
+        for cam_id in list(self.recorders):
+            self.stop_recorder(cam_id)
+
+    def send_to(self, node_id, msg):
+        return self._server.send(f"node-{node_id}", msg)
+
+    def _present_ids(self):
+        """Node ids cameras are hashed over: local nodes, and remote ones heard from lately."""
+        now = time.monotonic()
+        present = [
+            node_id for node_id in self.node_ids
+            if node_id in self.local_ids or now - self._last_seen.get(node_id, now) <= HANG_TIMEOUT_S
+        ]
+        return present or self.node_ids
+
+    def _rebalance(self):
+        """Move cameras whose node left (or came back to) the hashing."""
+        present = self._present_ids()
+        for cam_id, recorder in list(self.recorders.items()):
+            node_id = node_for_camera(cam_id, present)
+            if node_id == recorder.node_id:
+                continue
+            log.warning(f"[Nodes] Camera {cam_id} moves from node {recorder.node_id} to node {node_id}")
+            self.send_to(recorder.node_id, {"type": "stop", "cam_id": cam_id})
+            recorder.lost()
+            recorder.node_id = node_id
+            self.send_to(node_id, self._specs[cam_id])
+
+    def roots(self):
+        """Every recording root the nodes reported."""
+        return list(dict.fromkeys(root for roots in self.node_roots.values() for root in roots))
+
+    # ------------------------------------------------------------------ #
+    #  Nodes                                                               #
+    # ------------------------------------------------------------------ #
+
+    def _spawn(self, node_id):
+        cmd = get_self_command(
+            "--recorder-node",
+            "--node-id", str(node_id),
+            "--ipc", format_address(self._server.address),
+        )
+        env = os.environ.copy()
+        env[AUTHKEY_ENV] = self._authkey.hex()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            **win_no_window_kwargs()
+        )
+        now = time.monotonic()
+        self._children[node_id] = {"proc": proc, "spawned_at": now}
+        self._last_seen[node_id] = now + STARTUP_GRACE_S
+        log.info(f"[Nodes] Launched recorder node {node_id} (pid {proc.pid})")
+
+    def _on_node_connected(self, peer_id):
+        node_id = _node_id_from_peer(peer_id)
+        if node_id is None:
+            return
+        if node_id not in self.node_ids:
+            log.warning(f"[Nodes] Unknown recorder node {node_id} connected — it gets no cameras")
+            return
+        self._last_seen[node_id] = max(self._last_seen.get(node_id, 0.0), time.monotonic())
+        self._rebalance()
+        specs = [spec for cam_id, spec in self._specs.items() if self.recorders[cam_id].node_id == node_id]
+        for spec in specs:
+            self.send_to(node_id, spec)
+        log.info(f"[Nodes] Node {node_id} connected — {len(specs)} camera(s) assigned")
+
+    def _on_message(self, peer_id, msg):
+        node_id = _node_id_from_peer(peer_id)
+        if node_id is None:
+            return
+        self._last_seen[node_id] = max(self._last_seen.get(node_id, 0.0), time.monotonic())
+        if msg.get("type") == "heartbeat":
+            self.node_roots[node_id] = list(msg.get("roots") or [])
+            self._ffmpeg_pids[node_id] = [s["pid"] for s in (msg.get("recorders") or {}).values() if s.get("pid")]
+            for cam_id, status in (msg.get("recorders") or {}).items():
+                recorder = self.recorders.get(cam_id)
+                if recorder and recorder.node_id == node_id:
+                    recorder.update(status)
+
+    def _send_motion(self):
+        """Share this process's motion state with the nodes (their recorders cannot detect any)."""
+        from core.motion import get_motion_hub
+        snapshot = get_motion_hub().snapshot()
+        if snapshot:
+            self._server.broadcast({"type": "motion", "motion": snapshot})
+
+    def _check_nodes(self):
+        if self._stopping:
+            return
+        now = time.monotonic()
+        self._rebalance()
+        for node_id in self.node_ids:
+            if now - self._last_seen.get(node_id, now) > HANG_TIMEOUT_S:
+                for recorder in self.recorders.values():
+                    if recorder.node_id == node_id:
+                        recorder.lost()
+            child = self._children.get(node_id)
+            if not child:
+                continue   # remote node: it reconnects on its own
+            code = child["proc"].poll()
+            if code is not None:
+                reason = f"exited with code {code}"
+            elif now - self._last_seen[node_id] > HANG_TIMEOUT_S:
+                reason = f"no heartbeat for {now - self._last_seen[node_id]:.0f}s"
+                kill_process_tree(child["proc"].pid)
+            else:
+                continue
+            if now - child["spawned_at"] < RESPAWN_COOLDOWN_S:
+                continue
+            log.warning(f"[Nodes] Recorder node {node_id} {reason} — relaunching.")
+            # its ffmpegs outlive it; the new node starts its own
+            for pid in self._ffmpeg_pids.pop(node_id, []):
+                kill_process_tree(pid)
+            self._spawn(node_id)
+
+    def shutdown(self):
+        """Stop every node's recorders and make sure no local node is left behind."""
+        self._stopping = True
+        self._watchdog.stop()
+        self._motion.stop()
+        self._server.broadcast({"type": "shutdown"})
+        deadline = time.perf_counter() + NODE_STOP_S
+        for child in self._children.values():
+            proc = child["proc"]
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.perf_counter()))
+            except subprocess.TimeoutExpired:
+                kill_process_tree(proc.pid)
+        self._children.clear()
+        self._server.close()
+
+
+def _node_id_from_peer(peer_id):
+    if not peer_id.startswith("node-"):
+        return None
+    try:
+        return int(peer_id.split("-", 1)[1])
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------- #
+#  Node side                                                               #
+# ---------------------------------------------------------------------- #
+
+class RecorderNode(QObject):
+    """Runs the recorders of one shard and reports on them."""
+
+    def __init__(self, node_id, recording_folders=None, watch_storage=None, parent=None):
+        super().__init__(parent)
+        from config.config_manager import ConfigManager
+        from utils.storage_pool import StoragePool
+        self.node_id = node_id
+        self.label = f"Node {node_id}"
+        self.config_mgr = ConfigManager()
+        self.own_roots = bool(recording_folders)
+        self.roots = list(recording_folders or self.config_mgr.get_recording_folders())
+        self.pool = StoragePool(self.roots, min_free_gb=self.config_mgr.get_min_free_gb())
+        self.recorders = {}       # cam_id -> CameraRecorderWorker
+        self.storage_pressure = {}
+        self.storage_managers = []
+        self.remote = None        # RecorderNodeManager whose recorders write to these roots too
+        self.integrity_scrubbers = []
+        if self.own_roots if watch_storage is None else watch_storage:
+            self._watch_storage()
+
+    def _watch_storage(self):
+        """Retention and disk pressure for roots only this node records to."""
+        from utils.storage_manager import StorageManager
+        from utils.integrity_scrubber import IntegrityScrubber
+        from utils.recording_catalog import get_catalog
+        from utils.helper import get_low_tier_root
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            manager = StorageManager(
+                recording_folder=root,
+                min_free_gb=self.config_mgr.get_min_free_gb(),
+                full_retention_days=self.config_mgr.get_full_retention_days(),
+                low_retention_days=self.config_mgr.get_low_retention_days(),
+                low_tier_enabled=self.config_mgr.get_low_tier_enabled(),
+                quality_target_days=self.config_mgr.get_quality_target_days(),
+                max_write_mbps=self.config_mgr.get_max_write_mbps(),
+                on_pressure=self._on_storage_pressure,
+            )
+            manager.start()
+            self.storage_managers.append(manager)
+            for catalog_root in (root, get_low_tier_root(root)):
+                catalog = get_catalog(catalog_root)
+                if catalog:
+                    catalog.backfill_async()
+            if self.config_mgr.get_integrity_scrub_mbps() > 0:
+                scrubber = IntegrityScrubber(
+                    root,
+                    max_read_mbps=self.config_mgr.get_integrity_scrub_mbps(),
+                    repair=self.config_mgr.get_integrity_repair(),
+                )
+                scrubber.start()
+                self.integrity_scrubbers.append(scrubber)
+
+    def _on_storage_pressure(self, root, level):
+        key = os.path.normcase(os.path.abspath(root))
+        self.storage_pressure[key] = level
+        recorders = list(self.recorders.values())
+        if self.remote:
+            recorders += list(self.remote.recorders.values())
+        for recorder in recorders:
+            if not recorder.recording_dir:
+                continue   # recorder node has not reported where it records yet
+            if os.path.normcase(os.path.abspath(recorder.recording_dir)) == key:
+                recorder.set_quality_level(quality_level(level, recorder.recording_profile))
+
+    def handle(self, msg):
+        kind = msg.get("type")
+        if kind == "start":
+            self.start_recorder(msg)
+        elif kind == "stop":
+            self.stop_recorder(msg.get("cam_id"))
+        elif kind == "quality":
+            recorder = self.recorders.get(msg.get("cam_id"))
+            if recorder:
+                recorder.set_quality_level(int(msg.get("level", 0)))
+        elif kind == "motion":
+            from core.motion import get_motion_hub
+            get_motion_hub().merge(msg.get("motion") or {})
+
+    def start_recorder(self, spec):
+        from core.camera_record_worker import CameraRecorderWorker
+        from core.encoder_budget import get_encoder_budget
+        cam_id = spec["cam_id"]
+        existing = self.recorders.get(cam_id)
+        if existing and existing.isRunning():
+            return
+        name = spec["name"]
+        recording_dir = self.pool.assign(sanitize_filename(name)) or self.roots[0]
+        recorder = CameraRecorderWorker(
+            cam_id, name, spec["rtsp"],
+            record_enabled=True,
+            recording_dir=recording_dir,
+            segment_seconds=spec["segment_seconds"],
+            low_tier=spec["low_tier"],
+            record_mode=spec["record_mode"],
+            preroll_seconds=spec["preroll_seconds"],
+            postroll_seconds=spec["postroll_seconds"],
+            recording_profile=profile_from_config(spec.get("recording_profile")),
+        )
+        # pressure on this volume, from this node's watchdogs or the coordinator's
+        pressures = dict(spec.get("storage_pressure") or {}, **self.storage_pressure)
+        pressure = pressures.get(os.path.normcase(os.path.abspath(recording_dir)), 0)
+        recorder.quality_level = quality_level(pressure, recorder.recording_profile)
+        budget = get_encoder_budget()
+        budget.register(recorder)
+        recorder.finished.connect(lambda cid=cam_id: budget.unregister(cid))
+        recorder.finished.connect(lambda cam=recorder.cam_name: self.pool.release(cam))
+        budget.start()
+        recorder.start()
+        self.recorders[cam_id] = recorder
+        log.info(f"[{self.label}] Recording Camera {cam_id} to {recording_dir}")
+
+    def stop_recorder(self, cam_id):
+        recorder = self.recorders.pop(cam_id, None)
+        if recorder:
+            recorder.stop()
+
+    def stop_all(self):
+        """Stop every recorder (all ffmpegs asked at once), wait briefly, flush the journal."""
+        from utils.recording_journal import get_journal
+        recorders = list(self.recorders.values())
+        self.recorders.clear()
+        for recorder in recorders:
+            recorder.request_stop(RECORDER_STOP_S)
+        # One shared deadline, inside the coordinator's NODE_STOP_S
+        deadline = time.perf_counter() + RECORDER_STOP_S + 1.0
+        for recorder in recorders:
+            recorder.wait(max(0, int((deadline - time.perf_counter()) * 1000)))
+        for manager in self.storage_managers:
+            manager.stop()
+        for scrubber in self.integrity_scrubbers:
+            scrubber.stop()
+        get_journal().flush()
+
+    def status(self):
+        return {
+            "type": "heartbeat",
+            "roots": self.roots,
+            "recorders": {
+                cam_id: {
+                    "name": recorder.cam_name,
+                    "recording_dir": recorder.recording_dir,
+                    "output_file": recorder.output_file,
+                    "video_start_time": recorder.video_start_time,
+                    "pid": recorder.process.pid if recorder.process else None,
+                    "health": recorder.get_health(),
+                }
+                for cam_id, recorder in list(self.recorders.items())
+            },
+        }
+
+
+def run_recorder_node(argv):
+    """Entry point of a recorder node process (dispatched from main.py)."""
+    parser = argparse.ArgumentParser(prog="recorder-node")
+    parser.add_argument("--recorder-node", action="store_true")
+    parser.add_argument("--node-id", type=int, required=True)
+    parser.add_argument("--ipc", required=True)
+    parser.add_argument("--recording-folder", action="append",
+                        help="record here instead of the configured folders (repeatable)")
+    args = parser.parse_args(argv)
+
+    # Each node keeps its own open-segment register next to the others'
+    from utils.recording_journal import set_register_tag
+    set_register_tag(f"node{args.node_id}")
+
+    from PyQt5.QtCore import QCoreApplication
+    from utils.helper import collect_open_segments, recover_open_segments_async
+    app = QCoreApplication(sys.argv[:1])
+
+    node = RecorderNode(args.node_id, args.recording_folder)
+    recover_open_segments_async(collect_open_segments(node.roots))
+
+    client = IpcClient(parse_address(args.ipc), authkey_from_env(), f"node-{args.node_id}")
+
+    def on_message(msg):
+        if msg.get("type") == "shutdown":
+            app.quit()
+        else:
+            node.handle(msg)
+
+    client.messageReceived.connect(on_message)
+    # Coordinator gone (crash or exit) → stop recording rather than linger unsupervised
+    client.disconnected.connect(app.quit)
+
+    heartbeat = QTimer()
+    heartbeat.timeout.connect(lambda: client.send(node.status()))
+    heartbeat.start(HEARTBEAT_MS)
+    log.info(f"[Node {args.node_id}] Recorder node up (pid {os.getpid()}), roots: {', '.join(node.roots)}")
+
+    exit_code = app.exec_()
+    heartbeat.stop()
+    node.stop_all()
+    client.close()
+    log.info(f"[Node {args.node_id}] Recorder node exiting ({exit_code}).")
+    os._exit(exit_code)
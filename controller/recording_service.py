@@ -0,0 +1,384 @@
+# camera_app/controller/recording_service.py
+"""
+Headless recording service.
+
+With `recording_service` enabled the recorders do not live in the GUI
+process. They run in a service process with no windows:
+
+    main.py --recording-service
+
+It records every enabled camera with recording on, straight from the
+configuration. Nothing waits for a display stream to connect. It keeps
+recording when the viewer restarts after a config change, crashes, or is
+frozen because the dongle was pulled. The first GUI that finds no service
+launches one detached, so it outlives the GUI.
+
+The GUI attaches over local IPC (RecordingServiceClient):
+
+    GUI → service : reload (configuration changed), motion, shutdown
+    service → GUI : heartbeat (recording roots + per-camera status)
+
+The service listens on a fixed loopback port (`recording_service_port`)
+so a restarted GUI can find it again. Both sides use a key kept in the
+data directory. A second service finds the port taken and exits.
+
+The service stops only when asked (stop_recording_service): by a GUI
+that starts with `recording_service` off, before it records itself, or
+from the command line (exit, uninstall):
+
+    main.py --stop-recording-service
+
+The GUI shows the service's cameras through the same RemoteRecorder
+stand-ins it uses for recorder nodes. The service runs the storage
+watchdogs of the recording roots and closes its own open segments after
+a crash. The GUI journals only its own mosaic recordings, in a separate
+register. If recorder nodes are configured, the service coordinates them
+instead of recording in-process.
+
+The service decodes nothing: cameras in motion mode follow the motion
+state the attached GUI sends with every heartbeat (passed on to nodes).
+With no GUI attached they are recorded continuously.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from multiprocessing.connection import AuthenticationError, Client
+from PyQt5.QtCore import QObject, QTimer
+from utils.ipc import IpcServer, IpcClient, IPC_HOST, new_authkey
+from utils.logging import log
+from utils.paths import get_data_dir, get_self_command
+from utils.subproc import win_no_window_kwargs
+from controller.recorder_node import (
+    RecorderNode, RecorderNodeManager, RemoteRecorder, recorder_spec, HEARTBEAT_MS,
+)
+
+SERVICE_KEY_FILE = "recording_service.key"
+CONNECT_RETRY_MS = 1000
+SERVICE_START_S = 30.0      # a launched service gets this long to start listening
+SERVICE_STOP_S = 30.0       # a service asked to stop gets this long to close its segments
+STAGGER_MS = 500            # between recorder starts, like the GUI's staggered streams
+
+
+def service_authkey():
+    """Key shared by the service and every GUI of this installation (created on first use)."""
+    path = os.path.join(get_data_dir(), SERVICE_KEY_FILE)
+    try:
+        with open(path) as f:
+            return bytes.fromhex(f.read().strip())
+    except (OSError, ValueError):
+        key = new_authkey()
+        with open(path, "w") as f:
+            f.write(key.hex())
+        return key
+
+
+def service_address(config_mgr):
+    return (IPC_HOST, config_mgr.get_recording_service_port())
+
+
+def stop_recording_service(config_mgr, timeout_s=SERVICE_STOP_S):
+    """Ask a running service to stop and wait until it has closed its segments.
+
+    Returns False if no service was running. Blocking; used at GUI startup
+    and from the command line, before any Qt event loop runs.
+    """
+    address = service_address(config_mgr)
+    try:
+        conn = Client(address, authkey=service_authkey())
+    except (OSError, EOFError, AuthenticationError):
+        return False
+    log.info(f"[Service] Stopping the recording service at {address[0]}:{address[1]}")
+    deadline = time.monotonic() + timeout_s
+    try:
+        conn.send({"type": "hello", "peer": f"stop-{os.getpid()}", "pid": os.getpid()})
+        conn.send({"type": "shutdown"})
+        # The service drops its connections once its recorders are stopped and journaled
+        while time.monotonic() < deadline:
+            if conn.poll(max(0.0, deadline - time.monotonic())):
+                conn.recv()
+    except (OSError, EOFError):
+        log.info("[Service] Recording service stopped")
+        return True
+    finally:
+        conn.close()
+    log.warning(f"[Service] Recording service did not stop within {timeout_s:.0f}s")
+    return True
+
+
+# ---------------------------------------------------------------------- #
+#  Service side                                                            #
+# ---------------------------------------------------------------------- #
+
+class RecordingService(QObject):
+    """Records the configured cameras and reports on them to attached GUIs."""
+
+    def __init__(self, server, parent=None):
+        super().__init__(parent)
+        self._server = server
+        self._server.messageReceived.connect(self._on_message)
+        self._server.peerConnected.connect(lambda peer: log.info(f"[Service] GUI attached ({peer})"))
+        self._server.peerDisconnected.connect(lambda peer: log.info(f"[Service] GUI detached ({peer})"))
+        self.node = None
+        self.nodes = None
+        self._specs = {}          # cam_id -> spec being recorded
+        self._queue = []          # specs waiting for their staggered start
+        self._heartbeat = QTimer(self)
+        self._heartbeat.timeout.connect(lambda: self._server.broadcast(self.status()))
+        self._heartbeat.start(HEARTBEAT_MS)
+        self.reload()
+
+    def reload(self):
+        """Bring the recorders in line with the configuration on disk."""
+        from config.config_manager import ConfigManager
+        from config.stream_config_manager import CameraStreamConfigManager
+        config_mgr = ConfigManager()
+        stream_config = CameraStreamConfigManager()
+
+        roots = config_mgr.get_recording_folders()
+        if self.node is None or self.node.roots != roots:
+            if self.node is not None:
+                log.info("[Service] Recording folders changed — restarting all recorders")
+                self._stop_everything()
+            self.node = RecorderNode(0, roots, watch_storage=True)
+            self.node.label = "Service"
+            remote_nodes = config_mgr.get_remote_recorder_nodes()
+            if config_mgr.get_recorder_nodes() > 0 or remote_nodes:
+                self.nodes = RecorderNodeManager(
+                    config_mgr.get_recorder_nodes(),
+                    remote_nodes,
+                    listen=config_mgr.get_recorder_node_listen(),
+                    authkey_hex=config_mgr.get_recorder_node_authkey(),
+                    parent=self,
+                )
+                # the watchdogs are this process's: pressure must reach the nodes' recorders
+                self.node.remote = self.nodes
+
+        wanted = {}
+        for cam_id in range(1, config_mgr.get_camera_count() + 1):
+            spec = recorder_spec(cam_id, stream_config.get_camera_config(cam_id), config_mgr,
+                                 self.node.storage_pressure)
+            if spec:
+                wanted[cam_id] = spec
+        for cam_id, spec in list(self._specs.items()):
+            if not _same_camera(spec, wanted.get(cam_id)):
+                log.info(f"[Service] Camera {cam_id} {'changed' if cam_id in wanted else 'removed'} — stopping its recorder")
+                self._stop(cam_id)
+        self._queue = [spec for cam_id, spec in wanted.items() if cam_id not in self._specs]
+        log.info(f"[Service] {len(wanted)} camera(s) to record, {len(self._queue)} to start")
+        self._start_next()
+
+    def _start_next(self):
+        if not self._queue:
+            return
+        spec = self._queue.pop(0)
+        self._specs[spec["cam_id"]] = spec
+        if self.nodes:
+            self.nodes.start_recorder(spec)
+        else:
+            self.node.start_recorder(spec)
+        if self._queue:
+            QTimer.singleShot(STAGGER_MS, self._start_next)
+
+    def _stop(self, cam_id):
+        self._specs.pop(cam_id, None)
+        if self.nodes:
+            self.nodes.stop_recorder(cam_id)
+        else:
+            self.node.stop_recorder(cam_id)
+
+    def _stop_everything(self):
+        self._queue = []
+        self._specs.clear()
+        if self.nodes:
+            self.nodes.shutdown()
+            self.nodes.deleteLater()
+            self.nodes = None
+            self.node.remote = None
+        self.node.stop_all()
+
+    def _on_message(self, peer_id, msg):
+        kind = msg.get("type")
+        if kind == "reload":
+            self.reload()
+        elif kind == "motion":
+            from core.motion import get_motion_hub
+            get_motion_hub().merge(msg.get("motion") or {})
+        elif kind == "shutdown":
+            log.info(f"[Service] Shutdown requested by {peer_id}")
+            from PyQt5.QtCore import QCoreApplication
+            QCoreApplication.quit()
+
+    def status(self):
+        status = self.node.status()
+        if self.nodes:
+            status["roots"] = list(dict.fromkeys(status["roots"] + self.nodes.roots()))
+            status["recorders"] = {
+                cam_id: {
+                    "name": recorder.cam_name,
+                    "recording_dir": recorder.recording_dir,
+                    "output_file": recorder.output_file,
+                    "video_start_time": recorder.video_start_time,
+                    "health": recorder.get_health(),
+                }
+                for cam_id, recorder in list(self.nodes.recorders.items())
+            }
+        return status
+
+    def shutdown(self):
+        self._heartbeat.stop()
+        self._stop_everything()
+        from utils.recording_journal import get_journal
+        get_journal().flush()
+        # Closing the connections last tells stop_recording_service() the segments are closed
+        self._server.close()
+
+
+def _same_camera(spec, other):
+    """Same recording settings (disk pressure at start time does not count)."""
+    if other is None:
+        return False
+    return dict(spec, storage_pressure=None) == dict(other, storage_pressure=None)
+
+
+def run_recording_service(argv):
+    """Entry point of the recording service process (dispatched from main.py)."""
+    parser = argparse.ArgumentParser(prog="recording-service")
+    parser.add_argument("--recording-service", action="store_true")
+    parser.parse_args(argv)
+
+    from utils.recording_journal import set_register_tag
+    set_register_tag("service")
+
+    from PyQt5.QtCore import QCoreApplication
+    from config.config_manager import ConfigManager
+    from utils.helper import collect_open_segments, recover_open_segments_async
+    app = QCoreApplication(sys.argv[:1])
+
+    address = service_address(ConfigManager())
+    try:
+        server = IpcServer(service_authkey(), address)
+    except OSError as e:
+        log.info(f"[Service] Not starting — {address[0]}:{address[1]} is taken, a service is already running? ({e})")
+        os._exit(0)
+
+    recover_open_segments_async(collect_open_segments(ConfigManager().get_recording_folders()))
+    service = RecordingService(server)
+    log.info(f"[Service] Recording service up (pid {os.getpid()}) on {address[0]}:{address[1]}")
+
+    exit_code = app.exec_()
+    service.shutdown()
+    log.info(f"[Service] Recording service exiting ({exit_code}).")
+    os._exit(exit_code)
+
+
+# ---------------------------------------------------------------------- #
+#  GUI side                                                                #
+# ---------------------------------------------------------------------- #
+
+class RecordingServiceClient(QObject):
+    """The GUI's view of the recording service: attaches to it, launching it if needed."""
+
+    def __init__(self, config_mgr, parent=None):
+        super().__init__(parent)
+        self._address = service_address(config_mgr)
+        self._authkey = service_authkey()
+        self._client = None
+        self._launched_at = None
+        self.recorders = {}       # cam_id -> RemoteRecorder
+        self.service_roots = []
+        self._retry = QTimer(self)
+        self._retry.timeout.connect(self._connect)
+        self._motion = QTimer(self)
+        self._motion.timeout.connect(self._send_motion)
+        self._motion.start(HEARTBEAT_MS)
+        self._connect()
+        if self._client is None:
+            self._retry.start(CONNECT_RETRY_MS)
+
+    def _connect(self):
+        try:
+            client = IpcClient(self._address, self._authkey, f"gui-{os.getpid()}")
+        except (OSError, EOFError, AuthenticationError) as e:
+            if self._launched_at is None or time.monotonic() - self._launched_at > SERVICE_START_S:
+                if self._launched_at is not None:
+                    log.warning(f"[Service] Recording service did not come up ({e}) — launching it again")
+                self._launch()
+            return
+        self._retry.stop()
+        self._launched_at = None
+        self._client = client
+        client.messageReceived.connect(self._on_message)
+        client.disconnected.connect(self._on_disconnected)
+        # The GUI restarts after every configuration change: let the service pick it up
+        client.send({"type": "reload"})
+        log.info(f"[Service] Attached to recording service at {self._address[0]}:{self._address[1]}")
+
+    def _launch(self):
+        """Start the service detached, so it keeps recording when this GUI exits."""
+        kwargs = win_no_window_kwargs()
+        if os.name == "nt":
+            kwargs["creationflags"] = kwargs.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        proc = subprocess.Popen(
+            get_self_command("--recording-service"),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **kwargs
+        )
+        self._launched_at = time.monotonic()
+        log.info(f"[Service] Launched recording service (pid {proc.pid})")
+
+    def _on_disconnected(self):
+        log.warning("[Service] Lost the recording service — reconnecting")
+        self._client = None
+        for recorder in self.recorders.values():
+            recorder.lost()
+        self._retry.start(CONNECT_RETRY_MS)
+
+    def _on_message(self, msg):
+        if msg.get("type") != "heartbeat":
+            return
+        self.service_roots = list(msg.get("roots") or [])
+        reported = msg.get("recorders") or {}
+        for cam_id in list(self.recorders):
+            if cam_id not in reported:
+                del self.recorders[cam_id]
+        for cam_id, status in reported.items():
+            recorder = self.recorders.get(cam_id)
+            if recorder is None:
+                recorder = self.recorders[cam_id] = RemoteRecorder(self, None, {"cam_id": cam_id, "name": status.get("name")})
+            recorder.update(status)
+
+    def send_to(self, node_id, msg):
+        # RemoteRecorder controls; the service manages quality itself
+        return False
+
+    def stop_recorder(self, cam_id):
+        pass   # recording does not stop with the viewer
+
+    def roots(self):
+        return list(self.service_roots)
+
+    def _send_motion(self):
+        """The service's recorders in motion mode follow what this GUI's detectors see."""
+        from core.motion import get_motion_hub
+        snapshot = get_motion_hub().snapshot()
+        if self._client and snapshot:
+            self._client.send({"type": "motion", "motion": snapshot})
+
+    def close(self):
+        """Detach; the service keeps recording."""
+        self._retry.stop()
+        self._motion.stop()
+        if self._client:
+            try:
+                self._client.disconnected.disconnect()
+            except TypeError:
+                pass
+            self._client.close()
+            self._client = None
@@ -0,0 +1,226 @@
+# camera_app/controller/window_process.py
+"""
+Out-of-process camera windows for large (two-window) layouts.
+
+With 32+ cameras both CameraWindows used to share one GUI thread, so every
+frame of every tile was painted behind a single GIL. When the
+`window_processes` option is on, AppController keeps the main window
+in-process and launches each secondary window as a child process of the
+same executable:
+
+    main.py --window-host --window-id 1 --cams 33,...,64 --rows 4 --cols 4 --ipc 127.0.0.1:PORT
+
+The child talks to the coordinator over utils.ipc:
+    child → coordinator : heartbeat (with the window's motion snapshot), camera_status
+    coordinator → child : hide, show, shutdown
+
+A child that stops sending heartbeats (hung GUI thread) or dies with a
+non-zero exit code is killed and relaunched without touching other windows.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from utils.ipc import (
+    IpcServer, IpcClient, new_authkey, authkey_from_env,
+    format_address, parse_address, AUTHKEY_ENV,
+)
+from utils.logging import log
+from core.motion import get_motion_hub
+from utils.paths import get_self_command
+from utils.subproc import win_no_window_kwargs, kill_process_tree
+
+HEARTBEAT_MS = 2000
+HANG_TIMEOUT_S = 20.0       # no heartbeat for this long → window is considered hung
+STARTUP_GRACE_S = 30.0      # allowance for the first heartbeat after launch
+RESPAWN_COOLDOWN_S = 10.0
+
+
+class WindowProcessManager(QObject):
+    """Coordinator side: launches, watches and relaunches window processes."""
+
+    cameraConnectionChanged = pyqtSignal(int, bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._authkey = new_authkey()
+        self._server = IpcServer(self._authkey)
+        self._server.messageReceived.connect(self._on_message)
+        self._children = {}   # window_id -> dict(spec, proc, last_seen, spawned_at)
+        self._stopping = False
+
+        self._watchdog = QTimer(self)
+        self._watchdog.timeout.connect(self._check_children)
+        self._watchdog.start(5000)
+
+    def spawn(self, window_id, cam_ids, rows, cols):
+        spec = (window_id, list(cam_ids), rows, cols)
+        cmd = get_self_command(
+            "--window-host",
+            "--window-id", str(window_id),
+            "--cams", ",".join(str(c) for c in cam_ids),
+            "--rows", str(rows),
+            "--cols", str(cols),
+            "--ipc", format_address(self._server.address),
+        )
+        env = os.environ.copy()
+        env[AUTHKEY_ENV] = self._authkey.hex()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            **win_no_window_kwargs()
+        )
+        now = time.monotonic()
+        self._children[window_id] = {
+            "spec": spec, "proc": proc,
+            "last_seen": now + STARTUP_GRACE_S, "spawned_at": now,
+        }
+        log.info(f"[WindowProc] Launched window {window_id + 1} (pid {proc.pid}) for cameras {cam_ids[0]}-{cam_ids[-1]}")
+
+    def _on_message(self, peer_id, msg):
+        window_id = _window_id_from_peer(peer_id)
+        child = self._children.get(window_id)
+        if child:
+            child["last_seen"] = max(child["last_seen"], time.monotonic())
+
+        kind = msg.get("type")
+        if kind == "heartbeat" and msg.get("motion"):
+            # the child decodes these cameras; recorders here need their motion state
+            get_motion_hub().merge(msg["motion"])
+        elif kind == "camera_status":
+            self.cameraConnectionChanged.emit(int(msg["cam_id"]), bool(msg["connected"]))
+
+    def _check_children(self):
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for window_id, child in list(self._children.items()):
+            proc = child["proc"]
+            code = proc.poll()
+            if code is not None:
+                if code == 0:
+                    log.info(f"[WindowProc] Window {window_id + 1} closed by user.")
+                    del self._children[window_id]
+                    continue
+                reason = f"exited with code {code}"
+            elif now - child["last_seen"] > HANG_TIMEOUT_S:
+                reason = f"no heartbeat for {now - child['last_seen']:.0f}s"
+                kill_process_tree(proc.pid)
+            else:
+                continue
+
+            if now - child["spawned_at"] < RESPAWN_COOLDOWN_S:
+                continue  # try again on the next watchdog tick
+            log.warning(f"[WindowProc] Window {window_id + 1} {reason} — relaunching.")
+            self.spawn(*child["spec"])
+
+    def broadcast(self, msg):
+        self._server.broadcast(msg)
+
+    def shutdown(self):
+        """Ask every window to close, then make sure none are left behind."""
+        self._stopping = True
+        self._watchdog.stop()
+        self._server.broadcast({"type": "shutdown"})
+        deadline = time.perf_counter() + 2.0
+        for child in self._children.values():
+            proc = child["proc"]
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.perf_counter()))
+            except subprocess.TimeoutExpired:
+                kill_process_tree(proc.pid)
+        self._children.clear()
+        self._server.close()
+
+
+def _window_id_from_peer(peer_id):
+    try:
+        return int(peer_id.split("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------------- #
+#  Child side                                                             #
+# ---------------------------------------------------------------------- #
+
+def run_window_host(argv):
+    """Entry point of a window process (dispatched from main.py)."""
+    parser = argparse.ArgumentParser(prog="window-host")
+    parser.add_argument("--window-host", action="store_true")
+    parser.add_argument("--window-id", type=int, required=True)
+    parser.add_argument("--cams", required=True)
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--cols", type=int, required=True)
+    parser.add_argument("--ipc", required=True)
+    args = parser.parse_args(argv)
+
+    # A mosaic recorder here journals too; keep its open segments in this window's own register
+    # (named after the GUI's when a recording service runs, which must not adopt it while it is live)
+    from utils.recording_journal import set_register_tag
+    from config.config_manager import ConfigManager
+    set_register_tag(f"{'gui-' if ConfigManager().get_recording_service() else ''}window{args.window_id}")
+
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QIcon
+    from config.stream_config_manager import CameraStreamConfigManager
+    from ui.camera_window import CameraWindow
+    from ui.styles import apply_dark_theme
+    from utils.paths import resource_path
+
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
+    app = QApplication(sys.argv[:1])
+    app.setWindowIcon(QIcon(resource_path("assets/logo.png")))
+    apply_dark_theme(app)
+
+    client = IpcClient(parse_address(args.ipc), authkey_from_env(), f"window-{args.window_id}")
+
+    cam_ids = [int(c) for c in args.cams.split(",") if c]
+    window = CameraWindow(
+        f"Camera Viewer (Window {args.window_id + 1})",
+        cam_ids, args.rows, args.cols,
+        CameraStreamConfigManager(),
+    )
+    window.cameraConnectionChanged.connect(
+        lambda cam_id, connected: client.send(
+            {"type": "camera_status", "cam_id": cam_id, "connected": connected}
+        )
+    )
+
+    def on_message(msg):
+        kind = msg.get("type")
+        if kind == "shutdown":
+            window.cleanup_streams(blocking=False)
+            app.quit()
+        elif kind == "hide":
+            window.cleanup_streams(blocking=False)
+            window.hide()
+        elif kind == "show":
+            window._streams_cleaned = False
+            window.showMaximized()
+            window.initialize_streams()
+
+    client.messageReceived.connect(on_message)
+    # Coordinator gone (crash or exit) → this window must not linger.
+    client.disconnected.connect(app.quit)
+
+    # Heartbeat comes from the GUI thread, so a stalled event loop shows up
+    # as missing heartbeats on the coordinator side.
+    heartbeat = QTimer()
+    heartbeat.timeout.connect(lambda: client.send({"type": "heartbeat", "motion": get_motion_hub().snapshot()}))
+    heartbeat.start(HEARTBEAT_MS)
+
+    exit_code = app.exec_()
+    heartbeat.stop()
+    window.cleanup_streams(blocking=False)
+    client.close()
+    log.info(f"[WindowProc] Window {args.window_id + 1} process exiting ({exit_code}).")
+    os._exit(exit_code)
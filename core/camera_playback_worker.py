@@ -1,20 +1,27 @@
 # core/camera_playback_worker.py
 
 import os
-import json
 import subprocess
 import datetime as dt
 from datetime import datetime, time
-from utils.helper import find_recording_file_for_time_range, get_available_metadata_for_camera
+from utils.helper import (
+    find_recording_segments_for_time_range, get_available_metadata_for_camera, get_low_tier_root,
+    segment_anchors, segment_integrity, media_offset,
+)
 from utils.logging import Logger
 import vlc
 from PyQt5.QtCore import QDate, pyqtSignal, QThread, QObject
 from utils.subproc import win_no_window_kwargs
 from utils.paths import get_ffmpeg_path, get_data_dir
+from utils.recording_catalog import get_ready_catalog
+from utils.recording_journal import segments_for_camera, open_segments
+from utils.media_probe import get_media_probe
 
 
 log = Logger.get_logger(name="PlaybackWorker", log_file="pipeline1.log")
 
+MIN_PIECE_S = 0.5           # clean stretches shorter than this between damaged ranges are dropped
+
 class FFmpegWorker(QThread): 
     finished = pyqtSignal(bool, str)  # success, error_message
 
@@ -47,7 +54,7 @@ class CameraPlaybackWorker(QObject):
     ffmpeg_finished = pyqtSignal(bool, str)  # success, error_message
     video_loaded = pyqtSignal()  # New signal when video is loaded
     
-    def __init__(self, video_widget, recording_folder=None):
+    def __init__(self, video_widget, recording_folder=None, recording_roots=None):
         super().__init__()
         self.vlc_instance = vlc.Instance()
         self.player = self.vlc_instance.media_player_new()
@@ -55,6 +62,10 @@ class CameraPlaybackWorker(QObject):
         self.preview_path = None
         self.preview_filename = None
         self.recording_folder = recording_folder or os.path.join(get_data_dir(), "recordings")
+        # Every volume of the storage pool, each with its low-resolution tier
+        # (kept longer, used where full quality has expired)
+        self.recording_roots = recording_roots or [self.recording_folder]
+        self.low_tier_roots = [get_low_tier_root(root) for root in self.recording_roots]
 
         # Attach VLC output to UI widget
         self.player.set_hwnd(int(self.video_widget.winId()))
@@ -81,75 +92,68 @@ class CameraPlaybackWorker(QObject):
         """
         log.info(f"[Play Full] Request: {cam_name} @ {date_str}, start_time: {real_start_time}")
 
+        result = (False, "No matching video file found for the selected recording.")
+        for root in self.recording_roots + self.low_tier_roots:
+            result = self._play_from_root(root, cam_name, date_str, real_start_time)
+            if result[0]:
+                break
+        return result
+
+    def _play_from_root(self, root, cam_name, date_str, real_start_time):
+        catalog = get_ready_catalog(root)
+        if catalog:
+            video_path = catalog.find_by_start(cam_name, date_str, real_start_time)
+            if video_path and os.path.exists(video_path):
+                return self._play_file(video_path)
+
         # Find the video file based on start time
-        folder_path = os.path.join(self.recording_folder, date_str, cam_name)
+        folder_path = os.path.join(root, date_str, cam_name)
         if not os.path.exists(folder_path):
             return False, f"Recording folder not found: {folder_path}"
-        
+
         # Look for the video file that matches this start time
-        for filename in os.listdir(folder_path):
-            if filename.endswith("_metadata.json"):
-                metadata_path = os.path.join(folder_path, filename)
-                try:
-                    with open(metadata_path, "r") as f:
-                        metadata = json.load(f)
-                    
-                    if metadata["start_time"] == real_start_time:
-                        # Found the matching metadata, get the video file
-                        video_filename = filename.replace("_metadata.json", ".mp4")
-                        video_path = os.path.join(folder_path, video_filename)
-                        
-                        if os.path.exists(video_path):
-                            log.info(f"[Play Full] Playing: {video_path}")
-                            self.player.stop()  # stop any previous playback
-                            media = self.vlc_instance.media_new(video_path)
-                            self.player.set_media(media)
-                            self.player.play()
-                            self.video_loaded.emit()  # Notify that video is loaded
-                            return True, None
-                        else:
-                            return False, f"Video file not found: {video_path}"
-                            
-                except Exception as e:
-                    log.warning(f"Failed to read metadata: {metadata_path} — {e}")
-                    continue
-        
+        for video_path, metadata in segments_for_camera(os.path.join(root, date_str), cam_name):
+            if metadata["start_time"] == real_start_time:
+                if os.path.exists(video_path):
+                    return self._play_file(video_path)
+                return False, f"Video file not found: {video_path}"
+
         return False, "No matching video file found for the selected recording."
 
+    def _play_file(self, video_path):
+        integrity = segment_integrity(video_path) or {}
+        if integrity.get("status") == "unreadable":
+            log.warning(f"[Play Full] Not playing {video_path} — marked unreadable: {'; '.join(integrity.get('issues') or [])}")
+            return False, "This recording is damaged and cannot be played."
+        log.info(f"[Play Full] Playing: {video_path}")
+        self.player.stop()  # stop any previous playback
+        media = self.vlc_instance.media_new(video_path)
+        self.player.set_media(media)
+        self.player.play()
+        self.video_loaded.emit()  # Notify that video is loaded
+        return True, None
+
     def preview_clip(self, cam_name, date_str, start_time, end_time):
         log.info(f"[Preview] Request: {cam_name} @ {date_str} from {start_time.toString()} to {end_time.toString()}")
 
-        video_path, metadata_path, recording_start = find_recording_file_for_time_range(
-            cam_name, date_str, start_time, end_time, recordings_root=self.recording_folder
-        )
+        segments = self._find_segments(self.recording_roots, cam_name, date_str, start_time, end_time)
+        if not segments:
+            # Full quality may have expired; fall back to the low-resolution tier
+            segments = self._find_segments(self.low_tier_roots, cam_name, date_str, start_time, end_time)
 
-        if not video_path or not os.path.exists(metadata_path):
+        if not segments:
             log.warning("No matching video or metadata file found.")
             get_available_metadata_for_camera(cam_name, date_str, recordings_root=self.recording_folder)
             return False, "No recording found for selected time."
 
         try:
-            # Load metadata and compute offset/duration
-            with open(metadata_path, "r") as f:
-                metadata = json.load(f)
-
-            recording_start = datetime.fromisoformat(metadata["start_time"])
-
-            clip_start_dt = datetime.combine(recording_start.date(), start_time.toPyTime())
-            clip_end_dt = datetime.combine(recording_start.date(), end_time.toPyTime())
-            
-            if clip_start_dt < recording_start:
-                clip_start_dt = recording_start
+            day = segments[0][1].date()
+            clip_start_dt = max(datetime.combine(day, start_time.toPyTime()), segments[0][1])
+            clip_end_dt = min(datetime.combine(day, end_time.toPyTime()), segments[-1][2])
 
             if clip_end_dt <= clip_start_dt:
                 return False, "End time must be after start time."
 
-            offset_seconds = (clip_start_dt - recording_start).total_seconds()
-            duration_seconds = (clip_end_dt - clip_start_dt).total_seconds()
-
-            if offset_seconds < 0 or duration_seconds <= 0:
-                return False, "Invalid time range or clip duration."
-
             # Prepare temp clip path
             user_start_str = start_time.toString("HH_mm_ss")
             user_end_str = end_time.toString("HH_mm_ss")
@@ -158,13 +162,32 @@ class CameraPlaybackWorker(QObject):
             os.makedirs(_temp_dir, exist_ok=True)
             self.preview_path = os.path.join(_temp_dir, self.preview_filename)
 
-            cmd = [
-                get_ffmpeg_path(), "-ss", str(offset_seconds), "-i", video_path,
-                "-t", str(duration_seconds), "-c", "copy",
-                "-avoid_negative_ts", "make_zero",
-                self.preview_path
-            ]
-            
+            # Wall-clock anchors journaled by the recorder place the cut points
+            # exactly, even if the file started late or its clock drifted;
+            # ranges the integrity check found broken are left out
+            pieces = self._clip_pieces(segments, clip_start_dt, clip_end_dt)
+            if not pieces:
+                return False, "The recording for this time is damaged and cannot be played."
+            if len(pieces) == 1:
+                video_path, inpoint, outpoint = pieces[0]
+                cmd = [get_ffmpeg_path(), "-y", "-ss", str(inpoint), "-i", video_path]
+                if outpoint is not None:
+                    cmd += ["-t", str(outpoint - inpoint)]
+                cmd += ["-c", "copy", "-avoid_negative_ts", "make_zero", self.preview_path]
+            else:
+                # Several segments, or one with a hole: stitch the pieces with the concat demuxer
+                list_path = os.path.join(_temp_dir, self.preview_filename.replace(".mp4", "_concat.txt"))
+                self._write_concat_list(list_path, pieces)
+                cmd = [
+                    get_ffmpeg_path(), "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                    "-c", "copy", "-avoid_negative_ts", "make_zero",
+                    self.preview_path
+                ]
+            log.info(
+                f"[Preview] Clip {clip_start_dt.time()} → {clip_end_dt.time()} from {len(segments)} segment(s), "
+                f"{len(pieces)} piece(s)"
+            )
+
             # Emit signal that FFmpeg is starting
             self.ffmpeg_started.emit()
             
@@ -177,6 +200,49 @@ class CameraPlaybackWorker(QObject):
             log.exception("[Preview] Error occurred")
             return False, f"Failed to preview: {str(e)}"
 
+    @staticmethod
+    def _find_segments(roots, cam_name, date_str, start_time, end_time):
+        """Segments from every root (a camera may have moved volumes during the day)."""
+        segments = []
+        for root in roots:
+            segments += find_recording_segments_for_time_range(
+                cam_name, date_str, start_time, end_time, recordings_root=root
+            )
+        return sorted(segments, key=lambda seg: seg[1])
+
+    @staticmethod
+    def _clip_pieces(segments, clip_start_dt, clip_end_dt):
+        """[(video_path, inpoint, outpoint or None)] covering the clip, minus the bad ranges of each segment."""
+        pieces = []
+        for i, (video_path, seg_start, _) in enumerate(segments):
+            anchors = segment_anchors(video_path)
+            inpoint = media_offset(seg_start, clip_start_dt, anchors) if i == 0 and clip_start_dt > seg_start else 0.0
+            outpoint = media_offset(seg_start, clip_end_dt, anchors) if i == len(segments) - 1 else None
+            good = [(inpoint, outpoint if outpoint is not None else float("inf"))]
+            integrity = segment_integrity(video_path) or {}
+            for bad_start, bad_end in integrity.get("bad_ranges") or []:
+                bad_end = float("inf") if bad_end is None else bad_end
+                good = [
+                    part for start, end in good
+                    for part in ((start, min(end, bad_start)), (max(start, bad_end), end))
+                    if part[1] - part[0] >= MIN_PIECE_S
+                ]
+            if integrity.get("status") not in (None, "ok"):
+                log.warning(f"[Preview] Skipping damaged parts of {video_path}: {integrity.get('bad_ranges')}")
+            pieces += [(video_path, start, None if end == float("inf") else end) for start, end in good]
+        return pieces
+
+    @staticmethod
+    def _write_concat_list(list_path, pieces):
+        with open(list_path, "w", encoding="utf-8") as f:
+            for video_path, inpoint, outpoint in pieces:
+                escaped = os.path.abspath(video_path).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if inpoint > 0:
+                    f.write(f"inpoint {inpoint:.3f}\n")
+                if outpoint is not None:
+                    f.write(f"outpoint {outpoint:.3f}\n")
+
     def extract_clip(self, target_path):
         if not self.preview_path or not os.path.exists(self.preview_path):
             return False, "Preview file does not exist."
@@ -198,54 +264,122 @@ class CameraPlaybackWorker(QObject):
         return self.preview_filename or ""
 
     def get_metadata_for_display(self, cam_name, date_str):
-        folder_path = os.path.join(self.recording_folder, date_str, cam_name)
+        """Recordings of a camera on a day: full quality, or the low tier if none is left."""
+        entries = [e for root in self.recording_roots for e in self._metadata_entries(root, cam_name, date_str)]
+        if not entries:
+            entries = [e for root in self.low_tier_roots for e in self._metadata_entries(root, cam_name, date_str)]
+            for entry in entries:
+                entry["tier"] = "low"
+        return sorted(entries, key=lambda e: e["real_start"])
+
+    def _metadata_entries(self, root, cam_name, date_str):
+        folder_path = os.path.join(root, date_str, cam_name)
         entries = []
 
+        catalog = get_ready_catalog(root)
+        if catalog:
+            for row in catalog.segments_for_day(cam_name, date_str):
+                duration = row["duration"]
+                if duration is None:
+                    # still being written: the catalog size is from when it opened
+                    try:
+                        size = os.path.getsize(row["path"])
+                    except OSError:
+                        continue
+                else:
+                    size = row["size"]
+                if size < 1024:  # skip empty/failed recordings
+                    continue
+                start = datetime.fromisoformat(row["start_time"])
+                end = start + dt.timedelta(seconds=duration) if duration else None
+                entries.append({
+                    "file": os.path.basename(row["path"]),
+                    "start": start.strftime("%H:%M"),
+                    "end": end.strftime("%H:%M") if end else "🔴 Ongoing",
+                    "real_start": row["start_time"],
+                    "duration": duration,
+                    "trigger": row["event"]
+                })
+            return self._probe_unclosed(root, date_str, cam_name, entries)
+
         if not os.path.exists(folder_path):
             return []
 
-        for filename in sorted(os.listdir(folder_path)):
-            if filename.endswith("_metadata.json"):
-                try:
-                    # Check if the corresponding MP4 exists and has actual data
-                    video_file = filename.replace("_metadata.json", ".mp4")
-                    video_path = os.path.join(folder_path, video_file)
-                    if not os.path.exists(video_path):
-                        continue
-                    video_size = os.path.getsize(video_path)
-                    if video_size < 1024:  # skip files < 1KB (empty/failed recordings)
-                        log.info(f"[Metadata Debug] Skipping {video_file}: file too small ({video_size} bytes)")
-                        continue
+        for video_path, meta in segments_for_camera(os.path.join(root, date_str), cam_name):
+            video_file = os.path.basename(video_path)
+            try:
+                # Check that the MP4 exists and has actual data
+                if not os.path.exists(video_path):
+                    continue
+                video_size = os.path.getsize(video_path)
+                if video_size < 1024:  # skip files < 1KB (empty/failed recordings)
+                    log.info(f"[Metadata Debug] Skipping {video_file}: file too small ({video_size} bytes)")
+                    continue
+
+                start = datetime.fromisoformat(meta["start_time"])
+                duration = meta.get("duration_seconds")
+                end = start + dt.timedelta(seconds=duration) if duration else None
+                log.info(f"[Metadata Debug] Processing {video_file}: real_start={meta['start_time']}, duration={duration}")
+                entries.append({
+                    "file": video_file,
+                    "start": start.strftime("%H:%M"),
+                    "end": end.strftime("%H:%M") if end else "🔴 Ongoing",
+                    "real_start": meta["start_time"],  # ISO string
+                    "duration": duration,              # seconds (float)
+                    "trigger": meta.get("trigger")     # "motion" for motion events
+                })
+            except Exception as e:
+                log.warning(f"Failed to read metadata for {video_file} — {e}")
+        return self._probe_unclosed(root, date_str, cam_name, entries)
 
-                    with open(os.path.join(folder_path, filename), "r") as f:
-                        meta = json.load(f)
-                    start = datetime.fromisoformat(meta["start_time"])
-                    duration = meta.get("duration_seconds")
-                    end = start + dt.timedelta(seconds=duration) if duration else None
-                    log.info(f"[Metadata Debug] Processing {filename}: real_start={meta['start_time']}, duration={duration}")
-                    entries.append({
-                        "file": video_file,
-                        "start": start.strftime("%H:%M"),
-                        "end": end.strftime("%H:%M") if end else "🔴 Ongoing",
-                        "real_start": meta["start_time"],  # ISO string
-                        "duration": duration               # seconds (float)
-                    })
-                except Exception as e:
-                    log.warning(f"Failed to read metadata: {filename} — {e}")
+    @staticmethod
+    def _probe_unclosed(root, date_str, cam_name, entries):
+        """Fill in the length of segments never closed that are no longer being written."""
+        open_paths = open_segments(root)
+        if open_paths is None:
+            return entries
+        folder_path = os.path.join(root, date_str, cam_name)
+        pending = {
+            os.path.join(folder_path, e["file"]): e for e in entries
+            if e["duration"] is None and os.path.join(folder_path, e["file"]) not in open_paths
+        }
+        if not pending:
+            return entries
+        for video_path, info in get_media_probe().probe_many(list(pending)).items():
+            if info and info["duration"]:
+                entry = pending[video_path]
+                entry["duration"] = info["duration"]
+                end = datetime.fromisoformat(entry["real_start"]) + dt.timedelta(seconds=info["duration"])
+                entry["end"] = end.strftime("%H:%M")
         return entries
 
     @staticmethod
-    def get_available_recording_dates(cam_name, root=None):
+    def get_available_recording_dates(cam_name, root=None, roots=None):
         """
-        Returns a list of QDate objects where recordings exist for this camera.
+        Returns a list of QDate objects where recordings exist for this camera
+        (in `root`, or in any of `roots`, including their low-resolution tiers).
         """
-        if root is None:
-            root = os.path.join(get_data_dir(), "recordings")
+        dates = set()
+        for root in roots or [root]:
+            if root is None:
+                root = os.path.join(get_data_dir(), "recordings")
+            dates.update(CameraPlaybackWorker._recording_dates(root, cam_name))
+            dates.update(CameraPlaybackWorker._recording_dates(get_low_tier_root(root), cam_name))
+        return sorted(dates)
+
+    @staticmethod
+    def _recording_dates(root, cam_name):
+        available_dates = set()
 
-        available_dates = []
+        catalog = get_ready_catalog(root)
+        if catalog:
+            for day in catalog.dates(cam_name):
+                year, month, day_num = map(int, day.split("_"))
+                available_dates.add(QDate(year, month, day_num))
+            return available_dates
 
         if not os.path.exists(root):
-            return []
+            return available_dates
 
         for folder_name in os.listdir(root):
             folder_path = os.path.join(root, folder_name)
@@ -258,7 +392,7 @@ class CameraPlaybackWorker(QObject):
 
             try:
                 year, month, day = map(int, folder_name.split("_"))
-                available_dates.append(QDate(year, month, day))
+                available_dates.add(QDate(year, month, day))
             except ValueError:
                 continue
 
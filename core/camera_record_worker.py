@@ -1,20 +1,62 @@
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QObject, pyqtSignal
 import os
 import subprocess
 import datetime
 import time
 import re
+import csv
+import threading
+from collections import deque
 from utils.logging import log
 import json
-from utils.helper import sanitize_filename, save_metadata
+from utils.helper import sanitize_filename, save_metadata, get_low_tier_root
+from utils.recording_catalog import get_catalog
+from utils.recording_journal import get_journal
+from core.encoder_budget import EncoderProfile
+from core.recording_profile import DEFAULT_RECORDING_PROFILE, describe, video_args
+from core.recorder_telemetry import RecorderTelemetry
+from core.recorder_scheduler import get_recorder_scheduler, BUSY_RETRY_S
+from core.motion import TsGopSplitter, MotionEventWriter, get_motion_hub, TS_PACKET
 from utils.subproc import win_no_window_kwargs, kill_process_tree
 from utils.paths import get_ffmpeg_path, get_data_dir
 
 
-class CameraRecorderWorker(QThread):
+# --- supervision (stepped by core/recorder_scheduler.py) ---
+LAUNCH, RUNNING, DRAINING, BACKOFF, STOPPED = "launch", "running", "draining", "backoff", "stopped"
+HEALTH_CHECK_S = 5       # longest a running recorder goes unchecked (exits wake it at once)
+ROLLOVER_SLACK_S = 1.5   # look for the new segment this long after a clock boundary
+DRAIN_TIMEOUT_S = 5      # ffmpeg gets this long to finish its files after 'q'
+DRAIN_POLL_S = 0.2
+EXIT_WAIT_S = 2          # pipe closed → give the process this long to exit before waking the supervisor
+SLOW_WARN_S = 30         # below realtime this long → warn (once per episode)
+STARTUP_TIMEOUT_S = 30   # no segment file this long after launch → restart
+STALL_TIMEOUT_S = 20     # segment stopped growing and no progress → restart
+BACKOFF_MIN_S = 2        # first restart delay, doubled per consecutive failure
+BACKOFF_MAX_S = 60
+HEALTHY_RUN_S = 60       # a run this long resets the backoff
+
+DEFAULT_ENCODER_PROFILE = EncoderProfile("ultrafast", 23, 0)
+
+# --- low-resolution long-retention tier (second output of the same ffmpeg) ---
+LOW_TIER_HEIGHT = 360
+LOW_TIER_FPS = 5
+LOW_TIER_CRF = 30
+LOW_TIER_SEGMENT_S = 3600   # fewer, longer files: this tier is kept for months
+SEGMENT_MOVFLAGS = "movflags=+frag_keyframe+empty_moov+default_base_moof:flush_packets=1"
+
+# --- wall-clock anchors: (media time in segment, wall-clock time) pairs journaled per segment ---
+ANCHOR_INTERVAL_S = 30      # one anchor per this much media time (plus the first and last)
+ANCHOR_BUFFER = 4000        # progress blocks kept (2 s apart: longer than a low-tier segment)
+
+
+class CameraRecorderWorker(QObject):
+    finished = pyqtSignal()
     recording_finished = pyqtSignal(int)
+    segment_finished = pyqtSignal(int, str)   # cam_id, path of the closed segment
 
-    def __init__(self, cam_id, cam_name, rtsp_url, record_enabled, recording_dir=None):
+    def __init__(self, cam_id, cam_name, rtsp_url, record_enabled, recording_dir=None, segment_seconds=600,
+                 record_mode="continuous", preroll_seconds=5, postroll_seconds=10, low_tier=True,
+                 recording_profile=None):
         super().__init__()
         self.cam_id = cam_id
         self.rtsp_url = rtsp_url
@@ -22,87 +64,623 @@ class CameraRecorderWorker(QThread):
         self.running = False
         self.process = None
         self.recording_dir = recording_dir or os.path.join(get_data_dir(), "recordings")
+        self.segment_seconds = max(60, int(segment_seconds))
         self.video_start_time = None
-        self.metadata_file = None
+        self.output_file = None   # segment currently being written (used by instant replay)
+        self._launched_at = None
+
+        # --- low tier: <recordings>/lowres/<date>/<cam>/, written alongside the main output ---
+        self.low_tier = low_tier
+        self.low_tier_dir = get_low_tier_root(self.recording_dir)
+        self._low_file = None
+        self._low_start = None
+
+        # --- motion mode: ffmpeg streams MPEG-TS to us and only events are written ---
+        self.motion_mode = record_mode == "motion"
+        self.preroll_seconds = preroll_seconds
+        self.postroll_seconds = postroll_seconds
+        self._preroll = deque()          # (wall-clock start, GOP bytes) not yet written
+        self._event = None               # MotionEventWriter of the event being written
+        self._event_lock = threading.Lock()
+        self._no_detector_logged = False
+
+        # --- supervision state ---
+        self._scheduler = get_recorder_scheduler()
+        self._state = STOPPED
+        self._state_lock = threading.Lock()   # step() vs. stop() from the GUI thread
+        self._done = threading.Event()
+        self._done.set()
+        self._run_started = 0.0     # monotonic time of the current ffmpeg launch
+        self._resume_at = 0.0       # end of the restart backoff
+        self._drain_deadline = 0.0
+        self.progress = {}          # last ffmpeg -progress block (frame, fps, speed, out_time_us, ...)
+        self._clock = deque(maxlen=ANCHOR_BUFFER)   # (wall-clock time, output time s) per progress block
+        self.telemetry = RecorderTelemetry()   # rolling fps / speed / bitrate / drops from those blocks
+        self._slow_logged = False
+        self.restarts = 0
+        self._backoff = BACKOFF_MIN_S
+        self._last_progress = 0.0   # monotonic time out_time last advanced
+        self._last_growth = 0.0     # monotonic time the segment last grew
+        self._last_write = None     # wall-clock time of that growth (end of footage)
+        self._last_size = 0
+        self._gap = None            # (start_datetime, reason) while not recording
+        self._segment_extra = None  # gap info journaled with the next segment
+
+        # codec / fps / resolution of the archive (core/recording_profile.py)
+        self.recording_profile = recording_profile or DEFAULT_RECORDING_PROFILE
+        # reduced-quality level under disk pressure; assigned by the controller from the StorageManager
+        self.quality_level = 0
+        self._pending_quality = None
+        self._drain_reason = None
+
+        # x264 settings; assigned by the EncoderBudget (core/encoder_budget.py)
+        self.encoder_profile = DEFAULT_ENCODER_PROFILE
+        self._pending_profile = None
 
         self.cam_name = sanitize_filename(cam_name or f"Camera_{cam_id}")
         log.debug(f"[Recorder] Sanitized camera name: {self.cam_name}")
 
-    def get_output_path(self, timestamp):
-        date_str = timestamp.strftime("%Y_%m_%d")
-        time_str = timestamp.strftime("%H_%M_%S")
-        base_path = os.path.join(self.recording_dir, date_str, self.cam_name)
-        os.makedirs(base_path, exist_ok=True)
+    def get_output_dir(self, day, root=None):
+        return os.path.join(root or self.recording_dir, day.strftime("%Y_%m_%d"), self.cam_name)
+
+    def get_segment_pattern(self, root=None):
+        """strftime pattern for ffmpeg's segment muxer: <root>/<date>/<cam>/<cam>_<date>_<time>.mp4"""
+        root = (root or self.recording_dir).replace("%", "%%")
+        cam = self.cam_name.replace("%", "%%")
+        return os.path.join(root, "%Y_%m_%d", cam, f"{cam}_%Y_%m_%d_%H_%M_%S.mp4")
+
+    def _ensure_day_folders(self, now):
+        # ffmpeg does not create directories, so tomorrow's folder must exist
+        # before the first segment after midnight is opened.
+        for day in (now, now + datetime.timedelta(days=1)):
+            os.makedirs(self.get_output_dir(day), exist_ok=True)
+            if self.low_tier:
+                os.makedirs(self.get_output_dir(day, self.low_tier_dir), exist_ok=True)
 
-        filename = f"{self.cam_name}_{date_str}_{time_str}.mp4"
-        return os.path.join(base_path, filename)
+    def build_ffmpeg_command(self):
+        profile = self.encoder_profile
+        log.info(
+            f"[Recorder] Recording {self.cam_name} as {describe(self.recording_profile)} "
+            f"({'motion events' if self.motion_mode else f'{self.segment_seconds}s segments'}, "
+            f"preset {profile.preset}, crf {self.recording_profile.crf or profile.crf}, "
+            f"threads {profile.threads or 'auto'}"
+            f"{f', reduced quality level {self.quality_level}' if self.quality_level else ''})"
+        )
+        command = [
+            get_ffmpeg_path(), "-nostats", "-progress", "pipe:2" if self.motion_mode else "pipe:1",
+            "-stats_period", "2",
+            "-hwaccel", "none", "-i", self.rtsp_url, "-an",
+        ] + video_args(self.recording_profile, profile, self.quality_level)
+        if self.motion_mode:
+            # Packets come back to _read_packets; GOPs (1 s by default) are the pre-roll granularity
+            command += ["-f", "mpegts", "-muxdelay", "0", "-flush_packets", "1", "pipe:1"]
+        else:
+            command += self._segment_args(self.segment_seconds)
+        if self.low_tier:
+            # Second output from the same decoded input: no extra RTSP session
+            # and no second decode, just a small extra encode
+            command += [
+                "-an", "-vf", f"scale=-2:{LOW_TIER_HEIGHT},fps={LOW_TIER_FPS}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-crf", str(LOW_TIER_CRF),
+                "-threads", "1", "-g", str(LOW_TIER_FPS * 2),
+            ] + self._segment_args(LOW_TIER_SEGMENT_S, self.low_tier_dir)
+        return command
 
-    def build_ffmpeg_command(self, output_file):
-        log.info(f"[Recorder] Using CPU H.264 for {self.cam_name}")
+    def _segment_args(self, segment_seconds, root=None):
+        """Segment muxer output: <root>/<date>/<cam>/<cam>_<date>_<time>.mp4"""
         return [
-            get_ffmpeg_path(), "-hwaccel", "none", "-i", self.rtsp_url, "-an",
-            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
-            "-g", "25", "-f", "mp4", "-movflags", "+faststart+frag_keyframe+empty_moov",
-            output_file
+            # ffmpeg lists each closed segment with its start/end in output
+            # time, which maps the progress blocks' clock onto each file
+            "-segment_list", self._segment_list(root), "-segment_list_type", "csv",
+            # One long-running ffmpeg cuts the stream into fixed-length files at
+            # keyframes on clock boundaries, so consecutive segments have no gap.
+            "-f", "segment", "-segment_time", str(segment_seconds),
+            "-segment_atclocktime", "1", "-reset_timestamps", "1", "-strftime", "1",
+            "-segment_format", "mp4",
+            # default_base_moof keeps fragments self-contained, so instant
+            # replay can copy the tail of a live file without remuxing;
+            # flush_packets puts each fragment on disk as soon as it is written
+            # (the segment muxer otherwise buffers ~256 KB), which replay and
+            # the file-growth check below rely on
+            "-segment_format_options", SEGMENT_MOVFLAGS,
+            self.get_segment_pattern(root)
         ]
 
-    def run(self):
+    def _segment_list(self, root=None):
+        """CSV segment list of one output of the current ffmpeg."""
+        folder = os.path.join(get_data_dir(), "temp", "segment_lists")
+        os.makedirs(folder, exist_ok=True)
+        tier = "_low" if root == self.low_tier_dir else ""
+        return os.path.join(folder, f"{self.cam_id}_{self.cam_name}{tier}.csv")
+
+    def _segment_anchors(self, path, root=None):
+        """[[seconds into the file, wall-clock ISO time]] for a segment, from the progress blocks.
+
+        The segment list gives the file's range in ffmpeg's output time; a
+        file cut short by a kill is not listed yet and starts where the last
+        listed one ended.
+        """
+        name = os.path.basename(path)
+        start = end = None
+        try:
+            with open(self._segment_list(root), newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    if len(row) < 3:
+                        continue
+                    if row[0] == name:
+                        start, end = float(row[1]), float(row[2])
+                        break
+                    start = float(row[2])
+        except (OSError, ValueError):
+            pass
+        start = start or 0.0
+        end = float("inf") if end is None else end
+        points = [(out_time - start, wall) for wall, out_time in list(self._clock) if start <= out_time <= end]
+        anchors = []
+        for i, (media_time, wall) in enumerate(points):
+            if not anchors or media_time - anchors[-1][0] >= ANCHOR_INTERVAL_S or i == len(points) - 1:
+                anchors.append([round(media_time, 3), wall.isoformat(timespec="milliseconds")])
+        return anchors
+
+    def _segment_start(self, path):
+        stamp = os.path.basename(path)[len(self.cam_name) + 1:-len(".mp4")]
+        try:
+            return datetime.datetime.strptime(stamp, "%Y_%m_%d_%H_%M_%S")
+        except ValueError:
+            return None
+
+    def _latest_segment(self, now, root=None):
+        """Newest segment opened by the current ffmpeg process, or None."""
+        floor = self._launched_at - datetime.timedelta(seconds=2)
+        latest = None
+        for day in {now.date(), (now - datetime.timedelta(minutes=1)).date()}:
+            folder = self.get_output_dir(day, root)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if not (name.startswith(self.cam_name + "_") and name.endswith(".mp4")):
+                    continue
+                if latest is None or name > os.path.basename(latest):
+                    path = os.path.join(folder, name)
+                    start = self._segment_start(path)
+                    if start and start >= floor:
+                        latest = path
+        return latest
+
+    def _track_segments(self):
+        """Write metadata when ffmpeg rolls over to a new segment."""
+        now = datetime.datetime.now()
+        self._ensure_day_folders(now)
+        latest = self._latest_segment(now)
+        if not latest or latest == self.output_file:
+            return
+        start_time = self._segment_start(latest)
+        self._finish_segment(start_time)
+        self._close_gap(start_time)
+        self.output_file = latest
+        self.video_start_time = start_time
+        self._last_size = 0
+        save_metadata(latest, start_time, extra=self._journal_extra())
+        log.info(f"[Recorder] Writing to {latest}")
+
+    def _finish_segment(self, end_time):
+        if not (self.output_file and self.video_start_time):
+            return
+        duration_seconds = (end_time - self.video_start_time).total_seconds()
+        extra = self._journal_extra()
+        anchors = None if self.motion_mode else self._segment_anchors(self.output_file)
+        if anchors:
+            extra = dict(extra or {}, anchors=anchors)
+        save_metadata(self.output_file, self.video_start_time, duration_seconds, end_time, extra=extra)
+        self.segment_finished.emit(self.cam_id, self.output_file)
+        self.output_file = None
+        self._segment_extra = None
+
+    def _track_low_tier(self):
+        """Write metadata when the low tier rolls over to a new segment."""
+        latest = self._latest_segment(datetime.datetime.now(), self.low_tier_dir)
+        if not latest or latest == self._low_file:
+            return
+        start_time = self._segment_start(latest)
+        self._finish_low_segment(start_time)
+        self._low_file = latest
+        self._low_start = start_time
+        save_metadata(latest, start_time, extra={"tier": "low"})
+
+    def _finish_low_segment(self, end_time):
+        if not (self._low_file and self._low_start):
+            return
+        extra = {"tier": "low"}
+        anchors = self._segment_anchors(self._low_file, self.low_tier_dir)
+        if anchors:
+            extra["anchors"] = anchors
+        save_metadata(self._low_file, self._low_start,
+                      (end_time - self._low_start).total_seconds(), end_time, extra=extra)
+        self._low_file = None
+
+    def _journal_extra(self):
+        extra = dict(self._segment_extra or {})
+        if self.motion_mode:
+            extra["trigger"] = "motion"
+        if self.quality_level:
+            extra["quality_level"] = self.quality_level
+        return extra or None
+
+    def _close_gap(self, end_time):
+        """Record the stretch without footage that ends at end_time, if any."""
+        if not self._gap:
+            return
+        gap_start, reason = self._gap
+        self._gap = None
+        seconds = max(0.0, (end_time - gap_start).total_seconds())
+        log.warning(f"[Recorder] {self.cam_name}: recording gap of {seconds:.0f}s ({reason})")
+        self._segment_extra = {"gap_before_seconds": round(seconds, 2), "gap_reason": reason}
+        get_journal().gap(self.recording_dir, self.cam_name, gap_start, end_time, reason)
+        catalog = get_catalog(self.recording_dir)
+        if catalog:
+            catalog.record_gap(self.cam_name, gap_start, end_time, reason)
+
+    # ------------------------------------------------------------------ #
+    #  Motion mode                                                         #
+    # ------------------------------------------------------------------ #
+
+    def _read_packets(self, process):
+        """Split ffmpeg's MPEG-TS output into GOPs and route them (runs on a reader thread)."""
+        splitter = TsGopSplitter()
+        gop_start = datetime.datetime.now()
+        try:
+            while True:
+                chunk = process.stdout.read(TS_PACKET * 64)
+                usable = len(chunk) - len(chunk) % TS_PACKET
+                if not usable:
+                    break
+                now = datetime.datetime.now()
+                self._last_growth = time.monotonic()
+                self._last_write = now
+                for gop in splitter.feed(chunk[:usable]):
+                    self._on_gop(gop_start, now, gop, splitter.header())
+                    gop_start = now
+        except (OSError, ValueError):
+            pass
+
+    def _motion_active(self):
+        """True while the camera moved within the post-roll (or has no detector)."""
+        hub = get_motion_hub()
+        if not hub.has_source(self.cam_id):
+            # Nobody decodes this camera (not on screen), so there is nothing to
+            # detect motion from: record everything rather than miss events
+            if not self._no_detector_logged:
+                log.info(f"[Recorder] {self.cam_name}: no motion detector running — recording continuously")
+                self._no_detector_logged = True
+            return True
+        self._no_detector_logged = False
+        since = hub.seconds_since_motion(self.cam_id)
+        return since is not None and since <= self.postroll_seconds
+
+    def _on_gop(self, start, end, gop, header):
+        """Handle one GOP covering wall-clock [start, end)."""
+        with self._event_lock:
+            if self._gap:
+                self._close_gap(start)
+            active = self._motion_active()
+            if self._event:
+                if not self._event.write(gop):
+                    self._close_event(start)
+                elif not active or (end - self.video_start_time).total_seconds() >= self.segment_seconds:
+                    self._close_event(end)
+                return
+            self._preroll.append((start, gop))
+            while self._preroll and (start - self._preroll[0][0]).total_seconds() > self.preroll_seconds:
+                self._preroll.popleft()
+            if active:
+                self._open_event(header)
+
+    def _open_event(self, header):
+        """Start an event file with the pre-roll GOPs (caller holds _event_lock)."""
+        start = self._preroll[0][0]
+        folder = self.get_output_dir(start)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{self.cam_name}_{start.strftime('%Y_%m_%d_%H_%M_%S')}.mp4")
+        self._event = MotionEventWriter(path, header)
+        while self._preroll:
+            self._event.write(self._preroll.popleft()[1])
+        self.output_file = path
+        self.video_start_time = start
+        save_metadata(path, start, extra=self._journal_extra())
+        log.info(f"[Recorder] {self.cam_name}: motion event → {path}")
+
+    def _close_event(self, end_time):
+        """Finish the event file and journal its stop (caller holds _event_lock)."""
+        if self._event:
+            self._event.close()
+            self._event = None
+        self._finish_segment(end_time)
+
+    def _end_output(self, end_time):
+        """Close whatever is being written when ffmpeg stops or restarts."""
+        self._finish_low_segment(end_time)
+        if not self.motion_mode:
+            self._finish_segment(end_time)
+            return
+        with self._event_lock:
+            self._close_event(end_time)
+            self._preroll.clear()
+
+    # ------------------------------------------------------------------ #
+    #  Supervision                                                         #
+    # ------------------------------------------------------------------ #
+
+    def _read_progress(self, process, stream):
+        """Parse ffmpeg's -progress key=value blocks (runs on a small reader thread)."""
+        block = {}
+        try:
+            for raw in stream:
+                key, _, value = raw.decode("utf-8", "replace").strip().partition("=")
+                if key != "progress":
+                    block[key] = value
+                    continue
+                if block.get("out_time_us", "N/A") != self.progress.get("out_time_us"):
+                    self._last_progress = time.monotonic()
+                    if block.get("out_time_us", "N/A").lstrip("-").isdigit():
+                        self._clock.append((datetime.datetime.now(), int(block["out_time_us"]) / 1e6))
+                self.progress = block
+                self.telemetry.feed(block)
+                block = {}
+        except (OSError, ValueError):
+            pass
+        # EOF: ffmpeg is exiting; let the supervisor react now rather than at its next check
+        try:
+            process.wait(timeout=EXIT_WAIT_S)
+        except subprocess.TimeoutExpired:
+            pass
+        self._scheduler.wake(self)
+
+    def _check_health(self, process):
+        """Return why the running ffmpeg should be restarted, or None if it is healthy."""
+        if process.poll() is not None:
+            return f"ffmpeg exited with code {process.returncode}"
+        now = time.monotonic()
+        if self.motion_mode:
+            pass   # _read_packets stamps _last_growth as the stream arrives
+        elif self.output_file:
+            try:
+                size = os.path.getsize(self.output_file)
+            except OSError:
+                size = self._last_size
+            if size != self._last_size:
+                self._last_size = size
+                self._last_growth = now
+                self._last_write = datetime.datetime.now()
+        elif now - self._last_growth > STARTUP_TIMEOUT_S:
+            return f"no output {STARTUP_TIMEOUT_S}s after start"
+        if now - max(self._last_growth, self._last_progress) > STALL_TIMEOUT_S:
+            return f"stalled for {STALL_TIMEOUT_S}s"
+        return None
+
+    def set_encoder_profile(self, profile):
+        """Switch x264 settings; the scheduler restarts ffmpeg to apply them."""
+        if self.recording_profile.codec == "copy":
+            return   # nothing is encoded; a restart would only cost footage
+        if profile != self.encoder_profile:
+            self._pending_profile = profile
+            self._scheduler.wake(self)
+
+    def set_quality_level(self, level):
+        """Record at a reduced-quality level (0 = as configured); applied with a planned restart."""
+        if self.recording_profile.codec == "copy":
+            return
+        if level != (self._pending_quality if self._pending_quality is not None else self.quality_level):
+            self._pending_quality = level
+            self._scheduler.wake(self)
+
+    def get_health(self):
+        """Snapshot for status displays."""
+        return {
+            "recording": bool(self.output_file) and self._gap is None,
+            "restarts": self.restarts,
+            "fps": self.progress.get("fps"),
+            "speed": self.progress.get("speed"),
+            "frame": self.progress.get("frame"),
+            "gap_since": self._gap[0].isoformat() if self._gap else None,
+            "telemetry": self.telemetry.snapshot(),
+        }
+
+    def _report_speed(self):
+        """Log when the encoder falls behind realtime for a while, and when it recovers."""
+        stats = self.telemetry.snapshot()
+        if stats["slow_for_s"] is not None and stats["slow_for_s"] >= SLOW_WARN_S and not self._slow_logged:
+            self._slow_logged = True
+            log.warning(
+                f"[Recorder] {self.cam_name}: encoding below realtime for {stats['slow_for_s']}s "
+                f"(speed {stats['speed']}x, {stats['fps']} fps, {stats['dropped']} dropped)"
+            )
+        elif stats["slow_for_s"] is None and stats["speed"] is not None and self._slow_logged:
+            self._slow_logged = False
+            log.info(f"[Recorder] {self.cam_name}: encoding back to realtime (speed {stats['speed']}x)")
+
+    # ------------------------------------------------------------------ #
+    #  State machine (stepped by the RecorderScheduler thread)             #
+    # ------------------------------------------------------------------ #
+
+    def start(self):
         if not self.record_enabled:
             log.info(f"[Recorder] Recording is disabled for Camera {self.cam_name}")
             return
-
         self.running = True
+        self._state = LAUNCH
+        self._done.clear()
         log.info(f"[Recorder] Starting recording for Camera {self.cam_name}")
+        self._scheduler.add(self)
 
-        while self.running:
-            start_time = datetime.datetime.now()
-            self.video_start_time = start_time
-            output_file = self.get_output_path(start_time)
-            self.metadata_file = output_file.replace(".mp4", "_metadata.json")
-            save_metadata(self.metadata_file, self.video_start_time)
-
-            ffmpeg_cmd = self.build_ffmpeg_command(output_file)
-
-            log.info(f"[Recorder] Writing to {output_file}")
-            self.process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                **win_no_window_kwargs()
-            )
+    def wake(self):
+        """Have the scheduler step this recorder now (e.g. after setting running = False)."""
+        self._scheduler.wake(self)
 
-            # Calculate cutoff time (midnight or 24 hours max)
-            next_midnight = (start_time + datetime.timedelta(days=1)).replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            next_cutoff = min(next_midnight, start_time + datetime.timedelta(hours=24))
-            time_to_sleep = (next_cutoff - datetime.datetime.now()).total_seconds()
+    def isRunning(self):
+        return self._state != STOPPED
 
-            # Sleep in small intervals so stop() is responsive
-            while time_to_sleep > 0 and self.running:
-                time.sleep(min(time_to_sleep, 1.0))
-                time_to_sleep = (next_cutoff - datetime.datetime.now()).total_seconds()
+    def wait(self, msecs=None):
+        """Block until the recorder has fully stopped (QThread.wait compatible)."""
+        return self._done.wait(None if msecs is None else msecs / 1000)
 
-            self.stop_ffmpeg()
-            end_time = datetime.datetime.now()
-            duration_seconds = (end_time - self.video_start_time).total_seconds()
-            save_metadata(self.metadata_file, start_time, duration_seconds, end_time)
+    def step(self):
+        """Do whatever is due; return seconds until the next call, or None when finished."""
+        if not self._state_lock.acquire(blocking=False):
+            return BUSY_RETRY_S     # stop() is running on another thread
+        try:
+            if not self.running:
+                process = self.process
+                if process and process.poll() is None and time.monotonic() < self._drain_deadline:
+                    return DRAIN_POLL_S     # request_stop(): ffmpeg is finishing its files
+                return self._finish()
+            if self._state == LAUNCH:
+                self._launch()
+            elif self._state == RUNNING:
+                self._supervise()
+            elif self._state == DRAINING:
+                self._drain()
+            elif self._state == BACKOFF and time.monotonic() >= self._resume_at:
+                self._launch()
+            return self._next_check()
+        finally:
+            self._state_lock.release()
 
-            if self.running:
-                self.recording_finished.emit(self.cam_id)
+    def _launch(self):
+        self._launched_at = datetime.datetime.now()
+        self._ensure_day_folders(self._launched_at)
+        self._run_started = self._last_growth = self._last_progress = time.monotonic()
+        self._last_write = None
+        self.progress = {}
+        self.telemetry.reset()
+        # output time restarts at 0 with every ffmpeg: old anchors and segment lists no longer apply
+        self._clock.clear()
+        for root in (None, self.low_tier_dir):
+            try:
+                os.remove(self._segment_list(root))
+            except OSError:
+                pass
+        process = self.process = subprocess.Popen(
+            self.build_ffmpeg_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if self.motion_mode else subprocess.DEVNULL,
+            **win_no_window_kwargs()
+        )
+        threading.Thread(
+            target=self._read_progress, daemon=True, name=f"RecorderProgress-{self.cam_id}",
+            args=(process, process.stderr if self.motion_mode else process.stdout),
+        ).start()
+        if self.motion_mode:
+            threading.Thread(
+                target=self._read_packets, args=(process,), daemon=True,
+                name=f"RecorderPackets-{self.cam_id}",
+            ).start()
+        self._state = RUNNING
 
-        log.info(f"[Recorder] Thread for Camera {self.cam_name} has exited.")
+    def _supervise(self):
+        """Notice new segments and catch a dead or hung ffmpeg."""
+        if not self.motion_mode:
+            self._track_segments()
+        if self.low_tier:
+            self._track_low_tier()
+        reason = self._check_health(self.process)
+        if reason:
+            self._restart(reason)
+        elif self._pending_profile or self._pending_quality is not None:
+            # Planned restart to apply new settings: let ffmpeg finish its files
+            if self._pending_profile:
+                self.encoder_profile, self._pending_profile = self._pending_profile, None
+                self._drain_reason = "encoder settings changed"
+            if self._pending_quality is not None:
+                self.quality_level, self._pending_quality = self._pending_quality, None
+                self._drain_reason = "recording quality changed"
+            self._request_quit()
+            self._drain_deadline = time.monotonic() + DRAIN_TIMEOUT_S
+            self._state = DRAINING
+        else:
+            self._report_speed()
+
+    def _drain(self):
+        process = self.process
+        if process and process.poll() is None and time.monotonic() < self._drain_deadline:
+            return
+        if process and process.poll() is None:
+            log.warning(f"[Recorder] FFmpeg process hung — forcing kill for {self.cam_name}")
+            kill_process_tree(process.pid)
+        self.process = None
+        ended = self._last_write or datetime.datetime.now()
+        self._end_output(ended)
+        self._gap = (ended, self._drain_reason)
+        self._state = LAUNCH
+
+    def _restart(self, reason):
+        log.warning(f"[Recorder] {self.cam_name}: {reason} — restarting")
+        process = self.process
+        if process and process.poll() is None:
+            kill_process_tree(process.pid)
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        self.process = None
+        ended = self._last_write or datetime.datetime.now()
+        self._end_output(ended)
+        if not self._gap:
+            self._gap = (ended, reason)
+        self.restarts += 1
+        if self._last_growth - self._run_started > HEALTHY_RUN_S:
+            self._backoff = BACKOFF_MIN_S   # it had been recording fine; retry quickly
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, BACKOFF_MAX_S)
+        log.info(f"[Recorder] Restarting {self.cam_name} in {delay}s")
+        self._resume_at = time.monotonic() + delay
+        self._state = BACKOFF
+
+    def _finish(self):
+        """Close out after a stop request (stop() or the controller's fast paths)."""
+        if self.process and self.process.poll() is None:
+            kill_process_tree(self.process.pid)
+        self.process = None
+        now = datetime.datetime.now()
+        self._close_gap(now)
+        self._end_output(now)
+        self._state = STOPPED
+        log.info(f"[Recorder] Supervision of Camera {self.cam_name} has ended.")
+        self._done.set()
+        self.finished.emit()
+        return None
+
+    def _next_check(self):
+        """Seconds until the next health check, or until just after a segment boundary."""
+        if self._state == BACKOFF:
+            return max(0.0, self._resume_at - time.monotonic())
+        if self._state == DRAINING:
+            return DRAIN_POLL_S
+        if self._state == LAUNCH:
+            return 0.0
+        delay = HEALTH_CHECK_S
+        now = datetime.datetime.now()
+        clock = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        periods = ([] if self.motion_mode else [self.segment_seconds]) + ([LOW_TIER_SEGMENT_S] if self.low_tier else [])
+        for period in periods:
+            # ffmpeg cuts at the first keyframe after the clock boundary
+            delay = min(delay, period - clock % period + ROLLOVER_SLACK_S)
+        if not self.output_file and not self.motion_mode:
+            delay = min(delay, 1.0)   # waiting for the first segment file
+        return delay
+
+    def _request_quit(self):
+        try:
+            self.process.stdin.write(b'q')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, AttributeError):
+            log.warning(f"[Recorder] FFmpeg stdin already closed for {self.cam_name}")
 
     def stop_ffmpeg(self):
         if self.process and self.process.poll() is None:
             log.info(f"[Recorder] Stopping recording process for Camera {self.cam_name}")
             # Send 'q' to FFmpeg to stop recording gracefully
-            try:
-                self.process.stdin.write(b'q')
-                self.process.stdin.flush()
-            except (BrokenPipeError, OSError):
-                log.warning(f"[Recorder] FFmpeg stdin already closed for {self.cam_name}")
+            self._request_quit()
             try:
                 self.process.wait(timeout=5)
             except subprocess.TimeoutExpired:
@@ -110,13 +688,23 @@ class CameraRecorderWorker(QThread):
                 kill_process_tree(self.process.pid)
             self.process = None
 
-    def stop(self):
+    def request_stop(self, timeout=DRAIN_TIMEOUT_S):
+        """Ask ffmpeg to finish its files without blocking; the scheduler closes
+        out once it exits (killing it after timeout). wait() blocks until then."""
         log.info(f"[Recorder] Stop requested for Camera {self.cam_name}")
+        self._drain_deadline = time.monotonic() + timeout
         self.running = False
-        if self.video_start_time and self.metadata_file:
-            end_time = datetime.datetime.now()
-            duration_seconds = (end_time - self.video_start_time).total_seconds()
-            save_metadata(self.metadata_file, self.video_start_time, duration_seconds,end_time)
+        if self.process and self.process.poll() is None:
+            self._request_quit()
+        self.wake()
 
-        self.stop_ffmpeg()
+    def stop(self):
+        log.info(f"[Recorder] Stop requested for Camera {self.cam_name}")
+        with self._state_lock:
+            self.running = False
+            now = datetime.datetime.now()
+            self._close_gap(now)
+            self.stop_ffmpeg()
+            self._end_output(now)
+        self._scheduler.wake(self)
         log.info(f"[Recorder] Recording stopped for Camera {self.cam_name}")
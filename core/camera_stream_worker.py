@@ -1,13 +1,14 @@
 #core/camera_stream_worker
 
 import subprocess
-import numpy as np
 import os
 import re
 from PyQt5.QtCore import QThread, pyqtSignal, QMutex
 from utils.logging import log, Logger
 from utils.subproc import kill_process_tree
 from utils.paths import get_gstreamer_root
+from core.frame_slot import LatestFrameSlot
+from core.motion import MotionDetector
 
 # Display resolution for each camera tile (scaled in GStreamer pipeline).
 DISPLAY_WIDTH = 1280
@@ -49,8 +50,20 @@ def _build_gst_cmd(rtsp_url: str) -> str:
     return f'"{gst_launch}" -q {pipeline}'
 
 
+def _read_into(stream, view) -> int:
+    """Fill `view` from the pipe; returns the number of bytes read (short on EOF)."""
+    total = 0
+    size = len(view)
+    while total < size:
+        n = stream.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
 class CameraStreamWorker(QThread):
-    frameReady = pyqtSignal(int, object)
+    # Frames are not signalled: they land in `frame_slot` and the UI pulls them
     connectionStatus = pyqtSignal(int, bool)
 
     def __init__(self, cam_id, rtsp_url):
@@ -62,7 +75,8 @@ class CameraStreamWorker(QThread):
         self.reconnect_attempts = 0
         self.retry_delay = 3000
         self.max_retry_delay = 30000
-        self.frame_consumed = True  # UI sets this True after painting
+        self.frame_slot = LatestFrameSlot((DISPLAY_HEIGHT, DISPLAY_WIDTH, 3))
+        self.motion = MotionDetector(cam_id)   # feeds recorders in motion mode
         self._proc = None
         self.logger = Logger.get_logger(
             name=f"Stream-{cam_id}",
@@ -104,10 +118,11 @@ class CameraStreamWorker(QThread):
 
                 # First successful read means connected
                 first_frame = True
+                self.motion.reset()
 
                 while self.running:
-                    raw = proc.stdout.read(FRAME_SIZE)
-                    if len(raw) != FRAME_SIZE:
+                    # Decode straight into the slot's back buffer (no per-frame allocation)
+                    if _read_into(proc.stdout, self.frame_slot.write_view()) != FRAME_SIZE:
                         if self.running:
                             try:
                                 err_output = proc.stderr.read(4096).decode("utf-8", errors="replace")
@@ -125,16 +140,11 @@ class CameraStreamWorker(QThread):
                         self.reconnect_attempts = 0
                         first_frame = False
 
-                    # Only emit if UI consumed the previous frame — skip otherwise
-                    # The pipe read above still drains GStreamer so it never blocks
-                    if not self.frame_consumed:
-                        continue
+                    self.motion.feed(self.frame_slot.back_frame())
 
-                    frame = np.frombuffer(raw, dtype=np.uint8).reshape(
-                        (DISPLAY_HEIGHT, DISPLAY_WIDTH, 3)
-                    )
-                    self.frame_consumed = False
-                    self.frameReady.emit(self.cam_id, frame)
+                    # Newest frame wins; the UI picks it up on its next tick.
+                    # The pipe is always drained so GStreamer never blocks.
+                    self.frame_slot.publish()
 
                 self._cleanup_proc()
 
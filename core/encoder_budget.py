@@ -0,0 +1,221 @@
+# core/encoder_budget.py
+"""
+Global CPU budget for the recorders' H.264 encoders.
+
+Every recorder transcodes with libx264, and a preset that is fine for 8
+cameras saturates the machine at 64. EncoderBudget measures what each
+recorder's ffmpeg actually costs (psutil CPU time, smoothed) and assigns
+every camera a rung on a quality ladder so that the sum stays under a
+configured share of the machine's CPU. Cameras are upgraded round-robin,
+cheapest first, so quality is spread evenly rather than spent on a few.
+
+The plan is recomputed every `interval_s` and whenever a recorder joins or
+leaves. Applying a new profile restarts that camera's ffmpeg (a ~1 s gap),
+so changes are conservative: a new camera starts no higher than the old
+fixed ultrafast/crf 23, upgrades wait PROFILE_HOLD_S after the last change
+(long enough to have measured the camera), and downgrades only happen when
+the measured total is actually over the ceiling.
+"""
+
+import os
+import time
+import threading
+from collections import namedtuple
+import psutil
+from utils.logging import log
+
+EncoderProfile = namedtuple("EncoderProfile", "preset crf threads")
+
+# Quality ladder, cheapest first, with CPU cost relative to ultrafast/crf 23
+# (rough x264 figures for 720p–1080p surveillance content).
+LADDER = [
+    (EncoderProfile("ultrafast", 28, 0), 0.8),
+    (EncoderProfile("ultrafast", 23, 0), 1.0),
+    (EncoderProfile("superfast", 23, 0), 1.4),
+    (EncoderProfile("veryfast", 23, 0), 1.9),
+    (EncoderProfile("faster", 22, 0), 2.6),
+]
+DEFAULT_RUNG = 1                 # today's fixed ultrafast/crf 23
+DEFAULT_CAMERA_COST = 25.0       # % of one core at DEFAULT_RUNG until measured
+PROFILE_HOLD_S = 15 * 60         # min time between upgrades of one camera
+MAX_THREADS = 4
+
+
+class _Entry:
+    __slots__ = ("recorder", "rung", "cost", "changed_at", "proc")
+
+    def __init__(self, recorder, rung):
+        self.recorder = recorder
+        self.rung = rung
+        self.cost = None          # smoothed % of one core, at the current rung
+        self.changed_at = 0.0
+        self.proc = None          # psutil.Process of the recorder's ffmpeg
+
+
+class EncoderBudget:
+    """Assigns per-camera x264 settings so total encode CPU stays under a ceiling."""
+
+    def __init__(self, ceiling_percent=70.0, interval_s=30):
+        self.cpu_count = os.cpu_count() or 1
+        self.ceiling_percent = ceiling_percent
+        self.interval_s = interval_s
+        self._entries = {}        # cam_id -> _Entry
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def budget(self):
+        """Ceiling in % of one core (psutil's per-process unit)."""
+        return self.ceiling_percent * self.cpu_count
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="EncoderBudget")
+        self._thread.start()
+        log.info(f"[Encoder] Budget started — ceiling {self.ceiling_percent:.0f}% of {self.cpu_count} cores")
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def set_ceiling(self, ceiling_percent):
+        self.ceiling_percent = ceiling_percent
+        self._wake.set()
+
+    # ------------------------------------------------------------------ #
+    #  Recorders                                                           #
+    # ------------------------------------------------------------------ #
+
+    def register(self, recorder):
+        """Give a new recorder its starting profile and re-plan everyone."""
+        with self._lock:
+            entry = _Entry(recorder, DEFAULT_RUNG)
+            self._entries[recorder.cam_id] = entry
+            entry.rung = min(DEFAULT_RUNG, self._plan()[recorder.cam_id])
+            entry.changed_at = time.monotonic()
+            recorder.encoder_profile = self._profile(entry.rung)
+        self._wake.set()
+
+    def unregister(self, cam_id):
+        with self._lock:
+            self._entries.pop(cam_id, None)
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            cameras = {
+                cam_id: {
+                    "preset": LADDER[e.rung][0].preset,
+                    "crf": LADDER[e.rung][0].crf,
+                    "cpu": round(e.cost, 1) if e.cost is not None else None,
+                }
+                for cam_id, e in self._entries.items()
+            }
+        total = sum(c["cpu"] or 0 for c in cameras.values())
+        return {"budget": self.budget, "used": round(total, 1), "cameras": cameras}
+
+    # ------------------------------------------------------------------ #
+    #  Internal                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _profile(self, rung):
+        # Many cameras: one x264 thread each avoids oversubscription; a few
+        # cameras may use several.
+        threads = max(1, min(MAX_THREADS, self.cpu_count // max(1, len(self._entries))))
+        return LADDER[rung][0]._replace(threads=threads)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._measure()
+                self._rebalance()
+            except Exception as e:
+                log.error(f"[Encoder] Budget evaluation failed: {e}")
+            self._wake.wait(timeout=self.interval_s)
+            self._wake.clear()
+
+    def _measure(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            process = entry.recorder.process
+            if process is None or process.poll() is not None:
+                entry.proc = None
+                continue
+            try:
+                if entry.proc is None or entry.proc.pid != process.pid:
+                    entry.proc = psutil.Process(process.pid)
+                    entry.proc.cpu_percent(interval=None)   # prime; first call returns 0
+                    continue
+                sample = entry.proc.cpu_percent(interval=None)
+            except psutil.Error:
+                entry.proc = None
+                continue
+            entry.cost = sample if entry.cost is None else entry.cost + (sample - entry.cost) * 0.3
+
+    def _plan(self):
+        """Return {cam_id: rung} fitting the budget (caller holds the lock)."""
+        measured = [e.cost / LADDER[e.rung][1] for e in self._entries.values() if e.cost]
+        fallback = sum(measured) / len(measured) if measured else DEFAULT_CAMERA_COST
+        base = {
+            cam_id: (e.cost / LADDER[e.rung][1]) if e.cost else fallback
+            for cam_id, e in self._entries.items()
+        }
+        rungs = {cam_id: 0 for cam_id in base}
+        total = sum(b * LADDER[0][1] for b in base.values())
+        upgraded = True
+        while upgraded:
+            upgraded = False
+            for cam_id in sorted(base, key=lambda c: (rungs[c], base[c])):
+                rung = rungs[cam_id]
+                if rung + 1 >= len(LADDER):
+                    continue
+                delta = base[cam_id] * (LADDER[rung + 1][1] - LADDER[rung][1])
+                if total + delta <= self.budget:
+                    rungs[cam_id] = rung + 1
+                    total += delta
+                    upgraded = True
+        return rungs
+
+    def _rebalance(self):
+        now = time.monotonic()
+        changes = []
+        with self._lock:
+            if not self._entries:
+                return
+            rungs = self._plan()
+            overloaded = sum(e.cost or 0 for e in self._entries.values()) > self.budget
+            for cam_id, entry in self._entries.items():
+                target = rungs[cam_id]
+                if target == entry.rung:
+                    continue
+                if target < entry.rung and not overloaded:
+                    continue   # only an estimate says it won't fit; wait for measurements
+                if target > entry.rung and (entry.cost is None or now - entry.changed_at < PROFILE_HOLD_S):
+                    continue   # upgrades can wait; restarts cost a moment of footage
+                if entry.cost:
+                    entry.cost *= LADDER[target][1] / LADDER[entry.rung][1]
+                entry.rung = target
+                entry.changed_at = now
+                changes.append((entry.recorder, self._profile(target)))
+
+        for recorder, profile in changes:
+            log.info(f"[Encoder] Camera {recorder.cam_id}: preset {profile.preset}, "
+                     f"crf {profile.crf}, threads {profile.threads}")
+            recorder.set_encoder_profile(profile)
+
+
+_budget = None
+
+
+def get_encoder_budget():
+    """Process-wide EncoderBudget (created on first use)."""
+    global _budget
+    if _budget is None:
+        from config.config_manager import ConfigManager
+        _budget = EncoderBudget(ceiling_percent=ConfigManager().get_encoder_cpu_ceiling())
+    return _budget
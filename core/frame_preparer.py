@@ -0,0 +1,196 @@
+# core/frame_preparer.py
+"""
+Off-GUI-thread frame preparation.
+
+Converting a 1280x720 RGB numpy frame to a QImage and scaling it to the
+tile size costs a few milliseconds; with 32+ tiles that alone saturates the
+GUI thread. FramePreparer does that work on a small pool of worker threads
+(QImage is safe to use outside the GUI thread, QPixmap is not) and hands the
+GUI thread an image that is already the right size, so painting is a blit.
+
+Frames are pulled, not pushed: every stream worker writes into its camera's
+LatestFrameSlot (core/frame_slot.py) and one UI tick collects whatever is
+new across all cameras, so there is no Qt signal per frame. A camera whose
+previous frame is still being prepared is skipped for that tick, which is
+also the backpressure — the slot keeps only the newest frame meanwhile.
+Prepared images come back with a single coalesced notification.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, Qt
+from PyQt5.QtGui import QImage
+from utils.logging import log
+
+UI_TICK_MS = 33   # ~30 fps upper bound for display
+
+
+class _Source:
+    __slots__ = ("slot", "on_image", "is_active", "size")
+
+    def __init__(self, slot, on_image, is_active):
+        self.slot = slot
+        self.on_image = on_image
+        self.is_active = is_active
+        self.size = (0, 0)
+
+
+class FramePreparer(QObject):
+    """Pool of worker threads turning camera frames into tile-sized QImages."""
+
+    imagesReady = pyqtSignal()   # coalesced; queued onto the GUI thread
+
+    def __init__(self, workers=None, tick_ms=UI_TICK_MS, parent=None):
+        super().__init__(parent)
+        self._workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._cond = threading.Condition()
+        self._jobs = deque()      # (cam_id, frame, (w, h), submitted_at)
+        self._in_flight = set()   # cam_ids whose frame is queued or being prepared
+        self._ready = {}          # cam_id -> QImage
+        self._notify_pending = False
+        self._sources = {}        # cam_id -> _Source, GUI thread only
+        self._running = True
+
+        # --- stats (approximate; updated without extra locking) ---
+        self._prepared = 0
+        self._avg_prep_ms = 0.0
+        self._max_prep_ms = 0.0
+        self._avg_latency_ms = 0.0
+        self._avg_tick_ms = 0.0
+
+        self.imagesReady.connect(self._dispatch)
+        for i in range(self._workers):
+            threading.Thread(target=self._work, daemon=True, name=f"FramePrep-{i}").start()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start(tick_ms)
+        log.info(f"[FramePrep] Started {self._workers} frame preparation worker(s)")
+
+    # ------------------------------------------------------------------ #
+    #  GUI-side API                                                       #
+    # ------------------------------------------------------------------ #
+
+    def attach(self, cam_id, slot, on_image, is_active=lambda: True):
+        """Pull frames for cam_id from `slot`; deliver scaled images to on_image.
+        Frames are only pulled while is_active() is true (e.g. tile visible)."""
+        self._sources[cam_id] = _Source(slot, on_image, is_active)
+
+    def detach(self, cam_id):
+        self._sources.pop(cam_id, None)
+        self._ready.pop(cam_id, None)
+
+    def set_target_size(self, cam_id, size):
+        source = self._sources.get(cam_id)
+        if source:
+            source.size = size
+
+    def stats(self):
+        """Queue depth and timing, for the status bar and logs."""
+        published = sum(s.slot.published for s in self._sources.values())
+        overwritten = sum(s.slot.overwritten for s in self._sources.values())
+        return {
+            "workers": self._workers,
+            "queue_depth": len(self._jobs),
+            "prepared": self._prepared,
+            "published": published,
+            "dropped": overwritten,
+            "avg_prep_ms": round(self._avg_prep_ms, 2),
+            "max_prep_ms": round(self._max_prep_ms, 2),
+            "avg_latency_ms": round(self._avg_latency_ms, 2),
+            "avg_tick_ms": round(self._avg_tick_ms, 3),
+        }
+
+    def stop(self):
+        self._timer.stop()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------ #
+    #  Internal                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _tick(self):
+        """Collect every camera's newest frame in one pass (GUI thread)."""
+        started = time.perf_counter()
+        batch = []
+        for cam_id, source in self._sources.items():
+            if cam_id in self._in_flight or not source.slot.has_new():
+                continue
+            if not source.is_active():
+                source.slot.clear()
+                continue
+            frame = source.slot.acquire()
+            if frame is not None:
+                batch.append((cam_id, frame, source.size, started))
+
+        if batch:
+            with self._cond:
+                for job in batch:
+                    self._in_flight.add(job[0])
+                    self._jobs.append(job)
+                self._cond.notify_all()
+        self._avg_tick_ms += ((time.perf_counter() - started) * 1000 - self._avg_tick_ms) * 0.05
+
+    def _dispatch(self):
+        self._notify_pending = False
+        for cam_id in list(self._ready):
+            image = self._ready.pop(cam_id, None)
+            source = self._sources.get(cam_id)
+            if source and image is not None:
+                source.on_image(image)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._running and not self._jobs:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                cam_id, frame, size, submitted_at = self._jobs.popleft()
+
+            started = time.perf_counter()
+            try:
+                image = self._prepare(frame, size)
+            except Exception as e:
+                image = None
+                log.warning(f"[FramePrep] Camera {cam_id}: failed to prepare frame: {e}")
+            done = time.perf_counter()
+
+            if image is not None:
+                prep_ms = (done - started) * 1000
+                self._prepared += 1
+                self._avg_prep_ms += (prep_ms - self._avg_prep_ms) * 0.05
+                self._avg_latency_ms += ((done - submitted_at) * 1000 - self._avg_latency_ms) * 0.05
+                self._max_prep_ms = max(self._max_prep_ms * 0.999, prep_ms)
+                self._ready[cam_id] = image
+
+            # The slot's front buffer is free again once the image is copied/scaled
+            with self._cond:
+                self._in_flight.discard(cam_id)
+            if image is not None and not self._notify_pending:
+                self._notify_pending = True
+                self.imagesReady.emit()
+
+    @staticmethod
+    def _prepare(frame, size):
+        height, width, _ = frame.shape
+        image = QImage(frame.data, width, height, 3 * width, QImage.Format_RGB888)
+        target_w, target_h = size
+        if target_w <= 0 or target_h <= 0 or (target_w, target_h) == (width, height):
+            return image.copy()   # detach from the (reused) slot buffer
+        return image.scaled(target_w, target_h, Qt.KeepAspectRatio, Qt.FastTransformation)
+
+
+_preparer = None
+
+
+def get_frame_preparer():
+    """Process-wide FramePreparer (created on first use, on the GUI thread)."""
+    global _preparer
+    if _preparer is None:
+        _preparer = FramePreparer()
+    return _preparer
@@ -0,0 +1,82 @@
+# core/frame_slot.py
+"""
+Per-camera "latest frame" triple buffer.
+
+The stream worker decodes straight into the back buffer (no per-frame
+allocation, no per-frame Qt signal) and publishes it; the UI side picks up
+the newest published frame whenever it is ready for one. Three buffers mean
+the writer never waits for the reader and never touches the buffer the
+reader is using:
+
+    back   ← writer fills it, publish() swaps it with middle
+    middle ← newest complete frame
+    front  ← reader's frame, valid until the reader's next acquire()
+
+The only synchronisation is a lock held for an index swap, so neither side
+ever blocks on the other's work.
+"""
+
+import threading
+import numpy as np
+
+
+class LatestFrameSlot:
+    def __init__(self, shape, dtype=np.uint8):
+        self.shape = shape
+        self._buffers = [np.empty(shape, dtype=dtype) for _ in range(3)]
+        self._views = [memoryview(b.reshape(-1)) for b in self._buffers]
+        self._back, self._middle, self._front = 0, 1, 2
+        self._fresh = False
+        self._swap = threading.Lock()
+        self.published = 0      # frames published by the writer
+        self.overwritten = 0    # published frames the reader never saw
+
+    # ---- writer side (stream worker thread) ----
+
+    def write_view(self) -> memoryview:
+        """Flat writable view of the back buffer, e.g. for stream.readinto()."""
+        return self._views[self._back]
+
+    def back_frame(self) -> np.ndarray:
+        """The back buffer as an array (after it is filled, before publish())."""
+        return self._buffers[self._back]
+
+    def publish(self):
+        """Make the back buffer the newest frame."""
+        with self._swap:
+            self._back, self._middle = self._middle, self._back
+            if self._fresh:
+                self.overwritten += 1
+            self._fresh = True
+            self.published += 1
+
+    # ---- reader side (UI / frame preparation) ----
+
+    def has_new(self) -> bool:
+        return self._fresh
+
+    def acquire(self):
+        """Return the newest frame not yet seen, or None.
+        The array stays valid until the next acquire() call."""
+        if not self._fresh:
+            return None
+        with self._swap:
+            self._front, self._middle = self._middle, self._front
+            self._fresh = False
+            return self._buffers[self._front]
+
+    def peek(self, step=1):
+        """Copy of the newest frame, subsampled every `step` pixels, or None
+        before the first publish. Unlike acquire() it does not consume the
+        frame, so a second reader (e.g. the mosaic recorder) never takes
+        frames away from the display."""
+        if not self.published:
+            return None
+        with self._swap:
+            # the newest frame is in middle until the reader acquires it
+            newest = self._middle if self._fresh else self._front
+            return self._buffers[newest][::step, ::step].copy()
+
+    def clear(self):
+        with self._swap:
+            self._fresh = False
@@ -0,0 +1,127 @@
+# core/mosaic_recorder.py
+"""
+Overview mosaic recording: a camera window's whole grid as one video.
+
+For incident review it is far cheaper to scrub one file showing every
+camera than to open one file per camera. MosaicRecorder composites the
+display frames the window's CameraStreamWorkers have already decoded
+(LatestFrameSlot.peek, so the display never loses a frame to it) into a
+single canvas at MOSAIC_FPS and pipes it to ffmpeg as raw video. Tiles
+follow the window's grid order; a camera that is off the current page,
+disconnected or stalled for MOSAIC_STALE_S shows as black.
+
+Each tile is the 1280x720 display frame subsampled by max(rows, cols), so
+the canvas stays around 1280x720 whatever the grid size. The output is
+written like any camera's: segments under <root>/<date>/<name>/ (hourly,
+like the low tier), journaled with trigger "mosaic", so playback and the
+catalog list the mosaic as one more camera. It runs under the same
+RecorderScheduler supervision as the per-camera recorders.
+"""
+
+import time
+import threading
+import numpy as np
+from utils.logging import log
+from utils.paths import get_ffmpeg_path
+from core.camera_record_worker import CameraRecorderWorker
+from core.camera_stream_worker import DISPLAY_WIDTH, DISPLAY_HEIGHT
+
+MOSAIC_FPS = 1
+MOSAIC_CRF = 30
+MOSAIC_SEGMENT_S = 3600
+MOSAIC_STALE_S = 5          # no new frame this long → black tile
+MOSAIC_CAM_ID = 0           # not a configured camera
+MAX_CATCHUP_S = 5           # after a stall, repeat frames for at most this much media time
+
+
+class MosaicRecorder(CameraRecorderWorker):
+    """Records a grid of display frames as one low-fps video."""
+
+    def __init__(self, name, frame_sources, rows, cols, recording_dir, fps=MOSAIC_FPS):
+        super().__init__(
+            MOSAIC_CAM_ID, name, "", True, recording_dir=recording_dir,
+            segment_seconds=MOSAIC_SEGMENT_S, low_tier=False,
+        )
+        self.frame_sources = frame_sources   # callable → [LatestFrameSlot or None] in grid order
+        self.rows = rows
+        self.cols = cols
+        self.fps = max(1, int(fps))
+        self.subsample = max(2, rows, cols)
+        self.tile_h = (DISPLAY_HEIGHT // self.subsample) & ~1
+        self.tile_w = (DISPLAY_WIDTH // self.subsample) & ~1
+        self._canvas = np.zeros((rows * self.tile_h, cols * self.tile_w, 3), np.uint8)
+        self._seen = {}              # grid index -> (frames published, monotonic time of the last new one)
+
+    def build_ffmpeg_command(self):
+        height, width = self._canvas.shape[:2]
+        log.info(
+            f"[Recorder] Recording mosaic {self.cam_name} ({self.rows}x{self.cols} grid, "
+            f"{width}x{height} at {self.fps} fps)"
+        )
+        return [
+            get_ffmpeg_path(), "-nostats", "-progress", "pipe:1", "-stats_period", "2",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-framerate", str(self.fps), "-i", "pipe:0",
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", str(MOSAIC_CRF),
+            "-threads", "1", "-g", str(self.fps * 2), "-pix_fmt", "yuv420p",
+        ] + self._segment_args(self.segment_seconds)
+
+    def _launch(self):
+        super()._launch()
+        threading.Thread(
+            target=self._feed, args=(self.process,), daemon=True, name="MosaicFeeder",
+        ).start()
+
+    def _request_quit(self):
+        # stdin carries the frames: end of input is what stops ffmpeg cleanly
+        try:
+            self.process.stdin.close()
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _journal_extra(self):
+        return dict(super()._journal_extra() or {}, trigger="mosaic")
+
+    def _feed(self, process):
+        """Write one composite per frame interval, repeating it to keep media time on the wall clock."""
+        started = time.monotonic()
+        written = 0
+        try:
+            while self.running and process.poll() is None:
+                frame = self._compose()
+                due = int((time.monotonic() - started) * self.fps) + 1 - written
+                for _ in range(min(max(1, due), self.fps * MAX_CATCHUP_S)):
+                    process.stdin.write(frame)
+                    written += 1
+                process.stdin.flush()
+                if due > self.fps * MAX_CATCHUP_S:
+                    written += due - self.fps * MAX_CATCHUP_S   # give up on the rest of a long stall
+                time.sleep(max(0.0, started + written / self.fps - time.monotonic()))
+        except (OSError, ValueError):
+            pass   # ffmpeg gone or stdin closed by stop
+
+    def _compose(self):
+        now = time.monotonic()
+        slots = self.frame_sources()
+        for index in range(self.rows * self.cols):
+            row, col = divmod(index, self.cols)
+            tile = self._canvas[row * self.tile_h:(row + 1) * self.tile_h,
+                                col * self.tile_w:(col + 1) * self.tile_w]
+            slot = slots[index] if index < len(slots) else None
+            frame = self._fresh_frame(index, slot, now)
+            if frame is None:
+                tile[:] = 0
+            else:
+                tile[:] = frame[:self.tile_h, :self.tile_w]
+        return self._canvas
+
+    def _fresh_frame(self, index, slot, now):
+        if slot is None:
+            self._seen.pop(index, None)
+            return None
+        published, since = self._seen.get(index, (None, now))
+        if slot.published != published:
+            self._seen[index] = (slot.published, now)
+        elif now - since > MOSAIC_STALE_S:
+            return None
+        return slot.peek(self.subsample)
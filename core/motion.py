@@ -0,0 +1,330 @@
+# core/motion.py
+"""
+Motion-triggered recording.
+
+Detection runs on the display frames CameraStreamWorker has already
+decoded: every few frames the green channel is sampled on a coarse grid
+(1280x720 → 80x45) and handed to the MotionEngine. The engine evaluates
+every camera in one vectorized pass at a fixed rate — the samples are
+stacked into an (N, 45, 80) array, differenced against the previous tick,
+reduced to a (N, 9, 16) block activity map and a score per camera — so
+the cost of a tick barely depends on how many cameras are on the wall.
+
+Results go to the process-wide MotionHub; recorders in "motion" mode ask
+the hub whether their camera moved recently, and camera windows use it to
+highlight tiles. Window processes (controller/window_process.py) forward
+their hub snapshot to the coordinator with each heartbeat.
+
+The recorder keeps its ffmpeg running and reads the encoded stream as
+MPEG-TS from a pipe. TsGopSplitter cuts it into GOPs (at packets flagged
+random_access) so a rolling pre-roll of whole GOPs can be kept in memory;
+when motion starts, MotionEventWriter remuxes the pre-roll plus everything
+up to the end of the post-roll into an ordinary fragmented MP4 journaled
+like any other segment, so playback, instant replay and the catalog treat
+events like any other recording.
+"""
+
+import os
+import time
+import threading
+import subprocess
+import numpy as np
+from utils.logging import log
+from utils.subproc import win_no_window_kwargs
+from utils.paths import get_ffmpeg_path
+
+MOTION_SAMPLE_EVERY = 5    # submit every Nth display frame (~5 Hz at 25 fps)
+MOTION_GRID_STEP = 16      # sample spacing in pixels
+MOTION_TICK_S = 0.2        # engine evaluation period
+GRID_SHAPE = (720 // MOTION_GRID_STEP, 1280 // MOTION_GRID_STEP)   # (45, 80)
+BLOCK = 5                  # samples per block side → 9x16 activity map
+PIXEL_DELTA = 25           # per-sample change (0–255) that counts as changed
+BLOCK_FRACTION = 0.2       # share of changed samples that makes a block active
+SOURCE_TIMEOUT_S = 10      # no frames evaluated for this long → no detector for the camera
+
+TS_PACKET = 188
+
+
+class MotionDetector:
+    """A camera's feed into the MotionEngine, called from its stream worker thread."""
+
+    def __init__(self, cam_id, engine=None):
+        self.cam_id = cam_id
+        self.engine = engine or get_motion_engine()
+        self._count = 0
+
+    def feed(self, frame):
+        self._count += 1
+        if self._count % MOTION_SAMPLE_EVERY == 0:
+            self.engine.submit(self.cam_id, frame)
+
+    def reset(self):
+        """Forget the reference frame (e.g. after a reconnect)."""
+        self.engine.reset(self.cam_id)
+
+
+class MotionEngine:
+    """Batched frame-difference motion detection for every camera in the process."""
+
+    def __init__(self, hub=None, interval_s=MOTION_TICK_S):
+        self.hub = hub or get_motion_hub()
+        self.interval_s = interval_s
+        self._lock = threading.Lock()
+        self._rows = {}                                    # cam_id -> row in the arrays below
+        self._cams = []                                    # row -> cam_id
+        self._latest = np.zeros((0,) + GRID_SHAPE, np.uint8)   # newest submitted sample
+        self._fresh = np.zeros(0, bool)                    # row has a sample since last tick
+        self._prev = np.zeros((0,) + GRID_SHAPE, np.int16) # sample evaluated last time
+        self._has_prev = np.zeros(0, bool)
+        self._maps = np.zeros((0, GRID_SHAPE[0] // BLOCK, GRID_SHAPE[1] // BLOCK), bool)
+        self._scores = np.zeros(0, np.float32)
+        self.tick_ms = 0.0                                 # duration of the last evaluation
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="MotionEngine")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    # ---- stream worker side ----
+
+    def submit(self, cam_id, frame):
+        """Store a decimated sample of frame; it is evaluated on the next tick."""
+        with self._lock:
+            row = self._rows.get(cam_id)
+            if row is None:
+                row = self._add_row(cam_id)
+            self._latest[row] = frame[::MOTION_GRID_STEP, ::MOTION_GRID_STEP, 1]
+            self._fresh[row] = True
+
+    def reset(self, cam_id):
+        with self._lock:
+            row = self._rows.get(cam_id)
+            if row is not None:
+                self._has_prev[row] = False
+                self._fresh[row] = False
+
+    def _add_row(self, cam_id):
+        """Grow every per-camera array by one row (caller holds the lock)."""
+        row = len(self._cams)
+        self._rows[cam_id] = row
+        self._cams.append(cam_id)
+        self._latest = np.concatenate([self._latest, np.zeros((1,) + GRID_SHAPE, np.uint8)])
+        self._fresh = np.append(self._fresh, False)
+        self._prev = np.concatenate([self._prev, np.zeros((1,) + GRID_SHAPE, np.int16)])
+        self._has_prev = np.append(self._has_prev, False)
+        self._maps = np.concatenate([self._maps, np.zeros((1,) + self._maps.shape[1:], bool)])
+        self._scores = np.append(self._scores, np.float32(0))
+        return row
+
+    # ---- readers (UI, recorders) ----
+
+    def score(self, cam_id):
+        """Share of active blocks (0–1) at the last evaluation, or None."""
+        with self._lock:
+            row = self._rows.get(cam_id)
+            return None if row is None else float(self._scores[row])
+
+    def activity_map(self, cam_id):
+        """Copy of the camera's (9, 16) block activity map, or None."""
+        with self._lock:
+            row = self._rows.get(cam_id)
+            return None if row is None else self._maps[row].copy()
+
+    # ---- evaluation ----
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.evaluate()
+            except Exception as e:
+                log.error(f"[Motion] Evaluation failed: {e}")
+
+    def evaluate(self):
+        """One vectorized pass over every camera with a new sample."""
+        started = time.perf_counter()
+        with self._lock:
+            rows = np.flatnonzero(self._fresh)
+            if not rows.size:
+                return
+            current = self._latest[rows].astype(np.int16)
+            self._fresh[rows] = False
+            compare = self._has_prev[rows]
+
+        n = rows.size
+        changed = np.abs(current - self._prev[rows]) > PIXEL_DELTA
+        blocks = changed.reshape(n, GRID_SHAPE[0] // BLOCK, BLOCK, GRID_SHAPE[1] // BLOCK, BLOCK).mean(axis=(2, 4))
+        active = (blocks >= BLOCK_FRACTION) & compare[:, None, None]
+        scores = active.mean(axis=(1, 2))
+
+        with self._lock:
+            self._prev[rows] = current
+            self._has_prev[rows] = True
+            self._maps[rows] = active
+            self._scores[rows] = scores
+            cams = [self._cams[r] for r in rows[compare]]
+        self.hub.update_many(cams, active[compare].any(axis=(1, 2)).tolist())
+        self.tick_ms = (time.perf_counter() - started) * 1000
+
+
+class MotionHub:
+    """Latest motion state per camera, shared by detectors and recorders."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_seen = {}     # cam_id -> monotonic time of the last evaluated frame
+        self._last_motion = {}   # cam_id -> monotonic time of the last motion
+
+    def update(self, cam_id, moving):
+        self.update_many([cam_id], [moving])
+
+    def update_many(self, cam_ids, moving):
+        now = time.monotonic()
+        with self._lock:
+            for cam_id, m in zip(cam_ids, moving):
+                self._last_seen[cam_id] = now
+                if m:
+                    self._last_motion[cam_id] = now
+
+    def has_source(self, cam_id):
+        with self._lock:
+            seen = self._last_seen.get(cam_id)
+        return seen is not None and time.monotonic() - seen < SOURCE_TIMEOUT_S
+
+    def seconds_since_motion(self, cam_id):
+        with self._lock:
+            moved = self._last_motion.get(cam_id)
+        return None if moved is None else time.monotonic() - moved
+
+    def snapshot(self):
+        """{cam_id: (seconds since last frame, seconds since motion or None)} for IPC."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                cam_id: (now - seen, now - self._last_motion[cam_id] if cam_id in self._last_motion else None)
+                for cam_id, seen in self._last_seen.items()
+                if now - seen < SOURCE_TIMEOUT_S
+            }
+
+    def merge(self, snapshot):
+        """Apply a snapshot received from another process."""
+        now = time.monotonic()
+        with self._lock:
+            for cam_id, (seen_age, motion_age) in snapshot.items():
+                cam_id = int(cam_id)
+                self._last_seen[cam_id] = max(self._last_seen.get(cam_id, 0.0), now - seen_age)
+                if motion_age is not None:
+                    self._last_motion[cam_id] = max(self._last_motion.get(cam_id, 0.0), now - motion_age)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_motion_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = MotionHub()
+        return _hub
+
+
+_engine = None
+
+
+def get_motion_engine():
+    """Process-wide MotionEngine (created and started on first use)."""
+    global _engine
+    hub = get_motion_hub()
+    with _hub_lock:
+        if _engine is None:
+            _engine = MotionEngine(hub=hub)
+        engine = _engine
+    engine.start()
+    return engine
+
+
+class TsGopSplitter:
+    """Splits an MPEG-TS byte stream into GOPs and remembers the PAT/PMT.
+
+    feed() takes packet-aligned chunks and returns the GOPs completed by it.
+    """
+
+    def __init__(self):
+        self.tables = {}          # pid -> latest PAT/PMT packet
+        self._gop = bytearray()
+
+    def feed(self, chunk):
+        packets = np.frombuffer(chunk, np.uint8).reshape(-1, TS_PACKET)
+        pids = ((packets[:, 1].astype(np.uint16) & 0x1F) << 8) | packets[:, 2]
+        for pid in (0x0000, 0x1000):   # PAT and ffmpeg's default PMT pid
+            hits = np.flatnonzero(pids == pid)
+            if hits.size:
+                i = hits[-1]
+                self.tables[pid] = bytes(chunk[i * TS_PACKET:(i + 1) * TS_PACKET])
+
+        # Keyframes start in a packet with payload_unit_start and the
+        # adaptation field's random_access_indicator set
+        keyframes = np.flatnonzero(
+            (packets[:, 1] & 0x40).astype(bool)
+            & (packets[:, 3] & 0x20).astype(bool)
+            & (packets[:, 4] > 0)
+            & (packets[:, 5] & 0x40).astype(bool)
+        )
+        done = []
+        start = 0
+        for i in keyframes:
+            self._gop += chunk[start:i * TS_PACKET]
+            if self._gop:
+                done.append(bytes(self._gop))
+            self._gop = bytearray()
+            start = i * TS_PACKET
+        self._gop += chunk[start:]
+        return done
+
+    def header(self):
+        return self.tables.get(0x0000, b"") + self.tables.get(0x1000, b"")
+
+
+class MotionEventWriter:
+    """Remuxes TS GOPs of one motion event into a fragmented MP4."""
+
+    def __init__(self, output_file, header):
+        self.output_file = output_file
+        self.process = subprocess.Popen(
+            [
+                get_ffmpeg_path(), "-loglevel", "error", "-f", "mpegts", "-i", "pipe:0",
+                "-c", "copy", "-f", "mp4",
+                "-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-flush_packets", "1",
+                "-y", output_file,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **win_no_window_kwargs()
+        )
+        self.write(header)
+
+    def write(self, data):
+        try:
+            self.process.stdin.write(data)
+            return True
+        except (BrokenPipeError, OSError, ValueError):
+            log.warning(f"[Motion] Event writer for {os.path.basename(self.output_file)} closed unexpectedly")
+            return False
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
@@ -0,0 +1,111 @@
+# core/recorder_scheduler.py
+"""
+One supervisor thread for every recorder's ffmpeg.
+
+Each CameraRecorderWorker is a small state machine (launching → running →
+draining / backing off → ...) whose step() does whatever is due and says
+how long it can be left alone: until its next health check, until just
+after its next segment boundary, or until its restart backoff expires.
+The scheduler keeps those deadlines in a heap and sleeps until the
+earliest one. Recorders wake it early when something happens: ffmpeg's
+progress pipe reaching EOF (the process exited), a stop request or new
+encoder settings.
+
+That replaces one QThread per camera polling every second, and it puts
+restart policy and rollover handling for all cameras in one loop. The
+per-process pipe readers stay threads; blocking reads are the only
+portable way to drain ffmpeg's pipes on Windows.
+"""
+
+import heapq
+import time
+import itertools
+import threading
+from utils.logging import log
+
+BUSY_RETRY_S = 0.5      # recorder busy in a stop() on another thread → look again shortly
+
+
+class RecorderScheduler:
+    """Runs the step() of every registered recorder when it is due."""
+
+    def __init__(self):
+        self._recorders = {}        # id(recorder) -> recorder
+        self._due = []              # heap of (monotonic due time, seq, id(recorder))
+        self._planned = {}          # id(recorder) -> seq of its live heap entry
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, recorder):
+        with self._lock:
+            self._recorders[id(recorder)] = recorder
+            self._plan(recorder, 0.0)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="RecorderScheduler")
+                self._thread.start()
+        self._wake.set()
+
+    def wake(self, recorder):
+        """Run the recorder's step() as soon as possible."""
+        with self._lock:
+            if id(recorder) in self._recorders:
+                self._plan(recorder, 0.0)
+        self._wake.set()
+
+    def count(self):
+        with self._lock:
+            return len(self._recorders)
+
+    def _plan(self, recorder, delay):
+        """(Re)schedule a recorder; older heap entries for it become stale (caller holds the lock)."""
+        seq = next(self._seq)
+        self._planned[id(recorder)] = seq
+        heapq.heappush(self._due, (time.monotonic() + delay, seq, id(recorder)))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                timeout = max(0.0, self._due[0][0] - time.monotonic()) if self._due else None
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+            now = time.monotonic()
+            ready = []
+            with self._lock:
+                while self._due and self._due[0][0] <= now:
+                    _, seq, key = heapq.heappop(self._due)
+                    if self._planned.get(key) == seq:
+                        ready.append(self._recorders[key])
+
+            for recorder in ready:
+                key = id(recorder)
+                with self._lock:
+                    planned = self._planned.get(key)
+                try:
+                    delay = recorder.step()
+                except Exception as e:
+                    log.exception(f"[Recorder] Supervisor step failed for {recorder.cam_name}: {e}")
+                    delay = 5.0
+                with self._lock:
+                    if delay is None:
+                        self._recorders.pop(key, None)
+                        self._planned.pop(key, None)
+                    elif self._planned.get(key) != planned:
+                        self._plan(recorder, 0.0)     # woken while stepping
+                    else:
+                        self._plan(recorder, delay)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_recorder_scheduler():
+    """Process-wide RecorderScheduler (created on first use)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RecorderScheduler()
+        return _scheduler
@@ -0,0 +1,98 @@
+# core/recorder_telemetry.py
+"""
+Rolling encode statistics for a recorder, from ffmpeg's -progress blocks.
+
+ffmpeg prints a key=value block every -stats_period seconds (frame, fps,
+bitrate, total_size, out_time_us, dup_frames, drop_frames, speed, ...).
+RecorderTelemetry keeps the blocks of the last TELEMETRY_WINDOW_S and
+derives rates from the first and last of them rather than trusting
+ffmpeg's own fps/speed, which are averages since the process started and
+hide a recorder that has only just fallen behind. Speed is media time
+produced per wall-clock second: below 1.0 the encoder cannot keep up with
+the camera and footage will eventually be lost.
+"""
+
+import time
+import threading
+from collections import deque
+
+TELEMETRY_WINDOW_S = 60
+SLOW_SPEED = 0.98      # below this the recorder is not keeping up (allows for jitter)
+
+
+def _number(block, key):
+    value = block.get(key, "N/A").rstrip("xkbits/s")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RecorderTelemetry:
+    """Encode fps, speed, bitrate and dropped/duplicated frames over a rolling window."""
+
+    def __init__(self, window_s=TELEMETRY_WINDOW_S):
+        self.window_s = window_s
+        self._samples = deque()      # (monotonic, frame, out_time_s, dup, drop, bitrate_kbps)
+        self._lock = threading.Lock()
+        self.slow_since = None       # monotonic time speed dropped below SLOW_SPEED
+
+    def feed(self, block):
+        """Add one -progress block (called from the recorder's progress reader)."""
+        now = time.monotonic()
+        out_time_us = _number(block, "out_time_us")
+        sample = (
+            now,
+            _number(block, "frame"),
+            out_time_us / 1e6 if out_time_us is not None else None,
+            _number(block, "dup_frames") or 0,
+            _number(block, "drop_frames") or 0,
+            _number(block, "bitrate"),
+        )
+        with self._lock:
+            if self._samples and sample[1] is not None and self._samples[-1][1] is not None \
+                    and sample[1] < self._samples[-1][1]:
+                self._samples.clear()    # counters restart with every ffmpeg process
+                self.slow_since = None
+            self._samples.append(sample)
+            while now - self._samples[0][0] > self.window_s:
+                self._samples.popleft()
+            speed = self._speed()
+            if speed is not None and speed < SLOW_SPEED:
+                if self.slow_since is None:
+                    self.slow_since = now
+            elif speed is not None:
+                self.slow_since = None
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.slow_since = None
+
+    def snapshot(self):
+        """Rolling statistics; values are None until two blocks have arrived."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return {"fps": None, "speed": None, "bitrate_kbps": None,
+                        "dropped": 0, "duplicated": 0, "slow_for_s": None}
+            first, last = self._samples[0], self._samples[-1]
+            elapsed = last[0] - first[0]
+            fps = (last[1] - first[1]) / elapsed if elapsed > 0 and None not in (first[1], last[1]) else None
+            return {
+                "fps": round(fps, 1) if fps is not None else None,
+                "speed": round(self._speed(), 2) if self._speed() is not None else None,
+                "bitrate_kbps": last[5],
+                "dropped": int(last[4] - first[4]),
+                "duplicated": int(last[3] - first[3]),
+                "slow_for_s": round(last[0] - self.slow_since) if self.slow_since else None,
+            }
+
+    def _speed(self):
+        """Media seconds produced per wall-clock second over the window (caller holds the lock)."""
+        if len(self._samples) < 2:
+            return None
+        first, last = self._samples[0], self._samples[-1]
+        elapsed = last[0] - first[0]
+        if elapsed <= 0 or first[2] is None or last[2] is None:
+            return None
+        return (last[2] - first[2]) / elapsed
@@ -0,0 +1,128 @@
+# core/recording_profile.py
+"""
+Per-camera recording profiles.
+
+Stored under "recording_profile" in a camera's entry of camera_streams.json
+and edited from CameraConfigDialog. A profile fixes what is archived —
+codec, frame rate, output height, quality and GOP length — while the
+EncoderBudget (core/encoder_budget.py) still picks the x264/x265 preset
+and threads that fit the machine. Zero means "not set": the camera's own
+frame rate and resolution, the budget's CRF, no bitrate cap.
+
+"copy" stores the camera's stream as is (no encode at all); it cannot
+change frame rate, resolution or GOP, so those fields are ignored.
+
+Under disk pressure the StorageManager raises a pressure level for its
+volume and every camera recording there drops to quality level
+pressure - priority (QUALITY_STEPS: higher CRF, lower bitrate cap, then
+fewer frames and lines), so low-priority cameras give up quality first
+and high-priority ones last. Copy cameras cannot be degraded.
+"""
+
+from collections import namedtuple
+
+RecordingProfile = namedtuple("RecordingProfile", "codec fps height crf max_kbps gop_seconds priority")
+
+DEFAULT_RECORDING_PROFILE = RecordingProfile("h264", 0, 0, 0, 0, 1, 1)
+
+CODECS = {
+    "copy": ("Copy (no re-encode)", None),
+    "h264": ("H.264", "libx264"),
+    "h265": ("H.265", "libx265"),
+}
+FPS_CHOICES = [0, 1, 2, 5, 10, 15, 25]
+HEIGHT_CHOICES = [0, 360, 480, 720, 1080]
+ASSUMED_CAMERA_FPS = 25     # for GOP length when the profile keeps the camera's rate
+X265_CRF_OFFSET = 5         # x265 at crf N+5 looks about like x264 at crf N
+PRIORITIES = {0: "Low", 1: "Normal", 2: "High"}
+
+# Reduced-quality levels 1..n under disk pressure:
+# (extra CRF, frame rate cap, height cap, bitrate cap factor); 0 = no cap
+QUALITY_STEPS = [
+    (4, 0, 0, 0.6),
+    (4, 10, 0, 0.45),
+    (6, 5, 720, 0.3),
+]
+MAX_QUALITY_LEVEL = len(QUALITY_STEPS)
+
+
+def profile_from_config(data):
+    """RecordingProfile from a camera config's "recording_profile" dict (missing keys → defaults)."""
+    data = data or {}
+    fields = DEFAULT_RECORDING_PROFILE._asdict()
+    for key, default in fields.items():
+        value = data.get(key, default)
+        try:
+            fields[key] = str(value) if key == "codec" else max(0, int(value))
+        except (TypeError, ValueError):
+            fields[key] = default
+    if fields["codec"] not in CODECS:
+        fields["codec"] = DEFAULT_RECORDING_PROFILE.codec
+    return RecordingProfile(**fields)
+
+
+def quality_level(pressure, profile):
+    """Quality level (0 = as configured) of a camera at a volume's pressure level."""
+    if profile.codec == "copy":
+        return 0
+    return max(0, min(MAX_QUALITY_LEVEL, pressure - profile.priority))
+
+
+def profile_to_config(profile):
+    return dict(profile._asdict())
+
+
+def describe(profile):
+    """Short label for tables, e.g. "H.264 · 5 fps · 720p"."""
+    if profile.codec == "copy":
+        return "Copy"
+    parts = [
+        CODECS[profile.codec][0],
+        f"{profile.fps} fps" if profile.fps else "native fps",
+        f"{profile.height}p" if profile.height else "native res",
+    ]
+    if profile.max_kbps:
+        parts.append(f"≤{profile.max_kbps} kb/s")
+    if profile.priority != DEFAULT_RECORDING_PROFILE.priority:
+        parts.append(f"{PRIORITIES.get(profile.priority, profile.priority)} priority")
+    return " · ".join(parts)
+
+
+def video_args(profile, encoder_profile, quality_level=0):
+    """ffmpeg output options for the recorder's main video output."""
+    encoder = CODECS[profile.codec][1]
+    if encoder is None:
+        return ["-c:v", "copy"]
+
+    extra_crf, fps_cap, height_cap, kbps_factor = (0, 0, 0, 1.0)
+    if quality_level:
+        extra_crf, fps_cap, height_cap, kbps_factor = QUALITY_STEPS[min(quality_level, MAX_QUALITY_LEVEL) - 1]
+    fps = min(f for f in (profile.fps, fps_cap) if f) if profile.fps or fps_cap else 0
+
+    args = []
+    filters = []
+    if profile.height and height_cap:
+        filters.append(f"scale=-2:{min(profile.height, height_cap)}")
+    elif profile.height:
+        filters.append(f"scale=-2:{profile.height}")
+    elif height_cap:
+        filters.append(f"scale=-2:min(ih\\,{height_cap})")   # never upscale a smaller camera
+    if fps:
+        filters.append(f"fps={fps}")
+    if filters:
+        args += ["-vf", ",".join(filters)]
+
+    crf = (profile.crf or encoder_profile.crf) + extra_crf
+    if encoder == "libx265" and not profile.crf:
+        crf += X265_CRF_OFFSET
+    gop = max(1, (fps or ASSUMED_CAMERA_FPS) * max(1, profile.gop_seconds))
+    args += [
+        "-c:v", encoder, "-preset", encoder_profile.preset, "-crf", str(min(51, crf)),
+        "-threads", str(encoder_profile.threads), "-g", str(gop),
+    ]
+    if encoder == "libx265":
+        args += ["-x265-params", "log-level=error"]
+    max_kbps = int(profile.max_kbps * kbps_factor)
+    if max_kbps:
+        args += ["-maxrate", f"{max_kbps}k", "-bufsize", f"{max_kbps * 2}k"]
+    return args
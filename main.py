@@ -1,6 +1,7 @@
 # camera_app/main.py
 
 import sys, os
+import multiprocessing
 
 # ── Setup bundled tool paths FIRST, before any other imports ──────────────
 from utils.paths import setup_runtime_env, resource_path
@@ -8,13 +9,14 @@ setup_runtime_env()
 # ──────────────────────────────────────────────────────────────────────────
 
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from controller.app_controller import AppController
 from ui.styles import apply_dark_theme
 from utils.logging import log
 from PyQt5.QtGui import QIcon
 from utils.security_pendrive import check_pendrive_key
-from utils.helper import fix_orphaned_metadata
+from utils.helper import collect_open_segments, recover_open_segments_async
+from utils.recording_journal import set_register_tag
 from utils.subproc import kill_orphaned_subprocesses
 
 RESTART_EXIT_CODE = 2
@@ -28,20 +30,37 @@ def run_app():
     app.setWindowIcon(QIcon(resource_path("assets/logo.png")))
     apply_dark_theme(app)
 
+    from config.config_manager import ConfigManager as _CM
+    recording_service = _CM().get_recording_service()
+    if recording_service:
+        # Recording happens in the service; this process journals only its
+        # mosaics, in a register of its own, and must not touch the service's
+        set_register_tag("gui")
+
     # ---- Kill orphaned ffmpeg/gstreamer from previous crash ----
-    try:
-        kill_orphaned_subprocesses()
-    except Exception as e:
-        log.warning(f"Failed to kill orphaned subprocesses: {e}")
+    # (not with a recording service: its ffmpegs are alive, not orphaned;
+    # a service left running from when it was on is stopped first, so it
+    # does not record the same cameras into the same files as this GUI)
+    if not recording_service:
+        try:
+            from controller.recording_service import stop_recording_service
+            stop_recording_service(_CM())
+        except Exception as e:
+            log.warning(f"Failed to stop the recording service: {e}")
+        try:
+            kill_orphaned_subprocesses()
+        except Exception as e:
+            log.warning(f"Failed to kill orphaned subprocesses: {e}")
     # ------------------------------------------------------------
 
-    # ---- Fix metadata left orphaned by previous crash/close ----
+    # ---- Note segments left open by previous crash/close ----
+    # (only the small open-segment registers are read here; they are
+    # closed in the background once the UI is up)
+    open_segments = []
     try:
-        from config.config_manager import ConfigManager as _CM
-        _recording_folder = _CM().get_recording_folder()
-        fix_orphaned_metadata(recordings_root=_recording_folder)
+        open_segments = collect_open_segments(_CM().get_recording_folders())
     except Exception as e:
-        log.warning(f"Failed to fix orphaned metadata on startup: {e}")
+        log.warning(f"Failed to read open segments on startup: {e}")
     # ------------------------------------------------------------
 
     # ---- Security USB check (pendrive dongle) ----
@@ -67,6 +86,7 @@ def run_app():
     # ----------------------------------------------
 
     controller = AppController()
+    QTimer.singleShot(0, lambda: recover_open_segments_async(open_segments))
 
     try:
         exit_code = app.exec_()
@@ -92,4 +112,25 @@ def main():
         os._exit(exit_code)
 
 if __name__ == "__main__":
-    main()
+    multiprocessing.freeze_support()   # media probe pool workers in the frozen EXE
+    if "--window-host" in sys.argv:
+        # Secondary camera window launched by AppController (window_processes)
+        from controller.window_process import run_window_host
+        run_window_host(sys.argv[1:])
+    elif "--recorder-node" in sys.argv:
+        # Recorder node launched by AppController (recorder_nodes) or by hand on another machine
+        from controller.recorder_node import run_recorder_node
+        run_recorder_node(sys.argv[1:])
+    elif "--recording-service" in sys.argv:
+        # Headless recorders that outlive the GUI (recording_service)
+        from controller.recording_service import run_recording_service
+        run_recording_service(sys.argv[1:])
+    elif "--stop-recording-service" in sys.argv:
+        # Stop a running recording service (exit, uninstall)
+        from config.config_manager import ConfigManager
+        from controller.recording_service import stop_recording_service
+        stopped = stop_recording_service(ConfigManager())
+        log.info("Recording service stopped." if stopped else "No recording service running.")
+        os._exit(0)
+    else:
+        main()
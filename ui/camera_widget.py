@@ -1,10 +1,11 @@
 # camera_app/ui/camera_widget.py
 
 import os
-from PyQt5.QtWidgets import QWidget, QLabel, QSizePolicy, QMessageBox, QVBoxLayout
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer
-from PyQt5.QtGui import QPixmap, QImage, QFont
+from PyQt5.QtWidgets import QWidget, QLabel, QSizePolicy, QMessageBox, QVBoxLayout, QMenu
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap, QFont
 from core.camera_stream_worker import CameraStreamWorker
+from core.frame_preparer import get_frame_preparer
 from utils.logging import log
 
 STATUS_COLOR = {
@@ -13,10 +14,13 @@ STATUS_COLOR = {
     "ERROR": "#F44336",           # Red
     "CONNECTED": "#4CAF50"        # Green
 }
+MOTION_BORDER_COLOR = "#FFC107"   # Amber
+TILE_STYLE = "border: {width}px solid {color}; background-color: #2c2c2c; border-radius: 5px;"
 
 class CameraWidget(QWidget):
     doubleClicked = pyqtSignal(int)
     connectionStatusChanged =  pyqtSignal(int, bool) #new signal 
+    replayRequested = pyqtSignal(int, int)  # cam_id, seconds
 
     def __init__(self, cam_id, name="Camera", logo_path="assets/logo.png"):
         super().__init__()
@@ -28,10 +32,12 @@ class CameraWidget(QWidget):
         self.is_configured = False
         self.is_enabled = False
         self.stream_worker = None
-        self._pending_frame = None  # latest frame awaiting paint (drop-old strategy)
+        self._preparer = get_frame_preparer()
+        self._target_size = (0, 0)  # tile size the preparer scales frames to
+        self.motion_active = False
 
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.setStyleSheet("border: 1px solid #444; background-color: #2c2c2c; border-radius: 5px;")
+        self.setStyleSheet(TILE_STYLE.format(width=1, color="#444"))
 
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -60,6 +66,15 @@ class CameraWidget(QWidget):
     def mouseDoubleClickEvent(self, event):
         self.doubleClicked.emit(self.cam_id)
 
+    def contextMenuEvent(self, event):
+        if not self.is_configured:
+            return
+        menu = QMenu(self)
+        for seconds in (30, 60):
+            action = menu.addAction(f"Instant replay (last {seconds} s)")
+            action.triggered.connect(lambda _=False, s=seconds: self.replayRequested.emit(self.cam_id, s))
+        menu.exec_(event.globalPos())
+
     def show_error_popup(self, message):
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Warning)
@@ -77,40 +92,24 @@ class CameraWidget(QWidget):
         self.content.setText("No Stream")
         self.update_status()
 
-    def handle_frame(self, cam_id, frame):
-        """Store the latest frame and schedule a single paint.
-        If frames arrive faster than the UI can paint, older ones are dropped."""
-        if cam_id != self.cam_id:
-            return
-        self._pending_frame = frame
-        # Schedule paint on next event-loop tick (coalesces multiple frames)
-        QTimer.singleShot(0, self._paint_pending_frame)
-
-    def _paint_pending_frame(self):
-        """Paint only the most recent frame, discarding any that arrived in between."""
-        frame = self._pending_frame
-        if frame is None or not self.isVisible():
-            if self.stream_worker:
-                self.stream_worker.frame_consumed = True
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        size = self.content.size()
+        self._target_size = (size.width(), size.height())
+        self._preparer.set_target_size(self.cam_id, self._target_size)
+
+    def _show_image(self, image):
+        """Blit an already-scaled image (GUI thread; called by the FramePreparer)."""
+        if self.stream_worker and self.isVisible():
+            self.content.setPixmap(QPixmap.fromImage(image))
+
+    def set_motion(self, active):
+        """Highlight the tile while the motion engine sees activity."""
+        if active == self.motion_active:
             return
-        self._pending_frame = None  # consume it
-
-        height, width, channel = frame.shape
-        bytes_per_line = 3 * width
-        q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888).copy()
-        pixmap = QPixmap.fromImage(q_img)
-
-        content_size = self.content.size()
-        self.content.setPixmap(pixmap.scaled(
-            content_size.width(),
-            content_size.height(),
-            Qt.KeepAspectRatio,
-            Qt.FastTransformation
-        ))
-
-        # Tell worker we're ready for the next frame
-        if self.stream_worker:
-            self.stream_worker.frame_consumed = True
+        self.motion_active = active
+        self.setStyleSheet(TILE_STYLE.format(width=3, color=MOTION_BORDER_COLOR) if active
+                           else TILE_STYLE.format(width=1, color="#444"))
 
     def update_connection_status(self, cam_id, connected):
         if cam_id == self.cam_id:
@@ -148,7 +147,11 @@ class CameraWidget(QWidget):
         self.stop_stream()
 
         self.stream_worker = CameraStreamWorker(self.cam_id, rtsp_url)
-        self.stream_worker.frameReady.connect(self.handle_frame)
+        self._preparer.attach(
+            self.cam_id, self.stream_worker.frame_slot,
+            self._show_image, is_active=self.isVisible,
+        )
+        self._preparer.set_target_size(self.cam_id, self._target_size)
         self.stream_worker.connectionStatus.connect(self.update_connection_status)
 
         self.stream_worker.finished.connect(lambda: log.info(f"Camera {self.cam_id}: Thread fully stopped."))
@@ -166,15 +169,15 @@ class CameraWidget(QWidget):
         if self.stream_worker:
             log.info(f"Stopping stream for Camera {self.cam_id} (blocking={blocking})")
             try:
-                self.stream_worker.frameReady.disconnect(self.handle_frame)
                 self.stream_worker.connectionStatus.disconnect(self.update_connection_status)
             except (TypeError, RuntimeError):
                 pass  # already disconnected
             self.stream_worker.stop(blocking=blocking)
             self.stream_worker = None
-            self._pending_frame = None
+            self._preparer.detach(self.cam_id)
             self.is_streaming = False
             self.is_connected = False
+            self.set_motion(False)
             self.show_placeholder()
 
     def update_name(self, name):
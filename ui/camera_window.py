@@ -7,10 +7,12 @@ from PyQt5.QtWidgets import (
     QPushButton, QSizePolicy, QLabel, QLineEdit, QDialog, QFrame, QGraphicsDropShadowEffect,
 )
 from PyQt5.QtGui import QIcon, QColor
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
 from ui.camera_widget import CameraWidget
+from core.frame_preparer import get_frame_preparer
+from core.motion import get_motion_hub
 from utils.logging import log
-from ui.playbackdialog import PlaybackDialog
+from ui.playbackdialog import PlaybackDialog, InstantReplayDialog
 from ui.responsive import ScreenScaler
 from utils.paths import resource_path
 
@@ -25,6 +27,12 @@ _CARD_HOVER = "#2f2f50"
 _TEXT = "#e0e0e0"
 _TEXT_MUTED = "#888888"
 
+# Stagger between stream starts: generous at startup, short when flipping pages
+STARTUP_STREAM_STAGGER_MS = 2000
+PAGE_STREAM_STAGGER_MS = 250
+MOTION_HIGHLIGHT_MS = 500          # how often tiles pick up the motion engine's results
+MOTION_HIGHLIGHT_HOLD_S = 2.0      # a tile stays highlighted this long after motion
+
 
 class _SettingsKeyDialog(QDialog):
     """Styled password dialog for settings access."""
@@ -196,7 +204,7 @@ class _SettingsPanel(QDialog):
         # --- Action cards ---
         root.addWidget(self._make_card(
             "Change Camera Count",
-            "Modify the grid layout (4 - 64 cameras)",
+            "Modify the grid layout or number of cameras",
             self.ACTION_CAMERA_COUNT,
         ))
 
@@ -300,7 +308,11 @@ class _SettingsPanel(QDialog):
 
 
 class CameraWindow(QMainWindow):
-    def __init__(self, title, camera_ids, rows, cols, stream_config, controller=None):
+    # Forwarded from every tile; the coordinator starts recorders from it
+    cameraConnectionChanged = pyqtSignal(int, bool)
+
+    def __init__(self, title, camera_ids, rows, cols, stream_config, controller=None,
+                 page_size=None, tour_seconds=20):
         super().__init__()
         self.setWindowTitle(title)
         _logo = resource_path("assets/logo.png")
@@ -313,9 +325,22 @@ class CameraWindow(QMainWindow):
         self.poll_timer.timeout.connect(self.poll_disconnected_cameras)
         self.poll_timer.start(5 * 60 * 1000)  # Every 5 minutes
 
+        self._motion_timer = QTimer(self)
+        self._motion_timer.timeout.connect(self._update_motion_highlights)
+        self._motion_timer.start(MOTION_HIGHLIGHT_MS)
+
         self.camera_ids = camera_ids
         self.rows = rows
         self.cols = cols
+
+        # Paging: only the visible page's cameras are decoded for display.
+        # Without a page size every camera is on a single page (classic grid).
+        per_page = page_size if page_size and len(camera_ids) > page_size else max(1, len(camera_ids))
+        self.pages = [camera_ids[i:i + per_page] for i in range(0, len(camera_ids), per_page)] or [[]]
+        self.current_page = 0
+        self.tour_seconds = tour_seconds
+        self._stream_delay_ms = STARTUP_STREAM_STAGGER_MS
+        self._stream_generation = 0
         self.config_manager = stream_config
         self.stream_config = stream_config
         self.controller = controller
@@ -325,6 +350,7 @@ class CameraWindow(QMainWindow):
         self.focused_cam_id = None
         self._streams_cleaned = False
         self._pre_focus_size = None
+        self._mosaic = None           # MosaicRecorder of this window's grid (optional)
 
         self.central_widget = QWidget()
         layout = QVBoxLayout()
@@ -372,7 +398,7 @@ class CameraWindow(QMainWindow):
             """)
 
             # Metrics label (left side of navbar — bold and visible)
-            self._metrics_label = QLabel("CPU: --  |  RAM: -- GB  |  App: -- MB  |  Rec: -- / -- GB")
+            self._metrics_label = QLabel("CPU: --  |  RAM: -- GB  |  App: -- MB  |  Rec: -- / -- GB  |  Prep: -- ms")
             metrics_font = self._metrics_label.font()
             metrics_font.setPointSize(scaler.scale(12))
             metrics_font.setBold(True)
@@ -407,6 +433,9 @@ class CameraWindow(QMainWindow):
             nav.addStretch()
             nav.addWidget(self._datetime_label)
             nav.addSpacing(scaler.scale(10))
+            if len(self.pages) > 1:
+                self._add_page_controls(nav, scaler)
+                nav.addSpacing(scaler.scale(10))
             nav.addWidget(playback_btn)
             nav.addWidget(self._settings_btn)
             layout.addLayout(nav)
@@ -429,16 +458,16 @@ class CameraWindow(QMainWindow):
 
         self.camera_widgets = {}
 
-        for idx, cam_id in enumerate(camera_ids):
-            r, c = divmod(idx, cols)
+        for cam_id in camera_ids:
             stream_cfg = self.stream_config.get_camera_config(cam_id)
             cam_name = stream_cfg.get("name", f"Camera {cam_id}")
 
             widget = CameraWidget(cam_id, name=cam_name, logo_path=resource_path("assets/logo.png"))
             widget.doubleClicked.connect(self.toggle_focus_view)
+            widget.replayRequested.connect(self.open_instant_replay)
             widget.connectionStatusChanged.connect(self.handle_connection_update)#new connnection 
             self.camera_widgets[cam_id] = widget
-            self.grid_layout.addWidget(widget, r, c)
+        self._place_page()
 
         for i in range(rows):
             self.grid_layout.setRowMinimumHeight(i, 100)
@@ -450,6 +479,108 @@ class CameraWindow(QMainWindow):
         self.showMaximized()
         self.initialize_streams()
 
+    # ------------------------------------------------------------------ #
+    #  Pages and tour                                                      #
+    # ------------------------------------------------------------------ #
+
+    def _add_page_controls(self, nav, scaler):
+        btn_style = f"""
+            QPushButton {{
+                background-color: #555;
+                color: white;
+                padding: {scaler.scale(6)}px {scaler.scale(10)}px;
+                border-radius: {scaler.scale(4)}px;
+            }}
+            QPushButton:hover {{
+                background-color: #777;
+            }}
+            QPushButton:checked {{
+                background-color: {_ACCENT};
+            }}
+        """
+        prev_btn = QPushButton("\u25C0")
+        prev_btn.setToolTip("Previous page")
+        prev_btn.clicked.connect(lambda: self.show_page(self.current_page - 1))
+        next_btn = QPushButton("\u25B6")
+        next_btn.setToolTip("Next page")
+        next_btn.clicked.connect(lambda: self.show_page(self.current_page + 1))
+
+        self._page_label = QLabel()
+        self._page_label.setStyleSheet("QLabel { color: #cccccc; font-weight: bold; }")
+
+        self._tour_btn = QPushButton("Tour")
+        self._tour_btn.setCheckable(True)
+        self._tour_btn.setToolTip(f"Cycle pages every {self.tour_seconds} s")
+        self._tour_btn.toggled.connect(self.set_tour_enabled)
+
+        for btn in (prev_btn, next_btn, self._tour_btn):
+            font = btn.font()
+            font.setPointSize(scaler.scale(11))
+            btn.setFont(font)
+            btn.setStyleSheet(btn_style)
+
+        self._tour_timer = QTimer(self)
+        self._tour_timer.timeout.connect(self._advance_tour)
+
+        nav.addWidget(prev_btn)
+        nav.addWidget(self._page_label)
+        nav.addWidget(next_btn)
+        nav.addWidget(self._tour_btn)
+        self._update_page_label()
+
+    def _update_page_label(self):
+        if hasattr(self, "_page_label"):
+            self._page_label.setText(f"Page {self.current_page + 1}/{len(self.pages)}")
+
+    def _page_ids(self):
+        return self.pages[self.current_page]
+
+    def _place_page(self):
+        """Put the current page's widgets in the grid; park the rest."""
+        page_ids = set(self._page_ids())
+        for cam_id, widget in self.camera_widgets.items():
+            if cam_id not in page_ids:
+                self.grid_layout.removeWidget(widget)
+                widget.hide()
+        for idx, cam_id in enumerate(self._page_ids()):
+            r, c = divmod(idx, self.cols)
+            widget = self.camera_widgets[cam_id]
+            self.grid_layout.addWidget(widget, r, c)
+            widget.show()
+
+    def show_page(self, index):
+        """Switch to another page. Display decoding follows the page;
+        recording is independent of it and continues for every camera."""
+        index %= len(self.pages)
+        if index == self.current_page:
+            return
+        if self.focused:
+            self.toggle_focus_view(self.focused_cam_id)
+
+        log.info(f"[{self.windowTitle()}] Switching to page {index + 1}/{len(self.pages)}.")
+        for cam_id in self._page_ids():
+            self.camera_widgets[cam_id].stop_stream(blocking=False)
+            self.disconnected_cams.discard(cam_id)
+
+        self.current_page = index
+        self._place_page()
+        self._update_page_label()
+        self._streams_cleaned = False
+        self._stream_delay_ms = PAGE_STREAM_STAGGER_MS
+        self.initialize_streams()
+
+    def set_tour_enabled(self, enabled):
+        if enabled:
+            self._tour_timer.start(self.tour_seconds * 1000)
+        else:
+            self._tour_timer.stop()
+        log.info(f"[{self.windowTitle()}] Tour {'started' if enabled else 'stopped'}.")
+
+    def _advance_tour(self):
+        if self.focused:
+            return  # operator is looking at one camera — don't yank the view
+        self.show_page(self.current_page + 1)
+
     def poll_disconnected_cameras(self):
         if not self.disconnected_cams:
             log.info("Polling: No disconnected cameras.")
@@ -474,10 +605,6 @@ class CameraWindow(QMainWindow):
             if cam_id in self.disconnected_cams:
                 self.disconnected_cams.discard(cam_id)
                 log.info(f"Camera {cam_id} removed from disconnected set.")
-            # Start recorder only AFTER display stream is connected
-            # so the recorder doesn't steal the camera's RTSP session
-            if self.controller:
-                self.controller.start_recording_for_camera(cam_id)
         else:
             if cam_id not in self.disconnected_cams:
                 self.disconnected_cams.add(cam_id)
@@ -488,15 +615,28 @@ class CameraWindow(QMainWindow):
                 log.info(f"Camera {cam_id} disconnected while in fullscreen — returning to grid.")
                 self.toggle_focus_view(cam_id)
 
+        # The controller starts the recorder only AFTER the display stream is
+        # connected, so the recorder doesn't steal the camera's RTSP session.
+        # Emitted as a signal so windows living in another process can
+        # forward it over IPC.
+        self.cameraConnectionChanged.emit(cam_id, connected)
+
         # Update UI title with disconnected count
         disc = len(self.disconnected_cams)
         self.setWindowTitle(f"Camera Viewer ({disc} disconnected)" if disc > 0 else "Camera Viewer")
 
     def initialize_streams(self):
-        log.info(f"Initializing streams for {len(self.camera_widgets)} cameras")
+        page_ids = self._page_ids()
+        log.info(f"Initializing streams for {len(page_ids)} cameras")
         self._stream_queue = []
+        self._stream_generation += 1
 
         for cam_id, widget in self.camera_widgets.items():
+            if cam_id not in page_ids:
+                # Off-page cameras are not decoded; just reflect their config
+                stream_cfg = self.config_manager.get_camera_config(cam_id)
+                widget.configure(stream_cfg.get("rtsp", ""), stream_cfg.get("enabled", True))
+                continue
             stream_cfg = self.config_manager.get_camera_config(cam_id)
             rtsp_url = stream_cfg.get("rtsp", "")
             is_enabled = stream_cfg.get("enabled", True)
@@ -509,18 +649,51 @@ class CameraWindow(QMainWindow):
                 log.info(f"Camera {cam_id} disabled or no RTSP.")
 
         # Stagger stream starts to avoid overwhelming network/CPU
-        self._start_next_stream()
+        self._start_next_stream(self._stream_generation)
+        self._start_mosaic_recorder()
 
-    def _start_next_stream(self):
-        if not self._stream_queue:
+    def _start_mosaic_recorder(self):
+        """Record the grid as one low-fps overview video, if enabled in the settings."""
+        if self._mosaic and self._mosaic.isRunning():
+            return
+        from config.config_manager import ConfigManager
+        config_mgr = self.controller.config_mgr if self.controller else ConfigManager()
+        recording_folder = config_mgr.get_recording_folder()
+        if not (config_mgr.get_mosaic_recording_enabled() and recording_folder):
+            return
+        from core.mosaic_recorder import MosaicRecorder
+        self._mosaic = MosaicRecorder(
+            f"Mosaic {self.camera_ids[0]}-{self.camera_ids[-1]}",
+            self._page_frame_slots, self.rows, self.cols,
+            recording_folder, fps=config_mgr.get_mosaic_fps(),
+        )
+        self._mosaic.start()
+
+    def _page_frame_slots(self):
+        """Frame slots of the visible page in grid order (None where nothing is decoded)."""
+        slots = []
+        for cam_id in self._page_ids():
+            worker = self.camera_widgets[cam_id].stream_worker
+            slots.append(worker.frame_slot if worker else None)
+        return slots
+
+    def _stop_mosaic_recorder(self):
+        if self._mosaic:
+            self._mosaic.stop()
+            self._mosaic = None
+            from utils.recording_journal import get_journal
+            get_journal().flush()   # a window process may exit right after this
+
+    def _start_next_stream(self, generation):
+        # A newer initialize_streams() (e.g. page flip) supersedes this chain
+        if generation != self._stream_generation or not self._stream_queue:
             return
         cam_id, widget, rtsp_url = self._stream_queue.pop(0)
         widget.start_stream(rtsp_url)
         log.info(f"Camera {cam_id} stream started.")
 
         if self._stream_queue:
-            # 2s gap per camera
-            QTimer.singleShot(2000, self._start_next_stream)
+            QTimer.singleShot(self._stream_delay_ms, lambda: self._start_next_stream(generation))
 
     def toggle_focus_view(self, cam_id):
         if self.focused:
@@ -533,9 +706,9 @@ class CameraWindow(QMainWindow):
             if self._pre_focus_size is not None:
                 self.setFixedSize(self._pre_focus_size)
 
-            # Show all camera widgets
-            for w in self.camera_widgets.values():
-                w.show()
+            # Show all camera widgets of the current page
+            for cid in self._page_ids():
+                self.camera_widgets[cid].show()
 
             # Restore every row and column to its original constraints
             for i in range(self.rows):
@@ -575,7 +748,7 @@ class CameraWindow(QMainWindow):
         self.focused_cam_id = cam_id
 
         # Find this camera's row and column in the grid
-        idx = self.camera_ids.index(cam_id)
+        idx = self._page_ids().index(cam_id)
         focused_row, focused_col = divmod(idx, self.cols)
 
         # Hide every other camera widget
@@ -606,12 +779,16 @@ class CameraWindow(QMainWindow):
             return
         self._streams_cleaned = True
         log.info(f"Cleaning up all camera streams (blocking={blocking}).")
+        self._stop_mosaic_recorder()
         for widget in self.camera_widgets.values():
             widget.stop_stream(blocking=blocking)
 
     def closeEvent(self, event):
         log.info("Window closing: signaling all streams to stop.")
         self.poll_timer.stop()
+        self._motion_timer.stop()
+        if hasattr(self, '_tour_timer'):
+            self._tour_timer.stop()
         if hasattr(self, '_metrics'):
             self._metrics.stop()
         if hasattr(self, '_dt_timer'):
@@ -646,20 +823,77 @@ class CameraWindow(QMainWindow):
                 self.controller.configure_recording_folder()
 
     def _update_metrics_display(self, data):
-        self._metrics_label.setText(
+        prep = get_frame_preparer().stats()
+        text = (
             f"CPU: {data['cpu_percent']:.0f}%  |  "
             f"RAM: {data['mem_total_gb']:.1f} GB  |  "
             f"App: {data['proc_mem_mb']:.0f} MB  |  "
-            f"Rec: {data['rec_free_gb']:.1f} / {data['rec_total_gb']:.1f} GB"
+            f"Rec: {data['rec_free_gb']:.1f} / {data['rec_total_gb']:.1f} GB  |  "
+            f"Prep: {prep['avg_prep_ms']:.1f} ms (q {prep['queue_depth']})"
+        )
+        tooltip = (
+            f"Frame preparation: {prep['workers']} worker(s), "
+            f"avg {prep['avg_prep_ms']:.1f} ms, max {prep['max_prep_ms']:.1f} ms, "
+            f"latency {prep['avg_latency_ms']:.1f} ms, "
+            f"{prep['prepared']} prepared / {prep['dropped']} dropped"
         )
+        rec = self.controller.get_recorder_stats() if self.controller else None
+        if rec and rec["recorders"]:
+            # recorders keeping up with their cameras (speed ≥ 1x over the last minute)
+            text += f"  |  Enc: {rec['realtime']}/{rec['measured']} realtime"
+            tooltip += f"\nRecorders: {rec['recorders']} running, {rec['dropped']} frame(s) dropped in the last minute"
+            for cam in rec["slow"]:
+                tooltip += f"\n  {cam['name']}: {cam['speed']}x, {cam['fps']} fps — behind for {cam['slow_for_s']}s"
+        self._metrics_label.setText(text)
+        self._metrics_label.setToolTip(tooltip)
 
     def open_playback_dialog(self):
         recording_folder = None
+        recording_roots = None
         if self.controller:
             recording_folder = self.controller.config_mgr.get_recording_folder()
-        dialog = PlaybackDialog(recording_folder=recording_folder, parent=self)
+            recording_roots = self.controller.get_recording_roots()
+        dialog = PlaybackDialog(recording_folder=recording_folder, recording_roots=recording_roots, parent=self)
         dialog.exec_()
 
+    def open_instant_replay(self, cam_id, seconds):
+        """Replay the last `seconds` of the camera's live recording."""
+        path = None
+        if self.controller:
+            path, _ = self.controller.get_live_recording(cam_id)
+        if not path:
+            # Window running in its own process (no controller): the live file
+            # is simply the newest one in today's folder for this camera.
+            from config.config_manager import ConfigManager
+            from utils.helper import find_latest_recording
+            config_mgr = self.controller.config_mgr if self.controller else ConfigManager()
+            cam_name = self.stream_config.get_camera_config(cam_id).get("name", f"Camera {cam_id}")
+            for root in config_mgr.get_recording_folders():
+                path = find_latest_recording(cam_name, root)
+                if path:
+                    break
+        if not path:
+            QMessageBox.information(
+                self, "Instant Replay",
+                f"Camera {cam_id} is not being recorded, so there is nothing to replay.",
+            )
+            return
+
+        dialog = InstantReplayDialog(path, seconds, title=self.camera_widgets[cam_id].name, parent=self)
+        success, error = dialog.load()
+        if not success:
+            QMessageBox.warning(self, "Instant Replay", error)
+            dialog.deleteLater()
+            return
+        dialog.exec_()
+
+    def _update_motion_highlights(self):
+        hub = get_motion_hub()
+        for cam_id, widget in self.camera_widgets.items():
+            if widget.is_streaming and widget.isVisible():
+                since = hub.seconds_since_motion(cam_id)
+                widget.set_motion(since is not None and since < MOTION_HIGHLIGHT_HOLD_S)
+
     def _update_datetime(self):
         """Update the live clock label in the navbar."""
         self._datetime_label.setText(
@@ -3,12 +3,16 @@ from PyQt5.QtWidgets import (
     QDialog, QLabel, QLineEdit, QComboBox, QPushButton,
     QVBoxLayout, QDialogButtonBox, QTableWidget, QTableWidgetItem,
     QWidget, QHBoxLayout, QApplication, QMessageBox, QFileDialog,
+    QFormLayout, QSpinBox,
 )
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QIntValidator
 import os
 from utils.logging import log
 from utils.paths import resource_path
+from core.recording_profile import (
+    CODECS, FPS_CHOICES, HEIGHT_CHOICES, PRIORITIES, RecordingProfile, describe, profile_from_config, profile_to_config,
+)
 import json
 from datetime import datetime, timedelta
 import csv
@@ -59,8 +63,8 @@ class CameraConfigDialog(QDialog):
         layout.addLayout(master_buttons_layout)
 
         # Table setup
-        self.table = QTableWidget(camera_count, 4)
-        self.table.setHorizontalHeaderLabels(["Camera Name", "RTSP URL", "Recording","Enabled"])
+        self.table = QTableWidget(camera_count, 6)
+        self.table.setHorizontalHeaderLabels(["Camera Name", "RTSP URL", "Recording", "Mode", "Profile", "Enabled"])
         self.table.setFont(main_font)
         self.table.setStyleSheet("""
             QTableWidget {
@@ -95,10 +99,15 @@ class CameraConfigDialog(QDialog):
         header.setSectionResizeMode(0, self.table.horizontalHeader().ResizeToContents)  # Camera Name → stretch
         header.setSectionResizeMode(1, self.table.horizontalHeader().Stretch)  # RTSP URL → fit contents
         header.setSectionResizeMode(2, self.table.horizontalHeader().ResizeToContents)  # Enabled → fit content
-        header.setSectionResizeMode(3, self.table.horizontalHeader().ResizeToContents)
+        header.setSectionResizeMode(3, self.table.horizontalHeader().ResizeToContents)  # Mode → fit content
+        header.setSectionResizeMode(4, self.table.horizontalHeader().ResizeToContents)  # Profile → fit content
+        header.setSectionResizeMode(5, self.table.horizontalHeader().ResizeToContents)
         
         self.enable_buttons = {}
         self.record_buttons = {}
+        self.mode_combos = {}
+        self.profiles = {}
+        self.profile_buttons = {}
 
         for row in range(camera_count):
             cam_id = row + 1
@@ -140,6 +149,23 @@ class CameraConfigDialog(QDialog):
             record_layout.setContentsMargins(0, 0, 0, 0)
             self.table.setCellWidget(row, 2, record_container)
 
+            # Recording mode: continuous, or only around motion (with pre/post-roll)
+            mode_combo = QComboBox()
+            mode_combo.setFont(main_font)
+            mode_combo.addItem("Continuous", "continuous")
+            mode_combo.addItem("Motion", "motion")
+            mode_combo.setCurrentIndex(max(0, mode_combo.findData(data.get("record_mode", "continuous"))))
+            self.mode_combos[cam_id] = mode_combo
+            self.table.setCellWidget(row, 3, mode_combo)
+
+            # Recording profile: codec, fps, resolution, quality (edited in a small dialog)
+            self.profiles[cam_id] = profile_from_config(data.get("recording_profile"))
+            profile_btn = QPushButton(describe(self.profiles[cam_id]))
+            profile_btn.setFont(main_font)
+            profile_btn.clicked.connect(lambda checked, cid=cam_id: self.edit_profile(cid))
+            self.profile_buttons[cam_id] = profile_btn
+            self.table.setCellWidget(row, 4, profile_btn)
+
             # Enabled Button (inside table, synced)
             enable_btn = QPushButton()
             enable_btn.setCheckable(True)
@@ -158,7 +184,7 @@ class CameraConfigDialog(QDialog):
             button_layout.addWidget(enable_btn)
             button_layout.setAlignment(Qt.AlignCenter)
             button_layout.setContentsMargins(0, 0, 0, 0)  # Ensure no cutting
-            self.table.setCellWidget(row, 3, button_container)
+            self.table.setCellWidget(row, 5, button_container)
 
         layout.addWidget(self.table)
         
@@ -191,6 +217,13 @@ class CameraConfigDialog(QDialog):
         self.setLayout(layout)
         self.center_dialog_on_screen()
 
+    def edit_profile(self, cam_id):
+        name = self.table.item(cam_id - 1, 0).text()
+        dialog = RecordingProfileDialog(self.profiles[cam_id], name, self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.profiles[cam_id] = dialog.get_profile()
+            self.profile_buttons[cam_id].setText(describe(self.profiles[cam_id]))
+
     def toggle_button(self, btn):
         btn.setText("Enabled" if btn.isChecked() else "Disabled")
         btn.setStyleSheet(self.button_style(btn.isChecked()))
@@ -283,12 +316,16 @@ class CameraConfigDialog(QDialog):
                 enabled = self.enable_buttons[cam_id].isChecked()
                 record = self.record_buttons[cam_id].isChecked()
 
-                data = {
+                # keep keys this dialog does not edit
+                data = dict(self.config_manager.get_camera_config(cam_id))
+                data.update({
                     "name": name,
                     "rtsp": rtsp,
                     "enabled": enabled,
-                    "record": record
-                }
+                    "record": record,
+                    "record_mode": self.mode_combos[cam_id].currentData(),
+                    "recording_profile": profile_to_config(self.profiles[cam_id])
+                })
                 self.config_manager.set_camera_config(cam_id, data)
 
             self.accept()  # controller will rebuild windows after dialog closes
@@ -463,6 +500,104 @@ class CameraConfigDialog(QDialog):
         except Exception as e:
             QMessageBox.critical(self, "Import Failed", str(e))
         
+class RecordingProfileDialog(QDialog):
+    """Edit one camera's recording profile (see core/recording_profile.py)."""
+
+    def __init__(self, profile, cam_name, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Recording Profile — {cam_name}")
+        self.setMinimumWidth(420)
+
+        main_font = QFont()
+        main_font.setPointSize(13)
+        self.setFont(main_font)
+
+        form = QFormLayout()
+        self.codec_combo = QComboBox()
+        for key, (label, _) in CODECS.items():
+            self.codec_combo.addItem(label, key)
+        self.codec_combo.setCurrentIndex(max(0, self.codec_combo.findData(profile.codec)))
+        form.addRow("Codec", self.codec_combo)
+
+        self.fps_combo = QComboBox()
+        for fps in FPS_CHOICES:
+            self.fps_combo.addItem(f"{fps} fps" if fps else "Camera's own", fps)
+        self._select(self.fps_combo, profile.fps)
+        form.addRow("Frame rate", self.fps_combo)
+
+        self.height_combo = QComboBox()
+        for height in HEIGHT_CHOICES:
+            self.height_combo.addItem(f"{height}p" if height else "Camera's own", height)
+        self._select(self.height_combo, profile.height)
+        form.addRow("Resolution", self.height_combo)
+
+        self.crf_spin = QSpinBox()
+        self.crf_spin.setRange(0, 51)
+        self.crf_spin.setSpecialValueText("Automatic")
+        self.crf_spin.setValue(profile.crf)
+        form.addRow("Quality (CRF)", self.crf_spin)
+
+        self.kbps_spin = QSpinBox()
+        self.kbps_spin.setRange(0, 50000)
+        self.kbps_spin.setSingleStep(256)
+        self.kbps_spin.setSuffix(" kb/s")
+        self.kbps_spin.setSpecialValueText("No cap")
+        self.kbps_spin.setValue(profile.max_kbps)
+        form.addRow("Bitrate cap", self.kbps_spin)
+
+        self.gop_spin = QSpinBox()
+        self.gop_spin.setRange(1, 10)
+        self.gop_spin.setSuffix(" s")
+        self.gop_spin.setValue(max(1, profile.gop_seconds))
+        form.addRow("Keyframe every", self.gop_spin)
+
+        # Under disk pressure low-priority cameras lose quality first
+        self.priority_combo = QComboBox()
+        for priority, label in PRIORITIES.items():
+            self.priority_combo.addItem(label, priority)
+        self._select(self.priority_combo, profile.priority)
+        form.addRow("Priority when disk is full", self.priority_combo)
+
+        self.codec_combo.currentIndexChanged.connect(self._update_enabled)
+        self._update_enabled()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+    @staticmethod
+    def _select(combo, value):
+        index = combo.findData(value)
+        if index < 0:
+            # a value set outside this dialog (e.g. edited in the JSON file)
+            combo.addItem(str(value), value)
+            index = combo.count() - 1
+        combo.setCurrentIndex(index)
+
+    def _update_enabled(self):
+        # copy stores the camera's stream untouched; nothing else applies
+        encoding = self.codec_combo.currentData() != "copy"
+        for widget in (self.fps_combo, self.height_combo, self.crf_spin, self.kbps_spin, self.gop_spin,
+                       self.priority_combo):
+            widget.setEnabled(encoding)
+
+    def get_profile(self):
+        return RecordingProfile(
+            codec=self.codec_combo.currentData(),
+            fps=self.fps_combo.currentData(),
+            height=self.height_combo.currentData(),
+            crf=self.crf_spin.value(),
+            max_kbps=self.kbps_spin.value(),
+            gop_seconds=self.gop_spin.value(),
+            priority=self.priority_combo.currentData(),
+        )
+
+
 class CameraCountDialog(QDialog):
     def __init__(self, valid_camera_counts=None):
         super().__init__()
@@ -470,7 +605,7 @@ class CameraCountDialog(QDialog):
         self.setFixedSize(500, 200)
 
         layout = QVBoxLayout()
-        label = QLabel("Choose number of camera to display: ")
+        label = QLabel("Choose or type the number of cameras to display: ")
         label_font = QFont()
         label_font.setPointSize(13)
         label.setFont(label_font)
@@ -498,6 +633,9 @@ class CameraCountDialog(QDialog):
             """)
         valid_counts = valid_camera_counts or [4, 8, 12, 16, 20, 24, 32, 50, 48, 56, 64]
         self.combo.addItems([str(c) for c in valid_counts])
+        # Any other count is accepted too; it is shown as pages of cameras
+        self.combo.setEditable(True)
+        self.combo.setValidator(QIntValidator(1, 512, self))
         layout.addWidget(self.combo)
 
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -509,7 +647,10 @@ class CameraCountDialog(QDialog):
         self.center_dialog_on_screen()
 
     def get_selected_count(self):
-        return int(self.combo.currentText())
+        try:
+            return int(self.combo.currentText())
+        except ValueError:
+            return 0
 
     def center_dialog_on_screen(self):
         screen = QApplication.primaryScreen().geometry()
@@ -12,8 +12,10 @@ import time
 import json
 from ui.responsive import ScreenScaler
 from utils.logging import Logger
-from utils.helper import get_all_recorded_cameras
+from utils.helper import get_all_recorded_cameras, find_recording_segments_for_time_range
 from core.camera_playback_worker import CameraPlaybackWorker
+from utils.fmp4 import extract_tail
+from utils.paths import get_data_dir
 
 log = Logger.get_logger(name="DebugPlayback", log_file="pipeline1.log")
 
@@ -331,7 +333,7 @@ class MediaControls(QWidget):
 
 # ========== MAIN PLAYBACK DIALOG ==========
 class PlaybackDialog(QDialog):
-    def __init__(self, recording_folder=None, parent=None):
+    def __init__(self, recording_folder=None, recording_roots=None, parent=None):
         super().__init__(parent)
 
         self.setWindowTitle("Playback Dialog")
@@ -351,7 +353,7 @@ class PlaybackDialog(QDialog):
         self.setLayout(self.main_layout)
 
         # Control panel (left)
-        self.control_panel = ControlPanel(recording_folder=recording_folder)
+        self.control_panel = ControlPanel(recording_folder=recording_folder, recording_roots=recording_roots)
         self.main_layout.addWidget(self.control_panel, 1)
 
         # Preview panel (right)
@@ -362,6 +364,7 @@ class PlaybackDialog(QDialog):
         self.worker = CameraPlaybackWorker(
             self.preview_panel.get_video_frame(),
             recording_folder=recording_folder,
+            recording_roots=recording_roots,
         )
 
         # Connect signals
@@ -529,26 +532,32 @@ class PlaybackDialog(QDialog):
             return
 
         table = QTableWidget()
-        table.setColumnCount(3)
-        table.setHorizontalHeaderLabels(["File Name", "Start Time", "End Time"])
+        table.setColumnCount(4)
+        table.setHorizontalHeaderLabels(["File Name", "Start Time", "End Time", "Type"])
         table.setRowCount(len(metadata_entries))
 
         table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         table.setColumnWidth(1, 100)
         table.setColumnWidth(2, 100)
+        table.setColumnWidth(3, 90)
 
         for row, entry in enumerate(metadata_entries):
             item0 = QTableWidgetItem(entry["file"])
             item1 = QTableWidgetItem(entry["start"])
             item2 = QTableWidgetItem(entry["end"])
+            kind = ["Motion"] if entry.get("trigger") == "motion" else []
+            if entry.get("tier") == "low":
+                kind.append("Low-res")
+            item3 = QTableWidgetItem(", ".join(kind))
             # Store real start and duration in item0
             item0.setData(Qt.UserRole, entry.get("real_start"))
             item0.setData(Qt.UserRole + 1, entry.get("duration"))
-            for item in (item0, item1, item2):
+            for item in (item0, item1, item2, item3):
                 item.setFlags(item.flags() & ~Qt.ItemIsEditable)
             table.setItem(row, 0, item0)
             table.setItem(row, 1, item1)
             table.setItem(row, 2, item2)
+            table.setItem(row, 3, item3)
 
         # Save table as instance variable for access in the slot
         self.info_table = table
@@ -567,11 +576,15 @@ class ControlPanel(QWidget):
     extract_requested = pyqtSignal()
     info_requested = pyqtSignal(str, str)
 
-    def __init__(self, recording_folder=None, parent=None):
+    def __init__(self, recording_folder=None, recording_roots=None, parent=None):
         super().__init__(parent)
 
         self.recording_folder = recording_folder
-        self.recorded_cameras = get_all_recorded_cameras(recordings_root=recording_folder)
+        # every volume of the storage pool; the recording folder alone without one
+        self.recording_roots = recording_roots or [recording_folder]
+        self.recorded_cameras = sorted({
+            cam for root in self.recording_roots for cam in get_all_recorded_cameras(recordings_root=root)
+        })
 
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
@@ -655,7 +668,7 @@ class ControlPanel(QWidget):
 
         # Backend call moved here
         available_dates = CameraPlaybackWorker.get_available_recording_dates(
-            cam_name, root=self.recording_folder
+            cam_name, roots=self.recording_roots
         )
         for date in available_dates:
             calendar.setDateTextFormat(date, fmt_highlight)
@@ -708,3 +721,95 @@ class PreviewPanel(QWidget):
 
     def get_win_id(self):
         return int(self.video_frame.winId())
+
+# ========== INSTANT REPLAY (LIVE TILE) ==========
+class InstantReplayDialog(QDialog):
+    """Plays the last N seconds of a camera's live recording.
+
+    The tail is cut straight out of the fragmented MP4 that is still being
+    written (see utils/fmp4.py): only the init segment and the last few
+    fragments are copied, so it opens quickly regardless of file size. If
+    the segment rolled over less than N seconds ago, the rest comes from the
+    end of the previous segment.
+    """
+
+    def __init__(self, video_path, seconds, title="Camera", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Instant Replay – {title} (last {seconds} s)")
+        self.video_path = video_path
+        self.seconds = seconds
+
+        scaler = ScreenScaler()
+        self.resize(int(scaler.width * 0.5), int(scaler.height * 0.55))
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.preview_panel = PreviewPanel()
+        layout.addWidget(self.preview_panel)
+
+        self.vlc_instance = vlc.Instance()
+        self.player = self.vlc_instance.media_player_new()
+        self.player.set_hwnd(self.preview_panel.get_win_id())
+        self.preview_panel.set_player(self.player)
+        self.preview_panel.media_controls.play_pause_clicked.connect(self.toggle_play_pause)
+        self.preview_panel.media_controls.volume_changed.connect(self.player.audio_set_volume)
+
+        _temp_dir = os.path.join(get_data_dir(), "temp")
+        os.makedirs(_temp_dir, exist_ok=True)
+        self.clip_path = os.path.join(_temp_dir, f"replay_{os.path.basename(video_path)}")
+
+    def load(self):
+        """Cut the tail and start playing. Returns (success, error_message)."""
+        started = time.perf_counter()
+        try:
+            covered = extract_tail(self.video_path, self.seconds, self.clip_path, previous=self._previous_segment())
+        except Exception as e:
+            log.warning(f"[Replay] Failed to cut tail of {self.video_path}: {e}")
+            return False, f"The recording has no playable data yet.\n\n{e}"
+        log.info(
+            f"[Replay] {os.path.basename(self.video_path)}: "
+            f"{covered or 0:.1f}s tail ready in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        self.player.set_media(self.vlc_instance.media_new(self.clip_path))
+        self.player.play()
+        self.preview_panel.reset_controls()
+        return True, None
+
+    def _previous_segment(self):
+        """The segment recorded just before video_path within the replay window, or None."""
+        cam_dir = os.path.dirname(self.video_path)
+        day_dir = os.path.dirname(cam_dir)
+        root, cam_name = os.path.dirname(day_dir), os.path.basename(cam_dir)
+        now = datetime.datetime.now()
+        since = now - datetime.timedelta(seconds=self.seconds)
+        segments = []
+        # The window can reach back into yesterday's folder
+        for day in sorted({since.date(), now.date()}):
+            start = max(since, datetime.datetime.combine(day, datetime.time.min))
+            end = min(now, datetime.datetime.combine(day, datetime.time.max))
+            segments += find_recording_segments_for_time_range(
+                cam_name, day.strftime("%Y_%m_%d"), start.time(), end.time(), root
+            )
+        # Segment names sort by start time (<cam>_<date>_<time>.mp4)
+        current = os.path.basename(self.video_path)
+        earlier = [path for path, _, _ in segments if os.path.basename(path) < current]
+        return earlier[-1] if earlier else None
+
+    def toggle_play_pause(self):
+        state = self.player.get_state()
+        if state == vlc.State.Ended:
+            self.player.stop()
+            self.player.play()
+        elif state == vlc.State.Playing:
+            self.player.pause()
+        else:
+            self.player.play()
+
+    def closeEvent(self, event):
+        self.preview_panel.media_controls.position_timer.stop()
+        self.player.stop()
+        try:
+            os.remove(self.clip_path)
+        except OSError:
+            pass
+        event.accept()
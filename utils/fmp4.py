@@ -0,0 +1,315 @@
+# utils/fmp4.py
+"""
+Minimal fragmented-MP4 reader for recordings written with
+`-movflags frag_keyframe+empty_moov`.
+
+Such a file is an init segment (ftyp + empty moov) followed by one
+moof/mdat pair per GOP, and stays playable while ffmpeg is still writing
+it. That lets us cut "the last N seconds" out of a live, multi-gigabyte
+recording by copying only the init segment and the tail fragments — no
+ffmpeg, no scan from the start of the file.
+"""
+
+import os
+import struct
+
+_HEADER = struct.Struct(">I4s")
+
+
+def _read_box_header(f, offset, file_end):
+    """Return (box_type, box_size, header_size) at offset, or None if incomplete."""
+    if offset + 8 > file_end:
+        return None
+    f.seek(offset)
+    data = f.read(8)
+    if len(data) < 8:
+        return None
+    size, box_type = _HEADER.unpack(data)
+    header = 8
+    if size == 1:
+        ext = f.read(8)
+        if len(ext) < 8:
+            return None
+        size = struct.unpack(">Q", ext)[0]
+        header = 16
+    elif size == 0:
+        size = file_end - offset
+    if size < header:
+        return None
+    return box_type, size, header
+
+
+def iter_boxes(f, start, end):
+    """Yield (box_type, offset, size, header_size) for complete boxes in [start, end)."""
+    offset = start
+    while offset < end:
+        hdr = _read_box_header(f, offset, end)
+        if hdr is None:
+            return
+        box_type, size, header = hdr
+        if offset + size > end:
+            return  # box still being written
+        yield box_type, offset, size, header
+        offset += size
+
+
+def _find_child(f, start, end, box_type):
+    for btype, off, size, header in iter_boxes(f, start, end):
+        if btype == box_type:
+            return off, size, header
+    return None
+
+
+def read_init_segment(f, file_end):
+    """Return (init_bytes, first_fragment_offset, timescale)."""
+    timescale = None
+    for box_type, off, size, header in iter_boxes(f, 0, file_end):
+        if box_type == b"moof":
+            f.seek(0)
+            return f.read(off), off, timescale
+        if box_type == b"moov":
+            timescale = _read_timescale(f, off + header, off + size)
+    raise ValueError("no fragments found (not a fragmented MP4 or nothing written yet)")
+
+
+def _read_timescale(f, start, end):
+    trak = _find_child(f, start, end, b"trak")
+    if not trak:
+        return None
+    mdia = _find_child(f, trak[0] + trak[2], trak[0] + trak[1], b"mdia")
+    if not mdia:
+        return None
+    mdhd = _find_child(f, mdia[0] + mdia[2], mdia[0] + mdia[1], b"mdhd")
+    if not mdhd:
+        return None
+    f.seek(mdhd[0] + mdhd[2])
+    version = f.read(1)[0]
+    f.seek(mdhd[0] + mdhd[2] + (20 if version == 1 else 12))
+    return struct.unpack(">I", f.read(4))[0]
+
+
+def fragment_decode_time(f, moof_offset, moof_size, moof_header):
+    """Base media decode time (track timescale units) of a fragment, or None."""
+    traf = _find_child(f, moof_offset + moof_header, moof_offset + moof_size, b"traf")
+    if not traf:
+        return None
+    tfdt = _find_child(f, traf[0] + traf[2], traf[0] + traf[1], b"tfdt")
+    if not tfdt:
+        return None
+    f.seek(tfdt[0] + tfdt[2])
+    version = f.read(4)[0]
+    if version == 1:
+        return struct.unpack(">Q", f.read(8))[0]
+    return struct.unpack(">I", f.read(4))[0]
+
+
+def _sync_to_fragment(f, offset, file_end, min_offset, chunk=1 << 20):
+    """Find the first complete moof+mdat pair at or after offset by signature scan."""
+    offset = max(offset, min_offset)
+    while offset < file_end:
+        f.seek(offset)
+        data = f.read(min(chunk, file_end - offset) + 8)
+        pos = data.find(b"moof", 4)
+        while pos != -1:
+            candidate = offset + pos - 4
+            hdr = _read_box_header(f, candidate, file_end)
+            if hdr and hdr[0] == b"moof":
+                nxt = _read_box_header(f, candidate + hdr[1], file_end)
+                if nxt and nxt[0] == b"mdat":
+                    return candidate
+            pos = data.find(b"moof", pos + 1)
+        offset += chunk
+    return None
+
+
+def extract_tail(src_path, seconds, out_path, bytes_per_second=None, previous=None):
+    """Write the init segment plus the last `seconds` of complete fragments
+    of src_path to out_path. Returns the number of seconds actually covered.
+
+    bytes_per_second is only a hint for where to start looking; the decode
+    times in the fragments decide the final cut. When src_path holds less
+    than `seconds` and `previous` (the segment recorded just before it) has
+    the same stream layout, the rest is taken from the end of `previous`.
+    """
+    file_end = os.path.getsize(src_path)
+    with open(src_path, "rb") as f:
+        init, frags, timescale, span = _tail(f, file_end, seconds, bytes_per_second)
+        with open(out_path, "wb") as out:
+            out.write(init)
+            shift = 0
+            if previous and span is not None and span < seconds:
+                shift, covered = _write_previous_tail(previous, seconds - span, init, timescale, out)
+                if covered:
+                    # reset_timestamps restarts every segment at 0: move this
+                    # one's fragments to right after the previous segment's
+                    shift -= fragment_decode_time(f, *frags[0][:3]) or 0
+                    span += covered
+            _copy_fragments(f, frags, out, shift)
+    return span
+
+
+def _write_previous_tail(path, seconds, init, timescale, out):
+    """Copy the last `seconds` of path into out if it matches init's stream layout.
+
+    Returns (decode time where it ends, seconds covered); (0, 0) if skipped.
+    """
+    try:
+        file_end = os.path.getsize(path)
+        with open(path, "rb") as f:
+            prev_init, frags, prev_timescale, span = _tail(f, file_end, seconds)
+            if not span or prev_timescale != timescale or _sample_description(prev_init) != _sample_description(init):
+                return 0, 0
+            start = fragment_decode_time(f, *frags[0][:3])
+            if start is None:
+                return 0, 0
+            _copy_fragments(f, frags, out)
+            return start + int(span * timescale), span
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def _tail(f, file_end, seconds, bytes_per_second=None):
+    """Return (init_bytes, fragments, timescale, span) for the last `seconds` of f."""
+    init, first_frag, timescale = read_init_segment(f, file_end)
+    rate = bytes_per_second or _estimate_rate(f, file_end, first_frag, timescale)
+
+    # Walk backwards in steps until the tail spans the requested time.
+    # Usually one step: the bitrate estimate is padded by 25 %.
+    guess = file_end - int(seconds * rate * 1.25)
+    while True:
+        start = _sync_to_fragment(f, guess, file_end, first_frag) if guess > first_frag else first_frag
+        if start is None:
+            raise ValueError("no complete fragment found in the tail of the recording")
+        frags = list(_complete_fragments(f, start, file_end))
+        if not frags:
+            raise ValueError("recording tail has no complete fragments yet")
+        span = _span_seconds(f, frags, timescale)
+        if span is None or span >= seconds or start <= first_frag:
+            break
+        missing = seconds - span
+        guess = start - int(missing * rate * 1.25) - 1
+
+    # Trim from the front to the requested duration
+    if span is not None and timescale:
+        end_time = fragment_decode_time(f, *frags[-1][:3])
+        while len(frags) > 1:
+            t = fragment_decode_time(f, *frags[1][:3])
+            if t is None or (end_time - t) / timescale < seconds:
+                break
+            frags.pop(0)
+        span = _span_seconds(f, frags, timescale)
+    return init, frags, timescale, span
+
+
+def _copy_fragments(f, frags, out, decode_shift=0):
+    for moof_off, moof_size, moof_header, mdat_end in frags:
+        # Older recordings carry absolute base_data_offset values in
+        # tfhd; shift them to where the fragment lands in the clip.
+        f.seek(moof_off)
+        moof = bytearray(f.read(moof_size))
+        _shift_base_offsets(moof, moof_header, out.tell() - moof_off)
+        _shift_decode_times(moof, moof_header, decode_shift)
+        out.write(moof)
+        remaining = mdat_end - (moof_off + moof_size)
+        while remaining > 0:
+            block = f.read(min(remaining, 4 << 20))
+            if not block:
+                break
+            out.write(block)
+            remaining -= len(block)
+
+
+def _estimate_rate(f, file_end, first_frag, timescale, window=8 << 20):
+    """Bytes per second of the most recent fragments (fallback: 4 Mbit/s)."""
+    start = _sync_to_fragment(f, file_end - window, file_end, first_frag)
+    if start is not None:
+        frags = list(_complete_fragments(f, start, file_end))
+        if len(frags) > 1:
+            span = _span_seconds(f, frags, timescale)
+            if span:
+                return (frags[-1][3] - frags[0][0]) / span
+    return 500_000.0
+
+
+def _complete_fragments(f, start, file_end):
+    """Yield (moof_offset, moof_size, moof_header, mdat_end) for complete pairs."""
+    moof = None
+    for box_type, off, size, header in iter_boxes(f, start, file_end):
+        if box_type == b"moof":
+            moof = (off, size, header)
+        elif box_type == b"mdat" and moof:
+            yield moof[0], moof[1], moof[2], off + size
+            moof = None
+
+
+def _span_seconds(f, frags, timescale):
+    if not timescale:
+        return None
+    first = fragment_decode_time(f, *frags[0][:3])
+    last = fragment_decode_time(f, *frags[-1][:3])
+    if first is None or last is None:
+        return None
+    # +1 GOP: the last fragment's own duration is not in tfdt
+    gop = (last - first) / max(1, len(frags) - 1) if len(frags) > 1 else 0
+    return (last - first + gop) / timescale
+
+
+def _iter_mem_boxes(buf, start, end):
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = _HEADER.unpack_from(buf, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, offset + 8)[0]
+            header = 16
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset, size, header
+        offset += size
+
+
+def _shift_base_offsets(moof, moof_header, delta):
+    """Add delta to every explicit tfhd base_data_offset inside a moof box (in place)."""
+    if not delta:
+        return
+    for box_type, off, size, header in _iter_mem_boxes(moof, moof_header, len(moof)):
+        if box_type != b"traf":
+            continue
+        for child, coff, csize, cheader in _iter_mem_boxes(moof, off + header, off + size):
+            if child != b"tfhd":
+                continue
+            flags = struct.unpack_from(">I", moof, coff + cheader)[0] & 0xFFFFFF
+            if flags & 0x000001:  # base-data-offset-present
+                pos = coff + cheader + 8
+                base = struct.unpack_from(">Q", moof, pos)[0]
+                struct.pack_into(">Q", moof, pos, base + delta)
+
+
+def _shift_decode_times(moof, moof_header, delta):
+    """Add delta to every tfdt base media decode time inside a moof box (in place)."""
+    if not delta:
+        return
+    for box_type, off, size, header in _iter_mem_boxes(moof, moof_header, len(moof)):
+        if box_type != b"traf":
+            continue
+        for child, coff, csize, cheader in _iter_mem_boxes(moof, off + header, off + size):
+            if child != b"tfdt":
+                continue
+            pos = coff + cheader + 4
+            if moof[coff + cheader] == 1:
+                struct.pack_into(">Q", moof, pos, max(0, struct.unpack_from(">Q", moof, pos)[0] + delta))
+            else:
+                struct.pack_into(">I", moof, pos, max(0, min(0xFFFFFFFF, struct.unpack_from(">I", moof, pos)[0] + delta)))
+
+
+def _sample_description(init):
+    """The stsd box bytes of the first track in an init segment, or None."""
+    box = (0, len(init), 0)
+    for path in (b"moov", b"trak", b"mdia", b"minf", b"stbl", b"stsd"):
+        for box_type, off, size, header in _iter_mem_boxes(init, box[0] + box[2], box[0] + box[1]):
+            if box_type == path:
+                box = (off, size, header)
+                break
+        else:
+            return None
+    return bytes(init[box[0]:box[0] + box[1]])
@@ -1,38 +1,47 @@
-import json, os
+import os
 import datetime
-import subprocess
-import ctypes
+import threading
 from utils.logging import Logger
 import re
 from PyQt5.QtCore import QDate, QTime
-from utils.subproc import win_no_window_kwargs
-from utils.paths import get_ffprobe_path, get_data_dir
+from utils.paths import get_data_dir
+from utils.recording_catalog import get_catalog, get_ready_catalog, split_segment_path
+from utils.recording_journal import get_journal, read_day, segments_for_camera, day_path_of, open_segments
+from utils.media_probe import get_media_probe
 
 log = Logger.get_logger(name="Helper", log_file="pipeline1.log")
 
-def _set_hidden(path: str):
-    """Set Windows hidden file attribute so the file is invisible in Explorer."""
-    try:
-        ctypes.windll.kernel32.SetFileAttributesW(path, 0x2)  # FILE_ATTRIBUTE_HIDDEN
-    except Exception:
-        pass  # silently ignore on non-Windows or permission errors
+LOW_TIER_DIR = "lowres"   # <recordings>/lowres/<YYYY_MM_DD>/<camera>/ — long-retention copies
+RECOVERY_FALLBACK_DAYS = 2    # days scanned for open segments on roots without a register
 
 #this is used to save metadata for the recording used in core/camera_record_worker.py
-def save_metadata(path: str, start_time: datetime.datetime, duration_seconds:float = None, end_time: datetime.datetime = None):
+def save_metadata(video_path: str, start_time: datetime.datetime, duration_seconds:float = None, end_time: datetime.datetime = None, extra: dict = None):
+    """Journal a segment start (no end yet) or stop and mirror it into the catalog."""
+    try:
+        if end_time is None:
+            get_journal().segment_start(video_path, start_time, extra)
+        else:
+            if duration_seconds is None:
+                duration_seconds = (end_time - start_time).total_seconds()
+            get_journal().segment_stop(video_path, start_time, end_time, duration_seconds, extra)
+    except Exception as e:
+        log.error(f"[Recorder] Failed to journal metadata for {video_path}: {e}")
+        return
+    _update_catalog(video_path, start_time, end_time, duration_seconds,
+                    event=(extra or {}).get("trigger"), anchors=(extra or {}).get("anchors"))
+
+def _update_catalog(video_path, start_time, end_time=None, duration_seconds=None, event=None, anchors=None):
+    """Mirror a journal record into the recording catalog; never fails the caller."""
     try:
-        data = {
-            "start_time": start_time.isoformat()
-        }
-        if end_time is not None:
-            data["end_time"] = end_time.isoformat()
-        if duration_seconds is not None:
-            data["duration_seconds"] = round(duration_seconds, 2)
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        _set_hidden(path)
+        catalog = get_catalog(split_segment_path(video_path)[0])
+        if catalog:
+            catalog.record(video_path, start_time, end_time, duration_seconds, event, anchors)
     except Exception as e:
-        log.error(f"[Recorder] Failed to write metadata to {path}: {e}")
+        log.warning(f"[Catalog] Failed to index {video_path}: {e}")
+
+def get_low_tier_root(recordings_root):
+    """Root of the low-resolution tier for a recordings root."""
+    return os.path.join(recordings_root, LOW_TIER_DIR)
 
 #this is used to sanetize camera names for file paths and file names so that system does not throw errors
 def sanitize_filename(name: str) -> str:
@@ -42,9 +51,17 @@ def sanitize_filename(name: str) -> str:
 
 #this is used to get the recording enabled cameras from the stream_config.json file
 def get_all_recorded_cameras(recordings_root=None):
-    """Return a sorted list of all unique camera folder names in recordings."""
+    """Return a sorted list of all unique camera folder names in recordings (both tiers)."""
     if recordings_root is None:
         recordings_root = os.path.join(get_data_dir(), "recordings")
+    cam_names = set(_cameras_in_root(recordings_root))
+    cam_names.update(_cameras_in_root(get_low_tier_root(recordings_root)))
+    return sorted(cam_names)
+
+def _cameras_in_root(recordings_root):
+    catalog = get_ready_catalog(recordings_root)
+    if catalog:
+        return catalog.cameras()
     cam_names = set()
 
     if not os.path.exists(recordings_root):
@@ -52,80 +69,130 @@ def get_all_recorded_cameras(recordings_root=None):
 
     for date_folder in os.listdir(recordings_root):
         date_path = os.path.join(recordings_root, date_folder)
-        if not os.path.isdir(date_path):
+        if date_folder == LOW_TIER_DIR or not os.path.isdir(date_path):
             continue
         for cam_folder in os.listdir(date_path):
             cam_path = os.path.join(date_path, cam_folder)
             if os.path.isdir(cam_path):
                 cam_names.add(cam_folder)
 
-    return sorted(cam_names)
+    return cam_names
 
-def find_recording_file_for_time_range(cam_name: str, date_str: str, start_time, end_time, recordings_root=None):
+def find_latest_recording(cam_name: str, recordings_root=None):
+    """Return the newest MP4 in today's folder for a camera (the live file), or None."""
+    if recordings_root is None:
+        recordings_root = os.path.join(get_data_dir(), "recordings")
+    today = datetime.date.today().strftime("%Y_%m_%d")
+    folder_path = os.path.join(recordings_root, today, sanitize_filename(cam_name))
+    if not os.path.isdir(folder_path):
+        return None
+    videos = [
+        os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith(".mp4")
+    ]
+    return max(videos, key=os.path.getmtime) if videos else None
+
+def find_recording_segments_for_time_range(cam_name: str, date_str: str, start_time, end_time, recordings_root=None):
     """
-    Find the video file for a camera and date that contains the desired time range.
-    Returns: (video_path, metadata_path, recording_start_datetime) or (None, None, None)
+    Find the recording segments for a camera and date that overlap the desired time range.
+    Returns a list of (video_path, segment_start, segment_end) sorted by start time.
+    A segment still being written (no duration yet) is taken to end at its last write.
     """
     if recordings_root is None:
         recordings_root = os.path.join(get_data_dir(), "recordings")
     folder_path = os.path.join(recordings_root, date_str, cam_name)
-    log.info(f"[Debug] Looking for video in: {folder_path}")
+    log.info(f"[Debug] Looking for segments in: {folder_path}")
 
     if not os.path.exists(folder_path):
         log.info(f"[Debug] Folder does not exist: {folder_path}")
-        return None, None, None
+        return []
 
-    # onvert QTime to datetime.time if needed
+    # Convert QTime to datetime.time if needed
     if isinstance(start_time, QTime):
         start_time = datetime.time(start_time.hour(), start_time.minute(), start_time.second())
     if isinstance(end_time, QTime):
         end_time = datetime.time(end_time.hour(), end_time.minute(), end_time.second())
 
-    log.info(f"[Debug] Looking for time range: {start_time} to {end_time}")
+    day = datetime.datetime.strptime(date_str, "%Y_%m_%d").date()
+    user_start = datetime.datetime.combine(day, start_time)
+    user_end = datetime.datetime.combine(day, end_time)
+    log.info(f"[Debug] User range: {user_start} to {user_end}")
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".mp4"):
-            log.info(f"[Debug] Checking video file: {filename}")
-            video_path = os.path.join(folder_path, filename)
-            metadata_path = video_path.replace(".mp4", "_metadata.json")
+    catalog = get_ready_catalog(recordings_root)
+    if catalog:
+        segments = catalog.segments_in_range(cam_name, user_start, user_end)
+        log.info(f"[Debug] {len(segments)} segment(s) overlap the requested range (catalog)")
+        return segments
 
-            if not os.path.exists(metadata_path):
-                log.info(f"[Debug] Metadata not found: {metadata_path}")
-                continue
-
-            try:
-                with open(metadata_path, "r") as f:
-                    metadata = json.load(f)
-
-                recording_start = datetime.datetime.fromisoformat(metadata["start_time"])
-                duration = metadata.get("duration_seconds", 0)
+    segments = []
+    for video_path, metadata in segments_for_camera(os.path.join(recordings_root, date_str), cam_name):
+        if not os.path.exists(video_path):
+            continue
+        try:
+            recording_start = datetime.datetime.fromisoformat(metadata["start_time"])
+            duration = metadata.get("duration_seconds")
+            if duration is not None:
                 recording_end = recording_start + datetime.timedelta(seconds=duration)
+            else:
+                recording_end = datetime.datetime.fromtimestamp(os.path.getmtime(video_path))
 
-                user_start = datetime.datetime.combine(recording_start.date(), start_time)
-                user_end = datetime.datetime.combine(recording_start.date(), end_time)
-
-                log.info(f"[Debug] Recording: {recording_start} to {recording_end}")
-                log.info(f"[Debug] User range: {user_start} to {user_end}")
-                
-                # Check for overlap instead of containment
-                # Overlap exists if: user_start < recording_end AND user_end > recording_start
-                overlaps = user_start < recording_end and user_end > recording_start
-                log.info(f"[Debug] Check overlap: user_start < recording_end? {user_start < recording_end}")
-                log.info(f"[Debug] Check overlap: user_end > recording_start? {user_end > recording_start}")
-                log.info(f"[Debug] Overlaps? {overlaps}")
-
-                if overlaps:
-                    log.info(f"[Debug] MATCH FOUND: {video_path}")
-                    return video_path, metadata_path, recording_start
-                else:
-                    log.info(f"[Debug] No overlap for {filename}")
-
-            except Exception as e:
-                log.warning(f"[Playback] Failed to read metadata: {metadata_path} — {e}")
-                continue
-
-    log.info(f"[Debug] No matching video found in {folder_path}")
-    return None, None, None
+            # Overlap exists if: user_start < recording_end AND user_end > recording_start
+            if user_start < recording_end and user_end > recording_start:
+                segments.append((video_path, recording_start, recording_end))
+        except Exception as e:
+            log.warning(f"[Playback] Failed to read metadata for {video_path} — {e}")
+
+    segments.sort(key=lambda seg: seg[1])
+    log.info(f"[Debug] {len(segments)} segment(s) overlap the requested range")
+    return segments
+
+def segment_anchors(video_path):
+    """[(seconds into the file, wall-clock datetime)] the recorder journaled for a segment."""
+    root = split_segment_path(video_path)[0]
+    catalog = get_ready_catalog(root)
+    if catalog:
+        raw = catalog.anchors_for(video_path)
+    else:
+        segments, _ = read_day(day_path_of(video_path))
+        raw = segments.get(os.path.abspath(video_path), {}).get("anchors") or []
+    anchors = []
+    for media_time, wall in raw:
+        try:
+            anchors.append((float(media_time), datetime.datetime.fromisoformat(wall)))
+        except (TypeError, ValueError):
+            continue
+    return anchors
+
+def segment_integrity(video_path):
+    """The integrity scrubber's verdict on a segment (see utils.integrity_scrubber), or None if unchecked."""
+    root = split_segment_path(video_path)[0]
+    catalog = get_ready_catalog(root)
+    if catalog:
+        return catalog.integrity_for(video_path)
+    segments, _ = read_day(day_path_of(video_path))
+    return segments.get(os.path.abspath(video_path), {}).get("integrity")
+
+def media_offset(segment_start, wall_time, anchors=None):
+    """Seconds into a segment at which wall_time was recorded.
+
+    Interpolates between the segment's wall-clock anchors; outside them (or
+    without any) media time is taken to run at wall-clock speed from the
+    nearest anchor, or from the segment's start time.
+    """
+    if not anchors:
+        return max(0.0, (wall_time - segment_start).total_seconds())
+    if wall_time <= anchors[0][1]:
+        media_time = anchors[0][0] - (anchors[0][1] - wall_time).total_seconds()
+    elif wall_time >= anchors[-1][1]:
+        media_time = anchors[-1][0] + (wall_time - anchors[-1][1]).total_seconds()
+    else:
+        for (m0, w0), (m1, w1) in zip(anchors, anchors[1:]):
+            if w0 <= wall_time <= w1:
+                span = (w1 - w0).total_seconds()
+                media_time = m0 + (m1 - m0) * ((wall_time - w0).total_seconds() / span if span else 0.0)
+                break
+        else:   # wall clock stepped back during the segment
+            media_time = (wall_time - segment_start).total_seconds()
+    return max(0.0, media_time)
 
 def get_available_metadata_for_camera(cam_name, date_str, recordings_root=None):
     if recordings_root is None:
@@ -140,75 +207,59 @@ def get_available_metadata_for_camera(cam_name, date_str, recordings_root=None):
     found = False
     log.info(f"[Metadata Debug] --- Listing all available metadata for {cam_name} on {date_str} ---")
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith("_metadata.json"):
-            found = True
-            meta_path = os.path.join(folder_path, filename)
-            try:
-                with open(meta_path, "r") as f:
-                    meta = json.load(f)
-                start_time = meta.get("start_time", "unknown")
-                duration = meta.get("duration_seconds", "unknown")
-                log.info(f"[Metadata Debug] {filename}: start_time={start_time}, duration={duration}s")
-            except Exception as e:
-                log.warning(f"[Metadata Debug] Failed to read {filename} — {e}")
+    for video_path, meta in segments_for_camera(os.path.join(recordings_root, date_str), cam_name):
+        found = True
+        start_time = meta.get("start_time", "unknown")
+        duration = meta.get("duration_seconds", "unknown")
+        log.info(f"[Metadata Debug] {os.path.basename(video_path)}: start_time={start_time}, duration={duration}s")
 
     if not found:
-        log.info("[Metadata Debug] No metadata files found in folder.")
+        log.info("[Metadata Debug] No recordings journaled for this camera.")
     log.info(f"[Metadata Debug] --- End of metadata listing ---")
 
 
-def _get_mp4_duration_seconds(video_path):
-    """Use ffprobe to get the duration of an MP4 file in seconds.
+def _close_orphan(video_path, meta):
+    """Journal the stop of a segment that was never closed. Returns True if it was."""
+    filename = os.path.basename(video_path)
+    try:
+        duration = get_media_probe().duration(video_path)
 
-    Tries stream-level duration first (works for fragmented MP4 with empty_moov),
-    then falls back to format-level duration.
-    Returns None if both fail or return 0.
-    """
-    for extra_args in (
-        # First attempt: stream-level — reliable for fragmented MP4
-        ["-show_streams", "-select_streams", "v:0"],
-        # Second attempt: format-level — reliable for normal MP4
-        ["-show_format"],
-    ):
-        try:
-            cmd = [
-                get_ffprobe_path(), "-v", "quiet",
-                "-print_format", "json",
-            ] + extra_args + [video_path]
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                stdin=subprocess.DEVNULL,
-                **win_no_window_kwargs()
-            )
-            if result.returncode != 0:
-                continue
-            info = json.loads(result.stdout)
-            # Stream-level result
-            streams = info.get("streams", [])
-            if streams:
-                d = float(streams[0].get("duration") or 0)
-                if d > 0:
-                    return d
-            # Format-level result
-            fmt = info.get("format", {})
-            if fmt:
-                d = float(fmt.get("duration") or 0)
-                if d > 0:
-                    return d
-        except Exception as e:
-            log.warning(f"[Metadata Cleanup] ffprobe attempt failed for {video_path}: {e}")
-    return None
+        # Fallback for fragmented MP4 where ffprobe returns 0/None:
+        # estimate from the file's last-modified time vs recorded start time.
+        if not duration or duration <= 0:
+            try:
+                mtime = os.path.getmtime(video_path)
+                mtime_dt = datetime.datetime.fromtimestamp(mtime)
+                start_dt = datetime.datetime.fromisoformat(meta["start_time"])
+                duration = (mtime_dt - start_dt).total_seconds()
+                if duration > 0:
+                    log.info(f"[Metadata Cleanup] Using mtime fallback for {filename}: {duration:.1f}s")
+            except Exception:
+                pass
+
+        if not duration or duration <= 0:
+            # Nothing playable (e.g. an empty file): close it as empty, or it
+            # would stay in the open register and be retried at every startup
+            duration = 0.0
+            log.warning(f"[Metadata Cleanup] No duration for {video_path}; closed as empty")
+
+        start_time = datetime.datetime.fromisoformat(meta["start_time"])
+        end_time = start_time + datetime.timedelta(seconds=duration)
+        extra = {"trigger": meta["trigger"]} if meta.get("trigger") else None
+        save_metadata(video_path, start_time, duration, end_time, extra=extra)
+        if duration:
+            log.info(f"[Metadata Cleanup] Fixed: {video_path} → duration={duration:.2f}s")
+        return True
+    except Exception as e:
+        log.warning(f"[Metadata Cleanup] Error processing {video_path}: {e}")
+        return False
 
 
 def fix_orphaned_metadata(recordings_root=None):
     """
-    Scan all metadata files and fix ones missing duration_seconds.
-    This happens when the app crashes or is closed without stopping recordings.
-    Calculates duration from the MP4 file using ffprobe.
+    Close journaled segments that have a start but no stop, anywhere under the root.
+    This walks the whole tree; startup uses the open-segment registers instead
+    (collect_open_segments / recover_open_segments_async).
     """
     if recordings_root is None:
         recordings_root = os.path.join(get_data_dir(), "recordings")
@@ -218,58 +269,96 @@ def fix_orphaned_metadata(recordings_root=None):
     fixed = 0
     for date_folder in os.listdir(recordings_root):
         date_path = os.path.join(recordings_root, date_folder)
-        if not os.path.isdir(date_path):
+        if date_folder == LOW_TIER_DIR or not os.path.isdir(date_path):
             continue
-        for cam_folder in os.listdir(date_path):
-            cam_path = os.path.join(date_path, cam_folder)
-            if not os.path.isdir(cam_path):
-                continue
-            for filename in os.listdir(cam_path):
-                if not filename.endswith("_metadata.json"):
-                    continue
-                meta_path = os.path.join(cam_path, filename)
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        meta = json.load(f)
-                    if meta.get("duration_seconds") is not None:
-                        continue  # already has duration, skip
-
-                    # Find the corresponding MP4
-                    video_file = filename.replace("_metadata.json", ".mp4")
-                    video_path = os.path.join(cam_path, video_file)
-                    if not os.path.exists(video_path):
-                        continue
-
-                    duration = _get_mp4_duration_seconds(video_path)
-
-                    # Fallback for fragmented MP4 where ffprobe returns 0/None:
-                    # estimate from the file's last-modified time vs recorded start time.
-                    if not duration or duration <= 0:
-                        try:
-                            mtime = os.path.getmtime(video_path)
-                            mtime_dt = datetime.datetime.fromtimestamp(mtime)
-                            start_dt = datetime.datetime.fromisoformat(meta["start_time"])
-                            duration = (mtime_dt - start_dt).total_seconds()
-                            if duration > 0:
-                                log.info(f"[Metadata Cleanup] Using mtime fallback for {filename}: {duration:.1f}s")
-                        except Exception:
-                            pass
-
-                    if not duration or duration <= 0:
-                        continue
-
-                    start_time = datetime.datetime.fromisoformat(meta["start_time"])
-                    end_time = start_time + datetime.timedelta(seconds=duration)
-                    meta["duration_seconds"] = round(duration, 2)
-                    meta["end_time"] = end_time.isoformat()
-
-                    with open(meta_path, "w", encoding="utf-8") as f:
-                        json.dump(meta, f, indent=2)
-                    fixed += 1
-                    log.info(f"[Metadata Cleanup] Fixed: {meta_path} → duration={duration:.2f}s")
-
-                except Exception as e:
-                    log.warning(f"[Metadata Cleanup] Error processing {meta_path}: {e}")
+        segments, _ = read_day(date_path)
+        for video_path, meta in segments.items():
+            if meta.get("duration_seconds") is not None or "start_time" not in meta:
+                continue  # already closed
+            if os.path.exists(video_path) and _close_orphan(video_path, meta):
+                fixed += 1
 
     if fixed > 0:
-        log.info(f"[Metadata Cleanup] Fixed {fixed} orphaned metadata file(s).")
+        get_journal().flush()
+        log.info(f"[Metadata Cleanup] Fixed {fixed} orphaned segment(s).")
+
+    low_root = get_low_tier_root(recordings_root)
+    if os.path.isdir(low_root):
+        fix_orphaned_metadata(low_root)
+
+
+# Registers each process tag takes over at startup (see collect_open_segments)
+ADOPTED_REGISTERS = {
+    None: None,                   # the GUI without a service: everything
+    "service": ("", "window"),    # what a GUI run without the service left behind
+    "gui": ("gui-",),             # the windows of a GUI run with the service
+}
+
+def collect_open_segments(recordings_roots):
+    """Segments left open by the previous run, from each root's open-segment register.
+
+    Must run before recording starts (new segments join the registers).
+    The GUI (or, with a recording service, the service) first adopts the
+    registers of processes that are gone (ADOPTED_REGISTERS); a recorder
+    node only reads its own.
+    Roots without any register (older versions) fall back to their most
+    recent RECOVERY_FALLBACK_DAYS day folders, so the cost never depends
+    on the size of the archive.
+    """
+    found = []
+    for recordings_root in recordings_roots:
+        for root in (recordings_root, get_low_tier_root(recordings_root)):
+            if not os.path.isdir(root):
+                continue
+            journal = get_journal()
+            legacy = open_segments(root) is None
+            if journal.register_tag in ADOPTED_REGISTERS:
+                journal.adopt_registers(root, ADOPTED_REGISTERS[journal.register_tag])
+            paths = journal.registered_open(root)
+            if paths is None and legacy and journal.register_tag in (None, "service"):
+                days = sorted(d for d in os.listdir(root) if len(d) == 10 and d.count("_") == 2)
+                paths = [
+                    video_path
+                    for day in days[-RECOVERY_FALLBACK_DAYS:]
+                    for video_path, meta in read_day(os.path.join(root, day))[0].items()
+                    if meta.get("duration_seconds") is None
+                ]
+            found.extend(paths or [])
+    if found:
+        log.info(f"[Metadata Cleanup] {len(found)} segment(s) left open by the previous run")
+    return found
+
+
+def recover_open_segments(video_paths):
+    """Close the given orphaned segments, probing their durations in parallel."""
+    journal = get_journal()
+    days = {}
+    for video_path in video_paths:
+        days.setdefault(os.path.dirname(os.path.dirname(video_path)), []).append(video_path)
+
+    orphans = []
+    for day_path, paths in days.items():
+        segments, _ = read_day(day_path)
+        for video_path in paths:
+            meta = segments.get(video_path)
+            if (meta and "start_time" in meta and meta.get("duration_seconds") is None
+                    and os.path.exists(video_path)):
+                orphans.append((video_path, meta))
+            else:
+                journal.forget(video_path)   # already closed, or nothing left to close
+
+    get_media_probe().probe_many([video_path for video_path, _ in orphans])   # warm the cache in parallel
+    fixed = sum(_close_orphan(*orphan) for orphan in orphans)
+    journal.flush()
+    if orphans:
+        log.info(f"[Metadata Cleanup] Recovered {fixed} of {len(orphans)} open segment(s).")
+
+
+def recover_open_segments_async(video_paths):
+    """Run recover_open_segments() on a background thread."""
+    if not video_paths:
+        return None
+    thread = threading.Thread(target=recover_open_segments, args=(list(video_paths),),
+                              daemon=True, name="CrashRecovery")
+    thread.start()
+    return thread
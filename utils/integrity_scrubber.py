@@ -0,0 +1,381 @@
+# utils/integrity_scrubber.py
+"""
+Background integrity check of finished recordings.
+
+A segment cut short by a crash or power loss, or written while the disk
+was failing, often only shows up when someone needs it and VLC refuses to
+play it. The scrubber verifies every closed segment once, newest first,
+well after it was written:
+
+  * container readability — ffprobe reads the whole file packet by packet
+    and reports demuxer errors;
+  * keyframe cadence — corrupt packets make footage undecodable up to the
+    next keyframe, and jumps in the timestamps are missing footage;
+  * duration against the journaled one — a file much shorter than its
+    metadata lost its tail.
+
+The verdict is journaled with the segment and mirrored into the catalog:
+
+    {"status": "ok" | "damaged" | "unreadable", "checked": "...", "duration": 598.4,
+     "bad_ranges": [[312.0, 316.0], [590.1, null]], "issues": ["..."]}
+
+bad_ranges are seconds into the file (null: to the end). Playback cuts
+them out of clips, and leaves unreadable files out altogether. With
+`repair` on, a damaged file is remuxed (ffmpeg -c copy), which drops a
+torn last fragment and corrupt packets, and then checked again.
+
+It must never compete with the recorders for the disk. The scrubber
+reads each file itself and pipes it to ffprobe no faster than
+`max_read_mbps`, which also paces a repair's writes. Its ffprobe/ffmpeg
+run at the lowest CPU priority. It leaves alone files that are open or
+were closed less than SETTLE_S ago, and pages past them; a file that is
+gone is marked "missing" in the catalog so it is not looked at again.
+A file whose index (moov) comes after the media, as in recordings from
+before fragmented segments, cannot be read from a pipe: only its index
+is checked, which costs almost no I/O.
+"""
+
+import os
+import time
+import threading
+import datetime
+import statistics
+import subprocess
+from utils.logging import log
+from utils.paths import get_ffprobe_path, get_ffmpeg_path
+from utils.subproc import win_no_window_kwargs, kill_process_tree
+from utils.recording_catalog import get_catalog
+from utils.recording_journal import get_journal, open_segments
+from utils.helper import get_low_tier_root
+from utils.fmp4 import iter_boxes
+
+SETTLE_S = 15 * 60          # leave a segment alone this long after it was closed
+IDLE_WAIT_S = 10 * 60       # nothing left to check → look again after this long
+BATCH = 50                  # segments fetched from the catalog per pass
+READ_CHUNK = 256 * 1024
+PTS_JUMP_S = 2.0            # consecutive packets further apart than this: footage missing
+KEYFRAME_GAP_FACTOR = 4     # a keyframe interval this many times the usual one is reported
+TRUNCATED_TOLERANCE_S = 5.0
+TRUNCATED_TOLERANCE = 0.05  # of the journaled duration
+MAX_ISSUES = 5
+
+OK, DAMAGED, UNREADABLE, MISSING = "ok", "damaged", "unreadable", "missing"
+
+
+def analyze(packets, errors, expected_duration=None):
+    """Verdict on one file from its video packets [(pts seconds, flags)] and demuxer errors."""
+    issues = [line for line in errors if line][:MAX_ISSUES]
+    if not packets:
+        return {"status": UNREADABLE, "duration": None, "bad_ranges": [[0.0, None]],
+                "issues": issues or ["no readable video packets"]}
+
+    packets = sorted(packets)
+    keyframes = [pts for pts, flags in packets if "K" in flags]
+    bad = []
+
+    # Corrupt packets: nothing decodes cleanly until the next keyframe
+    for pts, flags in packets:
+        if "C" in flags:
+            before = [k for k in keyframes if k <= pts]
+            after = [k for k in keyframes if k > pts]
+            bad.append([before[-1] if before else 0.0, after[0] if after else None])
+    if any("C" in flags for _, flags in packets):
+        issues.append(f"{sum(1 for _, flags in packets if 'C' in flags)} corrupt packet(s)")
+
+    # Timestamp jumps: the stream has a hole
+    for (a, _), (b, _) in zip(packets, packets[1:]):
+        if b - a > PTS_JUMP_S:
+            bad.append([a, b])
+            issues.append(f"{b - a:.1f}s of footage missing at {a:.1f}s")
+
+    if not keyframes:
+        issues.append("no keyframes")
+        bad.append([0.0, None])
+    else:
+        intervals = [b - a for a, b in zip(keyframes, keyframes[1:]) if b > a]
+        if intervals:
+            usual = statistics.median(intervals)
+            longest = max(intervals)
+            if longest > max(KEYFRAME_GAP_FACTOR * usual, PTS_JUMP_S):
+                issues.append(f"keyframe gap of {longest:.1f}s (usually {usual:.1f}s)")
+        if keyframes[0] > packets[0][0]:
+            bad.append([packets[0][0], keyframes[0]])   # starts mid-GOP: undecodable until the first keyframe
+
+    duration = packets[-1][0] - packets[0][0]
+    if expected_duration and duration < expected_duration - max(TRUNCATED_TOLERANCE_S,
+                                                                TRUNCATED_TOLERANCE * expected_duration):
+        issues.append(f"only {duration:.0f}s of {expected_duration:.0f}s readable")
+        bad.append([round(packets[-1][0], 3), None])
+
+    return {
+        "status": DAMAGED if bad or errors else OK,
+        "duration": round(duration, 3),
+        "bad_ranges": _merge_ranges(bad),
+        "issues": issues[:MAX_ISSUES],
+    }
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges, key=lambda r: r[0]):
+        start = round(start, 3)
+        end = None if end is None else round(end, 3)
+        if merged and (merged[-1][1] is None or start <= merged[-1][1]):
+            if merged[-1][1] is not None:
+                merged[-1][1] = None if end is None else max(merged[-1][1], end)
+            continue
+        merged.append([start, end])
+    return merged
+
+
+def _parse_packets(text):
+    """[(pts seconds, flags)] from ffprobe's compact packet output."""
+    packets = []
+    for line in text.splitlines():
+        fields = dict(part.split("=", 1) for part in line.split("|") if "=" in part)
+        try:
+            packets.append((float(fields["pts_time"]), fields.get("flags", "")))
+        except (KeyError, ValueError):
+            continue
+    return packets
+
+
+def _streamable(video_path):
+    """True if the file's index comes before its media, so it can be read from a pipe."""
+    try:
+        with open(video_path, "rb") as f:
+            for box_type, _, _, _ in iter_boxes(f, 0, os.path.getsize(video_path)):
+                if box_type == b"moov":
+                    return True
+                if box_type in (b"mdat", b"moof"):
+                    return False
+    except OSError:
+        pass
+    return False
+
+
+def _lower_priority(process):
+    """Idle CPU priority for a helper process (Windows sets it at creation)."""
+    if os.name != "nt":
+        try:
+            os.setpriority(os.PRIO_PROCESS, process.pid, 19)
+        except (AttributeError, OSError):
+            pass
+
+
+def _idle_kwargs():
+    kwargs = win_no_window_kwargs()
+    if os.name == "nt":
+        kwargs["creationflags"] = kwargs.get("creationflags", 0) | subprocess.IDLE_PRIORITY_CLASS
+    return kwargs
+
+
+class IntegrityScrubber:
+    """Verifies the finished segments of one recordings root (both tiers), rate-limited."""
+
+    def __init__(self, recording_folder, max_read_mbps=2.0, repair=False):
+        self.recording_folder = recording_folder
+        self.max_read_bytes = max(0.1, max_read_mbps) * 1024 * 1024
+        self.repair = repair
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._process = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="IntegrityScrubber")
+        self._thread.start()
+        log.info(
+            f"[Scrub] Integrity checks started for {self.recording_folder} — "
+            f"max {self.max_read_bytes / (1024 * 1024):.1f} MB/s{', repairing' if self.repair else ''}"
+        )
+
+    def stop(self):
+        self._stop_event.set()
+        process = self._process
+        if process and process.poll() is None:
+            kill_process_tree(process.pid)
+
+    # ------------------------------------------------------------------ #
+    #  Internal                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _run(self):
+        self._stop_event.wait(timeout=60)   # let startup (recovery, backfill) finish first
+        while not self._stop_event.is_set():
+            checked = 0
+            try:
+                for root in (self.recording_folder, get_low_tier_root(self.recording_folder)):
+                    checked += self._scrub_root(root)
+            except Exception as e:
+                log.error(f"[Scrub] Unexpected error: {e}")
+            if not checked:
+                self._stop_event.wait(timeout=IDLE_WAIT_S)
+
+    def _scrub_root(self, root):
+        """Check one batch of a root's unverified segments; returns how many were checked."""
+        catalog = get_catalog(root)
+        if not catalog or not catalog.is_ready():
+            return 0
+        live = set(open_segments(root) or [])
+        finished_before = datetime.datetime.now() - datetime.timedelta(seconds=SETTLE_S)
+        checked = skipped = 0
+        while checked < BATCH and not self._stop_event.is_set():
+            # checked rows leave the query; only the skipped ones need paging past
+            rows = catalog.unverified(finished_before, BATCH, offset=skipped)
+            if not rows:
+                break
+            for row in rows:
+                if self._stop_event.is_set():
+                    break
+                path = row["path"]
+                if path in live:
+                    skipped += 1
+                    continue
+                if not os.path.exists(path):
+                    catalog.record_integrity(path, {
+                        "status": MISSING, "checked": datetime.datetime.now().isoformat(timespec="seconds"),
+                    })
+                    checked += 1
+                    continue
+                result = self.verify(path, row["duration"])
+                if result is None:
+                    return checked   # stopped or ffprobe missing; try again next pass
+                if result["status"] != OK and self.repair and result["duration"]:
+                    result = self._repair(path, row["duration"], result)
+                self._record(catalog, path, result)
+                checked += 1
+        return checked
+
+    def verify(self, video_path, expected_duration=None):
+        """Integrity verdict for one file, or None if the check could not run."""
+        if not _streamable(video_path):
+            return self._verify_index(video_path, expected_duration)
+        cmd = [
+            get_ffprobe_path(), "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "compact=p=0",
+            "-i", "pipe:0",
+        ]
+        output = self._run_throttled(cmd, video_path)
+        if output is None:
+            return None
+        stdout, stderr = output
+        errors = [line.strip() for line in stderr.splitlines() if line.strip()]
+        result = analyze(_parse_packets(stdout), errors, expected_duration)
+        result["checked"] = datetime.datetime.now().isoformat(timespec="seconds")
+        return result
+
+    def _verify_index(self, video_path, expected_duration):
+        """Container-only check of a file with its index at the end (ffprobe seeks straight to it)."""
+        try:
+            probe = subprocess.run(
+                [get_ffprobe_path(), "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=nw=1:nk=1", video_path],
+                capture_output=True, text=True, timeout=60, **_idle_kwargs()
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log.warning(f"[Scrub] Could not probe {video_path}: {e}")
+            return None
+        errors = [line.strip() for line in probe.stderr.splitlines() if line.strip()]
+        try:
+            duration = float(probe.stdout.strip())
+        except ValueError:
+            result = analyze([], errors, expected_duration)
+        else:
+            short = expected_duration and duration < expected_duration - max(
+                TRUNCATED_TOLERANCE_S, TRUNCATED_TOLERANCE * expected_duration)
+            result = {
+                "status": DAMAGED if short or errors else OK,
+                "duration": round(duration, 3),
+                "bad_ranges": [[round(duration, 3), None]] if short else [],
+                "issues": (errors[:MAX_ISSUES - 1] + (["index shorter than the recording"] if short else []))
+                          or ["index checked only"],
+            }
+        result["checked"] = datetime.datetime.now().isoformat(timespec="seconds")
+        return result
+
+    def _repair(self, video_path, expected_duration, result):
+        """Remux a damaged file, keep the copy if it verifies better, and return the new verdict."""
+        # Not *.mp4, so the recording lookups never pick up a half-written copy
+        tmp_path = video_path + ".repair"
+        cmd = [
+            get_ffmpeg_path(), "-v", "error", "-y", "-err_detect", "ignore_err",
+            "-fflags", "+discardcorrupt+genpts", "-i", "pipe:0",
+            "-map", "0:v:0", "-c", "copy",
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-f", "mp4", tmp_path,
+        ]
+        try:
+            if self._run_throttled(cmd, video_path) is None or not os.path.exists(tmp_path):
+                return result
+            repaired = self.verify(tmp_path, expected_duration)
+            if repaired and repaired["status"] != UNREADABLE and (
+                    result["status"] == UNREADABLE or len(repaired["bad_ranges"]) < len(result["bad_ranges"])
+                    or not repaired["issues"]):
+                try:
+                    os.replace(tmp_path, video_path)
+                    repaired["repaired"] = True
+                    log.info(f"[Scrub] Repaired {video_path}: {result['status']} → {repaired['status']}")
+                    return repaired
+                except OSError as e:
+                    log.warning(f"[Scrub] Could not replace {video_path} with its repaired copy: {e}")
+            return result
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _record(self, catalog, video_path, result):
+        if result["status"] != OK:
+            log.warning(f"[Scrub] {video_path}: {result['status']} — {'; '.join(result['issues'])}")
+        get_journal().integrity(video_path, result)
+        catalog.record_integrity(video_path, result)
+
+    def _run_throttled(self, cmd, video_path):
+        """Run cmd with the file on stdin at no more than max_read_bytes/s; (stdout, stderr) or None."""
+        try:
+            process = self._process = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                **_idle_kwargs()
+            )
+        except OSError as e:
+            log.warning(f"[Scrub] Cannot run {os.path.basename(cmd[0])}: {e} — integrity checks paused")
+            self._stop_event.wait(timeout=IDLE_WAIT_S)
+            return None
+        _lower_priority(process)
+        output = {}
+        readers = [
+            threading.Thread(target=lambda: output.__setitem__("stdout", process.stdout.read()), daemon=True),
+            threading.Thread(target=lambda: output.__setitem__("stderr", process.stderr.read()), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        try:
+            started = time.monotonic()
+            sent = 0
+            with open(video_path, "rb") as f:
+                while not self._stop_event.is_set():
+                    chunk = f.read(READ_CHUNK)
+                    if not chunk:
+                        break
+                    process.stdin.write(chunk)
+                    sent += len(chunk)
+                    ahead = sent / self.max_read_bytes - (time.monotonic() - started)
+                    if ahead > 0:
+                        self._stop_event.wait(timeout=ahead)
+        except (OSError, ValueError):
+            pass   # file vanished (retention) or the tool quit early
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        if self._stop_event.is_set():
+            kill_process_tree(process.pid)
+            return None
+        process.wait()
+        for reader in readers:
+            reader.join()
+        self._process = None
+        return (output.get("stdout") or b"").decode("utf-8", "replace"), \
+            (output.get("stderr") or b"").decode("utf-8", "replace")
@@ -0,0 +1,188 @@
+# utils/ipc.py
+"""
+Local IPC between the coordinator (AppController) and helper processes.
+
+Messages are plain dicts pickled over multiprocessing.connection on the
+loopback interface. Every connection is authenticated with a random
+per-session authkey, which is handed to children through the environment
+(never on the command line).
+
+    Coordinator                          Child process
+    -----------                          -------------
+    server = IpcServer(authkey)          client = IpcClient(address, authkey, "window-1")
+    server.messageReceived  <──────────  client.send({"type": "status", ...})
+    server.send("window-1", {...}) ───►  client.messageReceived
+"""
+
+import os
+import secrets
+import threading
+from multiprocessing.connection import Listener, Client
+from PyQt5.QtCore import QObject, pyqtSignal
+from utils.logging import log
+
+IPC_HOST = "127.0.0.1"
+AUTHKEY_ENV = "CAMERA_IPC_AUTHKEY"
+
+
+def new_authkey() -> bytes:
+    return secrets.token_bytes(16)
+
+
+def authkey_from_env() -> bytes:
+    """Read the session authkey passed down by the coordinator."""
+    return bytes.fromhex(os.environ.get(AUTHKEY_ENV, ""))
+
+
+def format_address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+def parse_address(text: str):
+    host, _, port = text.rpartition(":")
+    return (host or IPC_HOST, int(port))
+
+
+class _Peer:
+    """One authenticated connection with a send lock (sends may come from any thread)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, msg) -> bool:
+        try:
+            with self.lock:
+                self.conn.send(msg)
+            return True
+        except (OSError, EOFError, ValueError):
+            return False
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+class IpcServer(QObject):
+    """Accepts child connections and relays their messages onto the Qt event loop.
+
+    Each child introduces itself with {"type": "hello", "peer": <peer_id>}.
+    Messages arrive on the GUI thread through the queued `messageReceived`
+    signal, so handlers may touch widgets and controller state directly.
+    """
+
+    messageReceived = pyqtSignal(str, dict)  # (peer_id, message)
+    peerConnected = pyqtSignal(str)
+    peerDisconnected = pyqtSignal(str)
+
+    def __init__(self, authkey: bytes, address=(IPC_HOST, 0), parent=None):
+        super().__init__(parent)
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._peers = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._accept_loop, daemon=True, name="IpcAccept").start()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if not self._closed:
+                    log.warning(f"[IPC] Rejected connection: {e}")
+                continue
+            threading.Thread(target=self._reader, args=(conn,), daemon=True, name="IpcPeer").start()
+
+    def _reader(self, conn):
+        peer_id = None
+        try:
+            hello = conn.recv()
+            if not isinstance(hello, dict) or hello.get("type") != "hello":
+                conn.close()
+                return
+            peer_id = str(hello.get("peer"))
+            with self._lock:
+                old = self._peers.pop(peer_id, None)
+                self._peers[peer_id] = _Peer(conn)
+            if old:
+                old.close()
+            self.peerConnected.emit(peer_id)
+            while True:
+                msg = conn.recv()
+                if isinstance(msg, dict):
+                    self.messageReceived.emit(peer_id, msg)
+        except (EOFError, OSError):
+            pass
+        finally:
+            if peer_id is not None:
+                with self._lock:
+                    peer = self._peers.get(peer_id)
+                    if peer and peer.conn is conn:
+                        del self._peers[peer_id]
+                        self.peerDisconnected.emit(peer_id)
+
+    def peers(self):
+        with self._lock:
+            return list(self._peers)
+
+    def send(self, peer_id: str, msg: dict) -> bool:
+        with self._lock:
+            peer = self._peers.get(peer_id)
+        return peer.send(msg) if peer else False
+
+    def broadcast(self, msg: dict):
+        with self._lock:
+            peers = list(self._peers.values())
+        for peer in peers:
+            peer.send(msg)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            peers = list(self._peers.values())
+            self._peers.clear()
+        for peer in peers:
+            peer.close()
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+
+
+class IpcClient(QObject):
+    """Child-side connection to the coordinator.
+
+    `disconnected` fires once when the coordinator goes away, which children
+    treat as a request to exit (they must never outlive their coordinator
+    unless they are designed to, like the recording service).
+    """
+
+    messageReceived = pyqtSignal(dict)
+    disconnected = pyqtSignal()
+
+    def __init__(self, address, authkey: bytes, peer_id: str, parent=None):
+        super().__init__(parent)
+        self.peer_id = peer_id
+        self._peer = _Peer(Client(address, authkey=authkey))
+        self._peer.send({"type": "hello", "peer": peer_id, "pid": os.getpid()})
+        threading.Thread(target=self._reader, daemon=True, name="IpcClient").start()
+
+    def _reader(self):
+        try:
+            while True:
+                msg = self._peer.conn.recv()
+                if isinstance(msg, dict):
+                    self.messageReceived.emit(msg)
+        except (EOFError, OSError):
+            pass
+        self.disconnected.emit()
+
+    def send(self, msg: dict) -> bool:
+        return self._peer.send(msg)
+
+    def close(self):
+        self._peer.close()
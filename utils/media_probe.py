@@ -0,0 +1,201 @@
+# utils/media_probe.py
+"""
+Cached ffprobe results for recording files.
+
+One ffprobe run per file reads the video stream's codec, resolution and
+duration (stream level first — the one fragmented MP4 gets right — then
+format level) plus the packet flags of the first KEYFRAME_SCAN_S seconds
+for the keyframe interval. Results are cached in SQLite keyed by
+path + size + mtime, so a finished segment is probed once for good and a
+file that is still growing is re-probed only after it changed.
+
+Probes run in a small process pool (MediaProbe.probe_many), shared by
+crash recovery, playback and the catalog backfill.
+"""
+
+import os
+import json
+import sqlite3
+import statistics
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils.logging import log
+from utils.subproc import win_no_window_kwargs
+from utils.paths import get_ffprobe_path, get_data_dir
+
+PROBE_CACHE_FILE = "media_probe_cache.db"
+PROBE_WORKERS = 3
+PROBE_TIMEOUT_S = 60
+KEYFRAME_SCAN_S = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path    TEXT PRIMARY KEY,
+    size    INTEGER NOT NULL,
+    mtime   REAL NOT NULL,
+    info    TEXT NOT NULL
+);
+"""
+
+
+def run_ffprobe(video_path):
+    """Probe one file (runs in a pool worker). Returns an info dict or None.
+
+    Keys: duration (seconds or None), codec, width, height and
+    keyframe_interval (seconds between keyframes, or None).
+    """
+    cmd = [
+        get_ffprobe_path(), "-v", "quiet", "-print_format", "json",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,duration:format=duration:packet=pts_time,flags",
+        "-read_intervals", f"%+{KEYFRAME_SCAN_S}",
+        video_path,
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            timeout=PROBE_TIMEOUT_S,
+            **win_no_window_kwargs()
+        )
+    except Exception as e:
+        log.warning(f"[Probe] ffprobe failed for {video_path}: {e}")
+        return None
+    if result.returncode != 0:
+        return None
+    try:
+        return parse_probe_output(json.loads(result.stdout))
+    except Exception as e:
+        log.warning(f"[Probe] Unreadable ffprobe output for {video_path}: {e}")
+        return None
+
+
+def parse_probe_output(data):
+    stream = (data.get("streams") or [{}])[0]
+    duration = None
+    for value in (stream.get("duration"), (data.get("format") or {}).get("duration")):
+        try:
+            if value and float(value) > 0:
+                duration = float(value)
+                break
+        except ValueError:
+            continue
+
+    keyframes = [
+        float(p["pts_time"]) for p in data.get("packets") or []
+        if "K" in p.get("flags", "") and p.get("pts_time") not in (None, "N/A")
+    ]
+    intervals = [b - a for a, b in zip(keyframes, keyframes[1:]) if b > a]
+    return {
+        "duration": duration,
+        "codec": stream.get("codec_name"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "keyframe_interval": round(statistics.median(intervals), 3) if intervals else None,
+    }
+
+
+class MediaProbe:
+    """Probe results cache in front of a bounded ffprobe process pool."""
+
+    def __init__(self, cache_path=None, workers=PROBE_WORKERS):
+        self.cache_path = cache_path or os.path.join(get_data_dir(), PROBE_CACHE_FILE)
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.cache_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        self._pool = None
+
+    def probe(self, video_path):
+        """Info dict for one file (cached), or None if it cannot be probed."""
+        return self.probe_many([video_path]).get(video_path)
+
+    def duration(self, video_path):
+        info = self.probe(video_path)
+        return info["duration"] if info else None
+
+    def probe_many(self, video_paths):
+        """{path: info or None}; uncached files are probed in parallel."""
+        results = {}
+        missing = []
+        for path in dict.fromkeys(video_paths):
+            key = self._stat(path)
+            if key is None:
+                results[path] = None
+                continue
+            cached = self._cached(path, key)
+            if cached is not None:
+                results[path] = cached
+            else:
+                missing.append((path, key))
+        if not missing:
+            return results
+
+        cached = sum(1 for info in results.values() if info is not None)
+        paths = [path for path, _ in missing]
+        if len(paths) == 1:
+            probed = [run_ffprobe(paths[0])]
+        else:
+            probed = list(self._executor().map(run_ffprobe, paths))
+        with self._lock, self._conn:
+            for (path, (size, mtime)), info in zip(missing, probed):
+                results[path] = info
+                if info is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO probes (path, size, mtime, info) VALUES (?, ?, ?, ?)",
+                        (os.path.abspath(path), size, mtime, json.dumps(info)),
+                    )
+        log.info(f"[Probe] Probed {len(paths)} file(s), {cached} from cache")
+        return results
+
+    def forget(self, root):
+        """Drop cached results for files under a folder (e.g. a deleted day)."""
+        prefix = os.path.join(os.path.abspath(root), "")
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM probes WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+
+    # ------------------------------------------------------------------ #
+    #  Internal                                                            #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def _cached(self, path, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, info FROM probes WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        if row and (row[0], row[1]) == key:
+            return json.loads(row[2])
+        return None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+
+_probe = None
+_probe_lock = threading.Lock()
+
+
+def get_media_probe():
+    """Process-wide MediaProbe (created on first use)."""
+    global _probe
+    with _probe_lock:
+        if _probe is None:
+            _probe = MediaProbe()
+        return _probe
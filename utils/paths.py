@@ -35,6 +35,18 @@ def resource_path(relative: str) -> str:
     return os.path.join(get_app_root(), relative)
 
 
+def get_self_command(*args: str) -> list:
+    """
+    Command line that launches this application again with extra arguments
+    (used to spawn helper processes such as secondary camera windows).
+      Frozen EXE  → [exe, *args]
+      Source run  → [python, main.py, *args]
+    """
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, *args]
+    return [sys.executable, os.path.join(get_app_root(), 'main.py'), *args]
+
+
 def get_ffmpeg_path() -> str:
     """Bundled bin/ffmpeg.exe — falls back to 'ffmpeg' on system PATH."""
     bundled = os.path.join(get_app_root(), 'bin', 'ffmpeg.exe')
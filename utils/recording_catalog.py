@@ -0,0 +1,385 @@
+# utils/recording_catalog.py
+"""
+SQLite index of recording segments.
+
+The per-day recording journals (utils/recording_journal.py) stay the
+source of truth; the catalog mirrors them so playback can answer "which
+cameras", "which dates" and "which segments overlap 10:05–10:20" with
+indexed lookups instead of listing folders and reading journals.
+save_metadata() updates it whenever a record is journaled, and backfill()
+(re)indexes an existing tree in parallel — only days whose camera folders
+or journal changed since the last pass are read, each journal once.
+
+Paths are <root>/<YYYY_MM_DD>/<camera>/<file>.mp4, so the camera and day
+of a segment are always derivable from its path. Motion-mode recordings are
+ordinary segments whose `event` column says what triggered them, and
+`anchors` holds the segment's wall-clock anchors (JSON) for exact seeks,
+and `integrity` the integrity scrubber's verdict (JSON, NULL until checked).
+"""
+
+import os
+import json
+import sqlite3
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.logging import log
+from utils.recording_journal import JOURNAL_FILE, read_day, open_segments
+from utils.media_probe import get_media_probe
+
+CATALOG_FILE = ".recording_catalog.db"
+BACKFILL_WORKERS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    path        TEXT PRIMARY KEY,
+    camera      TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    start_time  TEXT NOT NULL,
+    end_time    TEXT,
+    duration    REAL,
+    size        INTEGER,
+    event       TEXT,
+    anchors     TEXT,
+    integrity   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_segments_camera_start ON segments (camera, start_time);
+CREATE INDEX IF NOT EXISTS idx_segments_day ON segments (day, camera);
+CREATE TABLE IF NOT EXISTS folders (
+    day         TEXT NOT NULL,
+    camera      TEXT NOT NULL,
+    mtime       REAL NOT NULL,
+    PRIMARY KEY (day, camera)
+);
+CREATE TABLE IF NOT EXISTS gaps (
+    camera      TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    start_time  TEXT NOT NULL,
+    end_time    TEXT NOT NULL,
+    reason      TEXT,
+    PRIMARY KEY (camera, start_time)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT
+);
+"""
+
+
+def _is_day_folder(name):
+    return len(name) == 10 and name.count("_") == 2
+
+
+def split_segment_path(video_path):
+    """Return (root, day, camera) for <root>/<day>/<camera>/<file>.mp4."""
+    cam_dir = os.path.dirname(os.path.abspath(video_path))
+    day_dir = os.path.dirname(cam_dir)
+    return os.path.dirname(day_dir), os.path.basename(day_dir), os.path.basename(cam_dir)
+
+
+class RecordingCatalog:
+    """Thread-safe segment index for one recordings root."""
+
+    def __init__(self, recordings_root):
+        self.root = os.path.abspath(recordings_root)
+        self.db_path = os.path.join(self.root, CATALOG_FILE)
+        self._lock = threading.Lock()
+        self._backfill_thread = None
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(segments)")}
+            if "event" not in columns:   # catalogs created before motion recording
+                self._conn.execute("ALTER TABLE segments ADD COLUMN event TEXT")
+            if "anchors" not in columns:   # catalogs created before wall-clock anchors
+                self._conn.execute("ALTER TABLE segments ADD COLUMN anchors TEXT")
+            if "integrity" not in columns:   # catalogs created before the integrity scrubber
+                self._conn.execute("ALTER TABLE segments ADD COLUMN integrity TEXT")
+
+    # ------------------------------------------------------------------ #
+    #  Updates                                                             #
+    # ------------------------------------------------------------------ #
+
+    def record(self, video_path, start_time, end_time=None, duration_seconds=None, event=None, anchors=None):
+        """Insert or update one segment (called whenever it is journaled).
+
+        event names what triggered the recording ("motion"); None for continuous.
+        anchors are the segment's [[seconds into the file, wall-clock ISO time]].
+        """
+        _, day, camera = split_segment_path(video_path)
+        try:
+            size = os.path.getsize(video_path)
+        except OSError:
+            size = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO segments (path, camera, day, start_time, end_time, duration, size, event, anchors) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(video_path), camera, day, start_time.isoformat(),
+                    end_time.isoformat() if end_time else None,
+                    round(duration_seconds, 2) if duration_seconds is not None else None,
+                    size, event, json.dumps(anchors) if anchors else None,
+                ),
+            )
+
+    def record_integrity(self, video_path, result):
+        """Store the integrity scrubber's verdict on a segment."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE segments SET integrity = ? WHERE path = ?", (json.dumps(result), os.path.abspath(video_path))
+            )
+
+    def record_gap(self, camera, start_time, end_time, reason=""):
+        """Remember a stretch without footage (recorder down or restarting)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gaps (camera, day, start_time, end_time, reason) VALUES (?, ?, ?, ?, ?)",
+                (camera, start_time.strftime("%Y_%m_%d"), start_time.isoformat(), end_time.isoformat(), reason),
+            )
+
+    def remove_day(self, day):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM segments WHERE day = ?", (day,))
+            self._conn.execute("DELETE FROM gaps WHERE day = ?", (day,))
+            self._conn.execute("DELETE FROM folders WHERE day = ?", (day,))
+
+    # ------------------------------------------------------------------ #
+    #  Queries                                                             #
+    # ------------------------------------------------------------------ #
+
+    def is_ready(self):
+        """True once a full backfill has completed (now or in an earlier run)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'backfilled'").fetchone()
+        return row is not None
+
+    def cameras(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT camera FROM segments ORDER BY camera").fetchall()
+        return [r["camera"] for r in rows]
+
+    def dates(self, camera):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT day FROM segments WHERE camera = ? ORDER BY day", (camera,)
+            ).fetchall()
+        return [r["day"] for r in rows]
+
+    def day_sizes(self):
+        """{day: bytes recorded} over every camera, as sizes were when segments were journaled."""
+        with self._lock:
+            rows = self._conn.execute("SELECT day, SUM(size) AS total FROM segments GROUP BY day").fetchall()
+        return {r["day"]: r["total"] or 0 for r in rows}
+
+    def segments_for_day(self, camera, day):
+        """All segments of a camera on a day, oldest first, as sqlite3.Row objects."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM segments WHERE camera = ? AND day = ? ORDER BY start_time", (camera, day)
+            ).fetchall()
+
+    def segments_in_range(self, camera, start_dt, end_dt):
+        """Return [(video_path, start, end)] overlapping [start_dt, end_dt), oldest first.
+
+        Segments still being written have no end yet; their last write time is used.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, start_time, end_time FROM segments "
+                "WHERE camera = ? AND start_time < ? AND (end_time IS NULL OR end_time > ?) ORDER BY start_time",
+                (camera, end_dt.isoformat(), start_dt.isoformat()),
+            ).fetchall()
+        result = []
+        for row in rows:
+            seg_start = datetime.datetime.fromisoformat(row["start_time"])
+            if row["end_time"]:
+                seg_end = datetime.datetime.fromisoformat(row["end_time"])
+            else:
+                try:
+                    seg_end = datetime.datetime.fromtimestamp(os.path.getmtime(row["path"]))
+                except OSError:
+                    continue
+                if seg_end <= start_dt:
+                    continue
+            result.append((row["path"], seg_start, seg_end))
+        return result
+
+    def events_for_day(self, camera, day):
+        """Triggered recordings (e.g. motion events) of a camera on a day, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM segments WHERE camera = ? AND day = ? AND event IS NOT NULL ORDER BY start_time",
+                (camera, day),
+            ).fetchall()
+
+    def gaps_for_day(self, camera, day):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start_time, end_time, reason FROM gaps WHERE camera = ? AND day = ? ORDER BY start_time",
+                (camera, day),
+            ).fetchall()
+
+    def anchors_for(self, video_path):
+        """Wall-clock anchors of a segment ([] if it has none)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT anchors FROM segments WHERE path = ?", (os.path.abspath(video_path),)
+            ).fetchone()
+        return json.loads(row["anchors"]) if row and row["anchors"] else []
+
+    def integrity_for(self, video_path):
+        """The integrity scrubber's verdict on a segment, or None if it was not checked."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT integrity FROM segments WHERE path = ?", (os.path.abspath(video_path),)
+            ).fetchone()
+        return json.loads(row["integrity"]) if row and row["integrity"] else None
+
+    def unverified(self, finished_before, limit=50, offset=0):
+        """Closed segments the integrity scrubber has not checked yet, newest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, duration FROM segments "
+                "WHERE integrity IS NULL AND duration IS NOT NULL AND end_time < ? "
+                "ORDER BY start_time DESC, path LIMIT ? OFFSET ?",
+                (finished_before.isoformat(), limit, offset),
+            ).fetchall()
+
+    def find_by_start(self, camera, day, start_iso):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM segments WHERE camera = ? AND day = ? AND start_time = ?",
+                (camera, day, start_iso),
+            ).fetchone()
+        return row["path"] if row else None
+
+    # ------------------------------------------------------------------ #
+    #  Backfill                                                            #
+    # ------------------------------------------------------------------ #
+
+    def backfill_async(self):
+        """Run backfill() on a background thread (no-op if one is running)."""
+        if self._backfill_thread and self._backfill_thread.is_alive():
+            return
+        self._backfill_thread = threading.Thread(target=self.backfill, daemon=True, name="CatalogBackfill")
+        self._backfill_thread.start()
+
+    def backfill(self, workers=BACKFILL_WORKERS):
+        """Index every camera folder under the root whose mtime changed since the last pass."""
+        if not os.path.isdir(self.root):
+            return
+        with self._lock:
+            known = {
+                (r["day"], r["camera"]): r["mtime"]
+                for r in self._conn.execute("SELECT day, camera, mtime FROM folders")
+            }
+
+        on_disk = set()
+        stale = {}               # day -> {camera: mtime}
+        for day in os.listdir(self.root):
+            day_path = os.path.join(self.root, day)
+            if not _is_day_folder(day) or not os.path.isdir(day_path):
+                continue
+            journal_path = os.path.join(day_path, JOURNAL_FILE)
+            journal_mtime = os.path.getmtime(journal_path) if os.path.exists(journal_path) else 0.0
+            for camera in os.listdir(day_path):
+                cam_path = os.path.join(day_path, camera)
+                if not os.path.isdir(cam_path):
+                    continue
+                on_disk.add((day, camera))
+                mtime = max(os.path.getmtime(cam_path), journal_mtime)
+                if known.get((day, camera)) != mtime:
+                    stale.setdefault(day, {})[camera] = mtime
+
+        vanished = [key for key in known if key not in on_disk]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            scanned = list(pool.map(lambda day: (day, _scan_day(self.root, day)), stale))
+
+        with self._lock, self._conn:
+            for day, camera in vanished:
+                self._conn.execute("DELETE FROM segments WHERE day = ? AND camera = ?", (day, camera))
+                self._conn.execute("DELETE FROM folders WHERE day = ? AND camera = ?", (day, camera))
+            for day, (rows, gaps) in scanned:
+                for camera, mtime in stale[day].items():
+                    self._conn.execute("DELETE FROM segments WHERE day = ? AND camera = ?", (day, camera))
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO segments "
+                        "(path, camera, day, start_time, end_time, duration, size, event, anchors, integrity) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows.get(camera, []),
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO folders (day, camera, mtime) VALUES (?, ?, ?)", (day, camera, mtime)
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO gaps (camera, day, start_time, end_time, reason) VALUES (?, ?, ?, ?, ?)",
+                    [(g["camera"], day, g["start_time"], g["end_time"], g.get("reason", ""))
+                     for g in gaps if g.get("camera") in stale[day]],
+                )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfilled', ?)",
+                               (datetime.datetime.now().isoformat(),))
+
+        if stale or vanished:
+            log.info(f"[Catalog] Indexed {sum(len(c) for c in stale.values())} folder(s), dropped {len(vanished)} under {self.root}")
+
+
+def _scan_day(root, day):
+    """Read one day's journal (runs on a backfill worker): ({camera: rows}, gaps)."""
+    segments, gaps = read_day(os.path.join(root, day))
+    open_paths = open_segments(root)
+    unclosed = [] if open_paths is None else [   # no register yet: can't tell live from crashed
+        path for path, meta in segments.items()
+        if meta.get("duration_seconds") is None and path not in open_paths and os.path.exists(path)
+    ]
+    probed = get_media_probe().probe_many(unclosed) if unclosed else {}
+    rows = {}
+    for video_path, meta in segments.items():
+        if "start_time" not in meta or not os.path.exists(video_path):
+            continue
+        duration = meta.get("duration_seconds")
+        end_time = meta.get("end_time")
+        if duration is None and (probed.get(video_path) or {}).get("duration"):
+            # never closed and not being written: take the length from the file
+            duration = probed[video_path]["duration"]
+            end_time = (datetime.datetime.fromisoformat(meta["start_time"])
+                        + datetime.timedelta(seconds=duration)).isoformat()
+        camera = os.path.basename(os.path.dirname(video_path))
+        rows.setdefault(camera, []).append((
+            os.path.abspath(video_path), camera, day, meta["start_time"],
+            end_time, duration, os.path.getsize(video_path),
+            meta.get("trigger"),
+            json.dumps(meta["anchors"]) if meta.get("anchors") else None,
+            json.dumps(meta["integrity"]) if meta.get("integrity") else None,
+        ))
+    return rows, gaps
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(recordings_root):
+    """Process-wide catalog for a recordings root, or None if it cannot be opened."""
+    if not recordings_root or not os.path.isdir(recordings_root):
+        return None
+    key = os.path.normcase(os.path.abspath(recordings_root))
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            try:
+                catalog = RecordingCatalog(recordings_root)
+            except sqlite3.Error as e:
+                log.warning(f"[Catalog] Cannot open catalog in {recordings_root}: {e}")
+                return None
+            _catalogs[key] = catalog
+        return catalog
+
+
+def get_ready_catalog(recordings_root):
+    """Catalog to answer queries from, or None to fall back to scanning folders."""
+    catalog = get_catalog(recordings_root)
+    return catalog if catalog and catalog.is_ready() else None
@@ -0,0 +1,415 @@
+# utils/recording_journal.py
+"""
+Append-only journal of recording metadata, one file per day folder.
+
+Every segment start, segment stop and recording gap is one JSON line in
+<root>/<YYYY_MM_DD>/.journal.jsonl:
+
+    {"event": "start", "file": "Cam_1/Cam_1_2026_10_19_10_00_00.mp4", "start_time": "...", ...}
+    {"event": "stop",  "file": "Cam_1/Cam_1_2026_10_19_10_00_00.mp4", "end_time": "...", "duration_seconds": 600.0}
+    {"event": "gap",   "camera": "Cam_1", "start_time": "...", "end_time": "...", "reason": "..."}
+    {"event": "verify", "file": "Cam_1/Cam_1_2026_10_19_10_00_00.mp4", "integrity": {"status": "ok", ...}}
+
+Later lines for a file update earlier ones, so reading a day is a single
+sequential pass, and a segment with a start but no stop is one the
+recorder never closed (still recording, or cut short by a crash). Writers
+never rewrite anything: lines are queued and written with one fsync per
+day file every JOURNAL_FLUSH_S, which replaces a pretty-printed sidecar
+rewrite (plus a Windows attribute call) per start and stop.
+
+Each root also keeps .open_segments.json, the segments started but not yet
+stopped, rewritten with every flush that changes it. After a crash that
+small file is all startup recovery has to read, however large the archive.
+Other processes that record (window processes running a mosaic recorder,
+recorder nodes) keep their own .open_segments.<tag>.json, so no process
+overwrites another's register. The coordinator's startup recovery adopts
+them into the main one before it launches any of those processes; a
+recorder node on its own roots recovers its register itself.
+
+Those processes share the day journals. Appends from several processes
+are not atomic on Windows, so every write to a day's journal (and its
+compaction) holds an OS lock on <day>/.journal.lock.
+
+compact_day() folds a finished day into one "segment" line per file.
+Older trees still have per-file _metadata.json sidecars; read_day() merges
+them in (the journal wins), and compaction absorbs and removes them.
+"""
+
+import os
+import json
+import datetime
+import time
+import threading
+import contextlib
+from utils.logging import log
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+JOURNAL_FILE = ".journal.jsonl"
+JOURNAL_LOCK_FILE = ".journal.lock"
+OPEN_SEGMENTS_FILE = ".open_segments.json"
+OPEN_SEGMENTS_PREFIX = ".open_segments"
+JOURNAL_FLUSH_S = 1.0
+LEGACY_SIDECAR_SUFFIX = "_metadata.json"
+
+
+def day_path_of(video_path):
+    """<root>/<day> for <root>/<day>/<camera>/<file>.mp4"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(video_path)))
+
+
+def _relative(video_path):
+    cam_dir, filename = os.path.split(os.path.abspath(video_path))
+    return f"{os.path.basename(cam_dir)}/{filename}"
+
+
+class RecordingJournal:
+    """Buffered, fsync-batched writer for the day journals (one per process)."""
+
+    def __init__(self, flush_interval_s=JOURNAL_FLUSH_S, register_tag=None):
+        self.flush_interval_s = flush_interval_s
+        self.register_tag = register_tag
+        self._register_file = f"{OPEN_SEGMENTS_PREFIX}.{register_tag}.json" if register_tag else OPEN_SEGMENTS_FILE
+        self._pending = {}        # day path -> [line, ...]
+        self._open = {}           # root -> {"<day>/<camera>/<file>.mp4", ...}
+        self._dirty = set()       # roots whose open-segment register changed
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="RecordingJournal")
+        self._thread.start()
+
+    def segment_start(self, video_path, start_time, extra=None):
+        self._set_open(video_path, True)
+        self._append(day_path_of(video_path), dict(
+            extra or {}, event="start", file=_relative(video_path), start_time=start_time.isoformat()
+        ))
+
+    def segment_stop(self, video_path, start_time, end_time, duration_seconds, extra=None):
+        self._set_open(video_path, False)
+        self._append(day_path_of(video_path), dict(
+            extra or {}, event="stop", file=_relative(video_path), start_time=start_time.isoformat(),
+            end_time=end_time.isoformat(), duration_seconds=round(duration_seconds, 2),
+        ))
+
+    def integrity(self, video_path, result):
+        """Record the integrity scrubber's verdict on a finished segment."""
+        self._append(day_path_of(video_path), {
+            "event": "verify", "file": _relative(video_path), "integrity": result,
+        })
+
+    def gap(self, recordings_root, camera, start_time, end_time, reason=""):
+        day_path = os.path.join(recordings_root, start_time.strftime("%Y_%m_%d"))
+        self._append(day_path, {
+            "event": "gap", "camera": camera, "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(), "reason": reason,
+        })
+
+    def adopt_registers(self, recordings_root, tags=None):
+        """Take over the registers other processes left in a root (startup only).
+
+        With `tags`, only registers whose tag starts with one of them are
+        taken ("" stands for the untagged register).
+        """
+        adopted = []
+        for name in _register_files(recordings_root):
+            if name == self._register_file:
+                continue
+            tag = _register_tag_of(name)
+            if tags is not None and not any(tag.startswith(t) if t else not tag for t in tags):
+                continue
+            path = os.path.join(recordings_root, name)
+            adopted.extend(_read_open_register(recordings_root, name))
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning(f"[Journal] Failed to remove register {path}: {e}")
+        for rel in adopted:
+            self._set_open(os.path.join(recordings_root, *rel.split("/")), True)
+        if adopted:
+            self.flush()
+        return len(adopted)
+
+    def registered_open(self, recordings_root):
+        """Absolute paths listed in this process's own register for a root (None if it has none)."""
+        root = os.path.abspath(recordings_root)
+        with self._lock:
+            if root not in self._open:
+                if not os.path.exists(os.path.join(root, self._register_file)):
+                    return None
+                self._open[root] = set(_read_open_register(root, self._register_file))
+            rels = sorted(self._open[root])
+        return [os.path.join(root, *rel.split("/")) for rel in rels]
+
+    def forget(self, video_path):
+        """Drop a segment from the open register without journaling a stop (file is gone)."""
+        self._set_open(video_path, False)
+        self._wake.set()
+
+    def flush(self):
+        """Write and fsync everything queued so far."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            registers = {root: sorted(self._open[root]) for root in self._dirty}
+            self._dirty.clear()
+        if not pending and not registers:
+            return
+        with self._write_lock:
+            for day_path, lines in pending.items():
+                try:
+                    os.makedirs(day_path, exist_ok=True)
+                    with _day_lock(day_path), open(os.path.join(day_path, JOURNAL_FILE), "a+b") as f:
+                        # a line torn by a crash must not swallow the first new one
+                        if os.fstat(f.fileno()).st_size:
+                            f.seek(-1, os.SEEK_END)
+                            if f.read(1) != b"\n":
+                                lines.insert(0, "\n")
+                        f.write("".join(lines).encode("utf-8"))
+                        f.flush()
+                        os.fsync(f.fileno())
+                except OSError as e:
+                    log.error(f"[Journal] Failed to write {len(lines)} record(s) to {day_path}: {e}")
+            # after the journal lines: a segment leaves the register only once its stop is on disk
+            for root, open_paths in registers.items():
+                try:
+                    _write_atomic(os.path.join(root, self._register_file), json.dumps(open_paths))
+                except OSError as e:
+                    log.error(f"[Journal] Failed to update open segments of {root}: {e}")
+
+    def _set_open(self, video_path, is_open):
+        root = os.path.dirname(day_path_of(video_path))
+        rel = os.path.relpath(os.path.abspath(video_path), root).replace(os.sep, "/")
+        with self._lock:
+            if root not in self._open:
+                # segments left open by a previous run stay listed until recovered
+                self._open[root] = set(_read_open_register(root, self._register_file))
+            paths = self._open[root]
+            if is_open != (rel in paths):
+                (paths.add if is_open else paths.discard)(rel)
+                self._dirty.add(root)
+
+    def _append(self, day_path, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._pending.setdefault(day_path, []).append(line)
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                log.error(f"[Journal] Flush failed: {e}")
+            # batch whatever arrives during the next interval into one write
+            time.sleep(self.flush_interval_s)
+
+
+_journal = None
+_journal_lock = threading.Lock()
+_register_tag = None
+
+
+def set_register_tag(tag):
+    """Give this process its own open-segment register (call before get_journal())."""
+    global _register_tag
+    _register_tag = tag
+
+
+def get_journal():
+    """Process-wide RecordingJournal (created on first use)."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = RecordingJournal(register_tag=_register_tag)
+        return _journal
+
+
+@contextlib.contextmanager
+def _day_lock(day_path):
+    """Hold the day's journal lock, shared by every recording process."""
+    with open(os.path.join(day_path, JOURNAL_LOCK_FILE), "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue   # LK_LOCK gives up after 10 attempts; a holder never keeps it long
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _register_files(root):
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    return sorted(n for n in names if n.startswith(OPEN_SEGMENTS_PREFIX) and n.endswith(".json"))
+
+
+def _register_tag_of(name):
+    """Tag of a register file name ("" for the untagged one)."""
+    return name[len(OPEN_SEGMENTS_PREFIX):-len(".json")].lstrip(".")
+
+
+def _read_open_register(root, name=OPEN_SEGMENTS_FILE):
+    try:
+        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        log.warning(f"[Journal] Unreadable open-segment register in {root}: {e}")
+        return []
+
+
+# ---------------------------------------------------------------------- #
+#  Reading                                                                 #
+# ---------------------------------------------------------------------- #
+
+def open_segments(recordings_root):
+    """Absolute paths of segments under a root that were started but never stopped.
+
+    Covers every process's register. None if the root has no register yet
+    (written by an older version).
+    """
+    names = _register_files(recordings_root)
+    if not names:
+        return None
+    rels = {rel for name in names for rel in _read_open_register(recordings_root, name)}
+    return [os.path.join(recordings_root, *rel.split("/")) for rel in sorted(rels)]
+
+
+def read_day(day_path):
+    """Return (segments, gaps) recorded in one day folder.
+
+    segments maps the absolute video path to its merged record
+    (start_time, end_time/duration_seconds once stopped, plus any extra
+    keys such as trigger, tier, gap_before_seconds, anchors or integrity); gaps is a list of
+    gap records. A torn last line (crash mid-write) is ignored.
+    """
+    segments = {}
+    gaps = []
+    if not os.path.isdir(day_path):
+        return segments, gaps
+
+    # Sidecars from before the journal; journal lines override them
+    for camera in os.listdir(day_path):
+        cam_path = os.path.join(day_path, camera)
+        if not os.path.isdir(cam_path):
+            continue
+        for filename in os.listdir(cam_path):
+            if not filename.endswith(LEGACY_SIDECAR_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(cam_path, filename), "r", encoding="utf-8") as f:
+                    segments[os.path.join(cam_path, filename.replace(LEGACY_SIDECAR_SUFFIX, ".mp4"))] = json.load(f)
+            except Exception as e:
+                log.warning(f"[Journal] Skipping unreadable metadata {filename}: {e}")
+
+    journal_path = os.path.join(day_path, JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                event = record.pop("event", None)
+                if event == "gap":
+                    gaps.append(record)
+                elif "file" in record:
+                    video_path = os.path.join(day_path, *record.pop("file").split("/"))
+                    segments.setdefault(video_path, {}).update(record)
+    return segments, gaps
+
+
+def segments_for_camera(day_path, camera):
+    """[(video_path, record)] of one camera on a day, oldest first."""
+    segments, _ = read_day(day_path)
+    cam_path = os.path.join(os.path.abspath(day_path), camera)
+    found = [
+        (path, record) for path, record in segments.items()
+        if os.path.dirname(os.path.abspath(path)) == cam_path and "start_time" in record
+    ]
+    return sorted(found, key=lambda item: item[1]["start_time"])
+
+
+def compact_day(day_path):
+    """Rewrite a finished day's journal as one line per segment and absorb legacy sidecars."""
+    # late lines (crash recovery, integrity checks) from other processes must not land in the old file
+    with _day_lock(day_path):
+        segments, gaps = read_day(day_path)
+        if not segments and not gaps:
+            return False
+        day_abs = os.path.abspath(day_path)
+        lines = []
+        for video_path, record in sorted(segments.items(), key=lambda item: item[1].get("start_time", "")):
+            if not os.path.exists(video_path):
+                continue
+            rel = os.path.relpath(os.path.abspath(video_path), day_abs).replace(os.sep, "/")
+            lines.append(json.dumps(dict(record, event="segment", file=rel), separators=(",", ":")) + "\n")
+        for gap in gaps:
+            lines.append(json.dumps(dict(gap, event="gap"), separators=(",", ":")) + "\n")
+        _write_atomic(os.path.join(day_path, JOURNAL_FILE), "".join(lines))
+
+    for video_path in segments:
+        sidecar = video_path[:-len(".mp4")] + LEGACY_SIDECAR_SUFFIX
+        if os.path.exists(sidecar):
+            try:
+                os.remove(sidecar)
+            except OSError:
+                pass
+    return True
+
+
+def compact_finished_days(recordings_root):
+    """Compact every day folder older than yesterday (nothing appends to those any more)."""
+    if not os.path.isdir(recordings_root):
+        return 0
+    get_journal().flush()
+    cutoff = (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y_%m_%d")
+    compacted = 0
+    for day in sorted(os.listdir(recordings_root)):
+        day_path = os.path.join(recordings_root, day)
+        if len(day) != 10 or day.count("_") != 2 or day >= cutoff or not os.path.isdir(day_path):
+            continue
+        journal_path = os.path.join(day_path, JOURNAL_FILE)
+        compacted_marker = journal_path + ".compacted"
+        try:
+            if os.path.exists(compacted_marker) and (
+                not os.path.exists(journal_path) or os.path.getmtime(compacted_marker) >= os.path.getmtime(journal_path)
+            ):
+                continue
+            if compact_day(day_path):
+                compacted += 1
+            open(compacted_marker, "w").close()
+        except Exception as e:
+            log.warning(f"[Journal] Failed to compact {day_path}: {e}")
+    if compacted:
+        log.info(f"[Journal] Compacted {compacted} day(s) under {recordings_root}")
+    return compacted
@@ -1,8 +1,13 @@
 import os
+import time
 import shutil
 import threading
 import datetime
 from utils.logging import log
+from utils.recording_catalog import get_catalog
+from utils.recording_journal import compact_finished_days
+from utils.media_probe import get_media_probe
+from utils.helper import get_low_tier_root
 
 try:
     import psutil
@@ -10,22 +15,61 @@ try:
 except ImportError:
     _psutil_available = False
 
+# Disk-pressure levels 0..MAX_PRESSURE, with the rough share of full-quality
+# bytes the volume's recorders write at each (cameras of different priority
+# sit at different quality levels, see core/recording_profile.py)
+PRESSURE_FACTORS = [1.0, 0.8, 0.65, 0.5, 0.4, 0.3]
+MAX_PRESSURE = len(PRESSURE_FACTORS) - 1
+RATE_DAYS = 3                    # finished days averaged for the daily write volume
+RESTORE_MARGIN = 1.15            # quality comes back only with this much headroom
+RESTORE_HOLD_S = 6 * 3600        # min time between quality restores (each restarts the recorders)
+
 
 class StorageManager:
     """
     Background storage watchdog that enforces a minimum free-space threshold
     on the recording drive using a FIFO (oldest-first) deletion strategy.
 
-    Every `check_interval_minutes`, it checks the free space on the drive
-    where recordings are stored. If free space drops below `min_free_gb`,
-    it deletes the oldest YYYY_MM_DD date folder (all cameras for that day)
-    and repeats until free space is restored. Today's folder is never deleted.
+    Every `check_interval_minutes`, it first applies the retention policy of
+    each tier — low-resolution day folders (under <recordings>/lowres) older
+    than `low_retention_days` are deleted, and so are full-quality ones older
+    than `full_retention_days`, but only while the low tier is enabled and
+    holds a copy of every camera of that day; 0 means no age limit. Then, if free
+    space is below `min_free_gb`, it deletes the oldest YYYY_MM_DD date folder
+    (all cameras for that day) of the full tier, falling back to the low
+    tier once only today's full-quality footage is left, and repeats until
+    free space is restored. Today's folders are never deleted.
+
+    Before it comes to that, it keeps a disk-pressure level (0 = none) for
+    the volume and reports changes to `on_pressure(root, level)`; recorders
+    on the volume then lower their quality. The level rises as soon as the
+    space left for history (free space above the threshold plus the full
+    tier's footage), at the recent daily write volume, no longer holds
+    `quality_target_days` of full-quality footage, or the measured write
+    rate exceeds `max_write_mbps`. It falls one step at a time, at most
+    every RESTORE_HOLD_S, once there is RESTORE_MARGIN headroom. Better 30
+    days at reduced quality than 10 at full. The target never exceeds the
+    full tier's retention: days that will be aged out need no room.
     """
 
-    def __init__(self, recording_folder: str, min_free_gb: float = 50.0, check_interval_minutes: int = 5):
+    def __init__(self, recording_folder: str, min_free_gb: float = 50.0, check_interval_minutes: int = 5,
+                 full_retention_days: int = 0, low_retention_days: int = 0,
+                 quality_target_days: int = 0, max_write_mbps: float = 0, on_pressure=None,
+                 low_tier_enabled: bool = False):
         self.recording_folder = recording_folder
         self.min_free_bytes = min_free_gb * (1024 ** 3)
         self.check_interval = check_interval_minutes * 60
+        self.full_retention_days = full_retention_days
+        self.low_retention_days = low_retention_days
+        self.low_tier_enabled = low_tier_enabled
+        self.quality_target_days = quality_target_days
+        self.max_write_mbps = max_write_mbps
+        self.on_pressure = on_pressure
+        self.pressure = 0
+        self._pressure_changed_at = 0.0
+        self._last_free = None       # (monotonic, free bytes) at the previous check
+        self._deleted_bytes = 0      # freed by deletions since then
+        self._deleted_young = False  # a day within quality_target_days had to go
         self._stop_event = threading.Event()
         self._thread = None
 
@@ -44,10 +88,23 @@ class StorageManager:
         """Signal the watchdog thread to stop."""
         self._stop_event.set()
 
-    def update_settings(self, recording_folder: str, min_free_gb: float):
-        """Update path and threshold without restarting the thread."""
+    def update_settings(self, recording_folder: str, min_free_gb: float,
+                        full_retention_days: int = None, low_retention_days: int = None,
+                        quality_target_days: int = None, max_write_mbps: float = None,
+                        low_tier_enabled: bool = None):
+        """Update path, threshold, retention and quality policy without restarting the thread."""
         self.recording_folder = recording_folder
         self.min_free_bytes = min_free_gb * (1024 ** 3)
+        if full_retention_days is not None:
+            self.full_retention_days = full_retention_days
+        if low_retention_days is not None:
+            self.low_retention_days = low_retention_days
+        if quality_target_days is not None:
+            self.quality_target_days = quality_target_days
+        if max_write_mbps is not None:
+            self.max_write_mbps = max_write_mbps
+        if low_tier_enabled is not None:
+            self.low_tier_enabled = low_tier_enabled
         log.info(f"[Storage] Settings updated — min free: {min_free_gb:.1f} GB, folder: {recording_folder}")
 
     # ------------------------------------------------------------------ #
@@ -61,6 +118,10 @@ class StorageManager:
                 self._check_and_cleanup()
             except Exception as e:
                 log.error(f"[Storage] Unexpected error in watchdog: {e}")
+            try:
+                self._compact_journals()
+            except Exception as e:
+                log.error(f"[Storage] Journal compaction failed: {e}")
             self._stop_event.wait(timeout=self.check_interval)
 
     def _get_free_bytes(self) -> float | None:
@@ -74,38 +135,111 @@ class StorageManager:
             log.error(f"[Storage] Failed to read disk usage: {e}")
             return None
 
-    def _get_oldest_date_folder(self) -> str | None:
-        """
-        Return the full path of the oldest YYYY_MM_DD folder that is NOT today.
-        Returns None if no eligible folder exists.
-        """
+    def _tiers(self):
+        """(root, retention_days) per tier, in the order space is reclaimed."""
+        return [
+            (self.recording_folder, self.full_retention_days),
+            (get_low_tier_root(self.recording_folder), self.low_retention_days),
+        ]
+
+    def _get_date_folders(self, root) -> list:
+        """Sorted YYYY_MM_DD folder names under root, excluding today."""
+        if not os.path.isdir(root):
+            return []
         today_str = datetime.date.today().strftime("%Y_%m_%d")
         try:
             folders = [
-                f for f in os.listdir(self.recording_folder)
+                f for f in os.listdir(root)
                 if (
-                    os.path.isdir(os.path.join(self.recording_folder, f))
+                    os.path.isdir(os.path.join(root, f))
                     and f != today_str
                     and len(f) == 10           # must match YYYY_MM_DD length
                     and f.count("_") == 2      # must have exactly 2 underscores
                 )
             ]
-            if not folders:
-                return None
-            folders.sort()   # alphabetical sort = chronological for YYYY_MM_DD
-            return os.path.join(self.recording_folder, folders[0])
         except Exception as e:
             log.error(f"[Storage] Failed to list recording folders: {e}")
-            return None
+            return []
+        return sorted(folders)   # alphabetical sort = chronological for YYYY_MM_DD
+
+    def _get_oldest_date_folder(self) -> str | None:
+        """
+        Return the full path of the oldest deletable date folder: full tier
+        first, then the low tier. Returns None if no eligible folder exists.
+        """
+        for root, _ in self._tiers():
+            folders = self._get_date_folders(root)
+            if folders:
+                return os.path.join(root, folders[0])
+        return None
+
+    def _delete_day(self, day_path) -> bool:
+        free_before = self._get_free_bytes()
+        try:
+            shutil.rmtree(day_path)
+        except Exception as e:
+            log.error(f"[Storage] Failed to delete {day_path}: {e}")
+            return False
+        log.info(f"[Storage] Deleted old recordings folder: {day_path}")
+        free_after = self._get_free_bytes()
+        if free_before is not None and free_after is not None:
+            self._deleted_bytes += max(0, free_after - free_before)
+        catalog = get_catalog(os.path.dirname(day_path))
+        if catalog:
+            catalog.remove_day(os.path.basename(day_path))
+        get_media_probe().forget(day_path)
+        return True
+
+    def _has_low_tier_copy(self, day):
+        """True if the low tier holds every camera recorded in a full-quality day folder."""
+        full_day = os.path.join(self.recording_folder, day)
+        low_day = os.path.join(get_low_tier_root(self.recording_folder), day)
+        try:
+            cameras = [c for c in os.listdir(full_day) if os.path.isdir(os.path.join(full_day, c))]
+        except OSError:
+            return False
+        return all(os.path.isdir(os.path.join(low_day, camera)) for camera in cameras)
+
+    def _apply_retention(self):
+        """Delete day folders older than their tier's retention period."""
+        for root, days in self._tiers():
+            if not days:
+                continue
+            full_tier = root == self.recording_folder
+            if full_tier and not self.low_tier_enabled:
+                continue   # the full tier is the only copy: only free space may remove it
+            cutoff = (datetime.date.today() - datetime.timedelta(days=days)).strftime("%Y_%m_%d")
+            expired = [f for f in self._get_date_folders(root) if f < cutoff]
+            if full_tier:
+                kept = [day for day in expired if not self._has_low_tier_copy(day)]
+                if kept:
+                    log.debug(f"[Storage] Retention: keeping {len(kept)} full-quality day(s) with no low-resolution copy")
+                expired = [day for day in expired if day not in kept]
+            for day in expired:
+                if not self._delete_day(os.path.join(root, day)):
+                    break
+            if expired:
+                log.info(f"[Storage] Retention: removed {len(expired)} day(s) older than {days} days from {root}")
+
+    def _compact_journals(self):
+        """Fold finished days' recording journals into one line per segment."""
+        for root, _ in self._tiers():
+            compact_finished_days(root)
 
     def _check_and_cleanup(self):
         """Core logic: check free space and delete oldest folders if needed."""
         if not os.path.exists(self.recording_folder):
             return
 
+        self._apply_retention()
+
         free = self._get_free_bytes()
         if free is None:
             return
+        try:
+            self._assess_pressure(free)
+        except Exception as e:
+            log.error(f"[Storage] Disk pressure assessment failed: {e}")
 
         free_gb = free / (1024 ** 3)
 
@@ -132,13 +266,12 @@ class StorageManager:
                 )
                 break
 
-            try:
-                shutil.rmtree(oldest)
-                log.info(f"[Storage] Deleted old recordings folder: {oldest}")
-                deleted_count += 1
-            except Exception as e:
-                log.error(f"[Storage] Failed to delete {oldest}: {e}")
+            if not self._delete_day(oldest):
                 break
+            deleted_count += 1
+            if self._target_days() and os.path.dirname(oldest) == self.recording_folder:
+                age = datetime.date.today() - datetime.datetime.strptime(os.path.basename(oldest), "%Y_%m_%d").date()
+                self._deleted_young = self._deleted_young or age.days < self._target_days()
 
         if deleted_count > 0:
             final_free = self._get_free_bytes() or 0
@@ -146,3 +279,82 @@ class StorageManager:
                 f"[Storage] Cleanup done — deleted {deleted_count} day folder(s), "
                 f"free space now: {final_free / (1024 ** 3):.2f} GB"
             )
+
+    # ------------------------------------------------------------------ #
+    #  Disk pressure → recording quality                                   #
+    # ------------------------------------------------------------------ #
+
+    def _write_rate(self, free):
+        """Bytes/s written to the volume since the last check (free space lost plus space freed)."""
+        now = time.monotonic()
+        last, self._last_free = self._last_free, (now, free)
+        deleted, self._deleted_bytes = self._deleted_bytes, 0
+        if last is None or now <= last[0]:
+            return None
+        return max(0.0, (last[1] - free + deleted) / (now - last[0]))
+
+    def _target_days(self):
+        """Days of full-quality history to make room for (0: no target)."""
+        if self.full_retention_days and self.low_tier_enabled and self.quality_target_days:
+            return min(self.quality_target_days, self.full_retention_days)
+        return self.quality_target_days
+
+    def _required_pressure(self, free, write_rate, margin):
+        """Lowest level at which history and write rate fit their limits with `margin` to spare."""
+        factor = PRESSURE_FACTORS[self.pressure]   # what is written now
+        required = 0
+        target_days = self._target_days()
+        if target_days:
+            catalog = get_catalog(self.recording_folder)
+            sizes = catalog.day_sizes() if catalog else {}
+            today = datetime.date.today().strftime("%Y_%m_%d")
+            recent = sorted(day for day in sizes if day < today)[-RATE_DAYS:]
+            daily = sum(sizes[day] for day in recent) / len(recent) if recent else 0
+            if daily > 0:
+                capacity = sum(sizes.values()) + free - self.min_free_bytes
+                full_daily = daily / factor
+                required = next(
+                    (level for level, f in enumerate(PRESSURE_FACTORS)
+                     if capacity / (full_daily * f) >= target_days * margin),
+                    MAX_PRESSURE,
+                )
+        if self.max_write_mbps and write_rate:
+            full_rate = write_rate / factor
+            limit = self.max_write_mbps * 1024 ** 2 / margin
+            required = max(required, next(
+                (level for level, f in enumerate(PRESSURE_FACTORS) if full_rate * f <= limit), MAX_PRESSURE,
+            ))
+        return required
+
+    def _assess_pressure(self, free):
+        write_rate = self._write_rate(free)
+        if not (self.quality_target_days or self.max_write_mbps):
+            level = 0
+        else:
+            level = self.pressure
+            raise_to = self._required_pressure(free, write_rate, 1.0)
+            if self._deleted_young:
+                # history inside the target already had to go: degrade further right away
+                raise_to = max(raise_to, min(MAX_PRESSURE, self.pressure + 1))
+            self._deleted_young = False
+            if raise_to > self.pressure:
+                level = raise_to
+            elif (self.pressure and time.monotonic() - self._pressure_changed_at >= RESTORE_HOLD_S
+                  and self._required_pressure(free, write_rate, RESTORE_MARGIN) < self.pressure):
+                level = self.pressure - 1
+        if level == self.pressure:
+            return
+        details = [f"{free / (1024 ** 3):.1f} GB free"]
+        if write_rate is not None:
+            details.append(f"writing {write_rate / 1024 ** 2:.1f} MB/s")
+        if self._target_days():
+            details.append(f"target {self._target_days()} days")
+        log.warning(
+            f"[Storage] Disk pressure on {self.recording_folder}: level {self.pressure} → {level} "
+            f"({', '.join(details)}) — "
+            f"{'lowering' if level > self.pressure else 'restoring'} recording quality"
+        )
+        self.pressure = level
+        self._pressure_changed_at = time.monotonic()
+        if self.on_pressure:
+            self.on_pressure(self.recording_folder, level)
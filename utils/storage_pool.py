@@ -0,0 +1,121 @@
+# utils/storage_pool.py
+"""
+Recording storage pool spread over several volumes.
+
+The configured recording folder is the pool's primary root; extra roots
+(ConfigManager.get_extra_recording_folders) add volumes. Every root keeps
+the usual <root>/<YYYY_MM_DD>/<camera>/ layout, its own catalog and its
+own low-resolution tier, so a segment is always found by asking each root.
+
+Placement is per camera: one ffmpeg writes one camera's segments
+sequentially, which is what spinning disks handle well. A new camera goes
+to the volume with the fewest cameras already writing to it (throughput),
+ties going to the volume with the most free space (capacity); volumes
+below the minimum free space take no new cameras while others can. Roots
+on the same device count as one volume. A camera that already has
+footage for today on a healthy volume stays there, keeping a day's
+segments together.
+"""
+
+import os
+import datetime
+import threading
+from utils.logging import log
+
+try:
+    import psutil
+    _psutil_available = True
+except ImportError:
+    _psutil_available = False
+
+
+class StoragePool:
+    """Chooses a recording root for each camera across one or more volumes."""
+
+    def __init__(self, roots, min_free_gb=50.0):
+        self.roots = []
+        seen = set()
+        for root in roots:
+            key = os.path.normcase(os.path.abspath(root)) if root else None
+            if key and key not in seen:
+                seen.add(key)
+                self.roots.append(root)
+        self.min_free_bytes = min_free_gb * (1024 ** 3)
+        self._assigned = {}      # cam_name -> root
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.roots[0] if self.roots else None
+
+    def assign(self, cam_name):
+        """Return the root a camera should record to and remember the choice."""
+        with self._lock:
+            self._assigned.pop(cam_name, None)
+            usable = [r for r in self.roots if os.path.isdir(r)]
+            if not usable:
+                return self.primary
+            free = {r: self._free_bytes(r) for r in usable}
+            healthy = [r for r in usable if free[r] is None or free[r] >= self.min_free_bytes]
+
+            today = datetime.date.today().strftime("%Y_%m_%d")
+            for root in healthy:
+                if os.path.isdir(os.path.join(root, today, cam_name)):
+                    chosen = root
+                    break
+            else:
+                candidates = healthy or [max(usable, key=lambda r: free[r] or 0)]
+                load = {}
+                for root in self._assigned.values():
+                    load[self._device(root)] = load.get(self._device(root), 0) + 1
+                chosen = min(candidates, key=lambda r: (load.get(self._device(r), 0), -(free[r] or 0)))
+            self._assigned[cam_name] = chosen
+        if len(self.roots) > 1:
+            log.info(f"[Storage] {cam_name} → {chosen}")
+        return chosen
+
+    def release(self, cam_name):
+        with self._lock:
+            self._assigned.pop(cam_name, None)
+
+    def stats(self):
+        """{root: cameras currently assigned} for status displays."""
+        with self._lock:
+            counts = {root: 0 for root in self.roots}
+            for root in self._assigned.values():
+                counts[root] = counts.get(root, 0) + 1
+            return counts
+
+    # ------------------------------------------------------------------ #
+    #  Internal                                                            #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _device(root):
+        try:
+            return os.stat(root).st_dev
+        except OSError:
+            return root
+
+    @staticmethod
+    def _free_bytes(root):
+        if not _psutil_available:
+            return None
+        try:
+            return psutil.disk_usage(root).free
+        except Exception as e:
+            log.error(f"[Storage] Failed to read disk usage of {root}: {e}")
+            return None
+
+
+_pool = None
+
+
+def get_storage_pool():
+    """Process-wide StoragePool built from the configured recording folders."""
+    global _pool
+    if _pool is None:
+        from config.config_manager import ConfigManager
+        config_mgr = ConfigManager()
+        _pool = StoragePool(config_mgr.get_recording_folders(), min_free_gb=config_mgr.get_min_free_gb())
+    return _pool